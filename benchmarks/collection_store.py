@@ -0,0 +1,77 @@
+"""
+Benchmark for the collection store
+
+Builds a collection of synthetic pages (a region -> line tree with text
+on each line) and compares the time it takes to save and load it as a
+pickle and as a store (see volume.store). Loading the store only opens
+it: the pages are materialized when they are accessed, which is timed
+separately.
+
+Run from the repository root with:
+    python benchmarks/collection_store.py [n_pages] [n_regions] [n_lines]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from htrflow_core.results import RecognizedText, Segment
+from htrflow_core.serialization import pickle_collection
+from htrflow_core.volume import store
+from htrflow_core.volume.volume import Collection, PageNode
+
+
+def synthetic_segments(n: int, width: int, height: int) -> list[Segment]:
+    """Create `n` stacked polygon segments that fit within a `width` x `height` image"""
+    step = max(height // n, 2)
+    segments = []
+    for i in range(n):
+        y1, y2 = i * step, (i + 1) * step - 1
+        polygon = [(0, y1), (width // 2, y1 + 1), (width - 1, y1), (width - 1, y2), (width // 2, y2 - 1), (0, y2)]
+        segments.append(Segment(polygon=polygon, score=0.9, class_label="text"))
+    return segments
+
+
+def build_collection(n_pages: int, n_regions: int, n_lines: int) -> Collection:
+    collection = Collection([], label="benchmark")
+    for i in range(n_pages):
+        page = PageNode(f"page_{i}.jpg", shape=(4000, 3000))
+        page.create_segments(synthetic_segments(n_regions, page.width, page.height))
+        for region in page:
+            region.create_segments(synthetic_segments(n_lines, region.width, region.height))
+            for line in region:
+                line.add_data(text_result=RecognizedText(["lorem ipsum dolor"], [0.9]))
+        collection.pages.append(page)
+    return collection
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t0
+
+
+def main(n_pages: int = 2000, n_regions: int = 5, n_lines: int = 20):
+    collection, t = timed(build_collection, n_pages, n_regions, n_lines)
+    print(f"Built {n_pages} pages with {n_regions * n_lines} lines each in {t:.2f} s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path, t = timed(pickle_collection, collection, directory)
+        print(f"pickle: save {t:.3f} s, size {os.path.getsize(path) / 1e6:.1f} MB")
+        _, t = timed(Collection.from_pickle, path)
+        print(f"pickle: load {t:.3f} s")
+
+        path, t = timed(store.save_store, collection, os.path.join(directory, "benchmark.store"))
+        size = sum(os.path.getsize(os.path.join(path, file)) for file in os.listdir(path))
+        print(f"store:  save {t:.3f} s, size {size / 1e6:.1f} MB")
+        loaded, t = timed(store.load_store, path)
+        print(f"store:  open {t:.3f} s")
+        _, t = timed(lambda: loaded.pages[n_pages // 2])
+        print(f"store:  materialize one page {t * 1000:.2f} ms")
+        _, t = timed(list, loaded)
+        print(f"store:  materialize all pages {t:.3f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
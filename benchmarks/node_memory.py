@@ -0,0 +1,56 @@
+"""
+Memory benchmark for the collection tree
+
+Builds a page with a region -> line -> word tree from synthetic
+polygon segments and reports the number of bytes allocated per node
+(including the node's segment, bounding box and polygon).
+
+Run from the repository root with:
+    python benchmarks/node_memory.py [n_regions] [n_lines] [n_words]
+"""
+
+import sys
+import tracemalloc
+
+from htrflow_core.results import Segment
+from htrflow_core.volume.volume import PageNode
+
+
+PAGE = "examples/images/pages/A0068699_00021.jpg"
+
+
+def synthetic_segments(n: int, width: int, height: int) -> list[Segment]:
+    """Create `n` stacked polygon segments that fit within a `width` x `height` image"""
+    step = max(height // n, 2)
+    segments = []
+    for i in range(n):
+        y1, y2 = i * step, (i + 1) * step - 1
+        polygon = [(0, y1), (width // 2, y1 + 1), (width - 1, y1), (width - 1, y2), (width // 2, y2 - 1), (0, y2)]
+        segments.append(Segment(polygon=polygon, score=0.9, class_label="text"))
+    return segments
+
+
+def build_tree(page: PageNode, n_regions: int, n_lines: int, n_words: int) -> None:
+    page.create_segments(synthetic_segments(n_regions, page.width, page.height))
+    for region in page:
+        region.create_segments(synthetic_segments(n_lines, region.width, region.height))
+        for line in region:
+            line.create_segments(synthetic_segments(n_words, line.width, line.height))
+
+
+def main(n_regions: int = 20, n_lines: int = 50, n_words: int = 10) -> None:
+    page = PageNode(PAGE)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    build_tree(page, n_regions, n_lines, n_words)
+    page.relabel()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n_nodes = len(page.traverse()) - 1
+    print(f"{n_nodes} nodes, {(after - before) / 2**20:.1f} MiB, {(after - before) / n_nodes:.0f} bytes per node")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,83 @@
+"""
+Printspace estimation benchmark
+
+Runs `layout.estimate_printspace` on the example pages and compares it
+with the previous implementation, which computed two medians per row
+and column in a Python loop. The full-resolution estimate must match
+the reference exactly. The downscaled estimates are reported with their
+largest deviation (in pixels) from the reference.
+
+Run from the repository root with:
+    python benchmarks/printspace.py [scale ...]
+"""
+
+import glob
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from htrflow_core.utils.geometry import Bbox
+from htrflow_core.utils.imgproc import read
+from htrflow_core.utils.layout import estimate_printspace
+
+
+PAGES = sorted(glob.glob("examples/images/pages/*.jpg"))
+
+
+def estimate_printspace_reference(image: np.ndarray, window: int = 150) -> Bbox:
+    """The previous, loop-based implementation of `estimate_printspace`"""
+    image = image.copy()
+    if image.ndim > 2:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, image, *_ = cv2.floodFill(image, None, (0, 0), (255, 255, 255))
+
+    bbox = [0, 0, 0, 0]
+    for axis in (0, 1):
+        levels = image.sum(axis=axis).astype(np.float64)
+        levels /= np.max(levels)
+        levels_sorted = np.sort(levels)
+        mids = levels_sorted[int(len(levels) * 0.1) : int(0.9 * len(levels))]
+        gray = np.mean(mids)
+
+        for i in range(window, len(levels) - window):
+            if np.median(levels[i - window : i]) > gray > np.median(levels[i : i + window]):
+                break
+
+        for j in range(len(levels) - window, window, -1):
+            if np.median(levels[j - window : j]) < gray < np.median(levels[j : j + window]):
+                break
+
+        if i > j:
+            i = 0
+            j = image.shape[1 - axis]
+
+        bbox[axis] = i
+        bbox[axis + 2] = j
+    return Bbox(*bbox)
+
+
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, 1000 * (time.perf_counter() - t0)
+
+
+def main(scales: list[float]) -> None:
+    for path in PAGES:
+        image = read(path)
+        reference, t_reference = timed(estimate_printspace_reference, image)
+        print(f"{path} ({image.shape[1]}x{image.shape[0]})")
+        print(f"  reference:     {t_reference:8.1f} ms  {reference}")
+        for scale in scales:
+            printspace, t = timed(estimate_printspace, image, scale=scale)
+            deviation = max(abs(a - b) for a, b in zip(printspace, reference))
+            print(f"  scale={scale:<5}    {t:8.1f} ms  {printspace}  (max deviation {deviation} px)")
+            if scale == 1:
+                assert printspace == reference, "Full-resolution estimate differs from the reference"
+
+
+if __name__ == "__main__":
+    main([float(arg) for arg in sys.argv[1:]] or [1.0, 0.5, 0.25])
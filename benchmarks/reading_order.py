@@ -0,0 +1,61 @@
+"""
+Reading order benchmark
+
+Orders synthetic pages with the vectorized `reading_order.order_bboxes`
+and compares it with the previous implementation, which sorted the
+boxes with a Python key function. Both must return the same order.
+
+Run from the repository root with:
+    python benchmarks/reading_order.py [n_pages] [n_regions]
+"""
+
+import random
+import sys
+import time
+
+from htrflow_core.postprocess.reading_order import order_bboxes
+from htrflow_core.utils.geometry import Bbox
+from htrflow_core.utils.layout import get_region_location
+
+
+def order_bboxes_reference(bboxes: list[Bbox], printspace: Bbox, is_twopage: bool) -> list[int]:
+    """The previous, non-vectorized implementation of `order_bboxes`"""
+
+    def key(i: int):
+        return (
+            is_twopage and (bboxes[i].center.x > printspace.center.x),
+            get_region_location(printspace, bboxes[i]).value,
+            bboxes[i].ymin,
+        )
+
+    return sorted(range(len(bboxes)), key=key)
+
+
+def synthetic_page(n_regions: int, width: int = 4000, height: int = 3000) -> list[Bbox]:
+    bboxes = []
+    for _ in range(n_regions):
+        x, y = random.randrange(0, width - 50), random.randrange(0, height - 20)
+        w, h = random.randrange(50, 1500), random.randrange(20, 80)
+        bboxes.append(Bbox(x, y, min(x + w, width), min(y + h, height)))
+    return bboxes
+
+
+def main(n_pages: int = 100, n_regions: int = 500) -> None:
+    random.seed(0)
+    printspace = Bbox(400, 300, 3600, 2700)
+    pages = [synthetic_page(n_regions) for _ in range(n_pages)]
+
+    t0 = time.perf_counter()
+    reference = [order_bboxes_reference(bboxes, printspace, True) for bboxes in pages]
+    t1 = time.perf_counter()
+    vectorized = [order_bboxes(bboxes, printspace, True) for bboxes in pages]
+    t2 = time.perf_counter()
+
+    assert reference == vectorized, "The vectorized reading order differs from the reference"
+    print(f"{n_pages} pages with {n_regions} regions each")
+    print(f"reference:  {1000 * (t1 - t0) / n_pages:.2f} ms per page")
+    print(f"vectorized: {1000 * (t2 - t1) / n_pages:.2f} ms per page")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
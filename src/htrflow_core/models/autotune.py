@@ -0,0 +1,172 @@
+"""
+Batch size autotuning
+
+The best inference batch size depends on the model, the device, and the
+size of the inputs. `BatchSizeTuner` finds it at runtime: it starts with
+a small batch size and doubles it for as long as the throughput (images
+per second) improves and the memory use stays below a ceiling. When the
+throughput stops improving, it settles on the best batch size seen. If
+a batch runs out of memory, the batch size is halved and capped.
+
+Example:
+```
+>>> tuner = BatchSizeTuner()
+>>> while images:
+...     batch, images = images[: tuner.batch_size], images[tuner.batch_size :]
+...     results.extend(tuner.run(predict, batch))
+```
+"""
+
+import logging
+import time
+from collections import defaultdict
+from typing import Callable, TypeVar
+
+
+logger = logging.getLogger(__name__)
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+
+class BatchSizeTuner:
+    """Adaptive batch size
+
+    Attributes:
+        batch_size: The batch size to use for the next batch.
+        settled: True when the tuner has stopped searching.
+    """
+
+    def __init__(
+        self,
+        initial: int = 1,
+        max_batch_size: int = 256,
+        probes: int = 2,
+        tolerance: float = 0.05,
+        memory_limit: float = 0.8,
+    ):
+        """
+        Arguments:
+            initial: The first batch size to try. Defaults to 1.
+            max_batch_size: The largest batch size to try. Defaults to 256.
+            probes: Number of batches to time at each batch size. The
+                first batch of the run is not timed, since it typically
+                includes one-time setup costs. Defaults to 2.
+            tolerance: Minimum relative throughput improvement for the
+                batch size to keep growing. Defaults to 0.05.
+            memory_limit: When the memory use (as a fraction of the
+                available memory) of a batch exceeds this limit, the
+                tuner goes back to the previous batch size and stops
+                growing. Defaults to 0.8.
+        """
+        self.batch_size = max(1, min(initial, max_batch_size))
+        self.max_batch_size = max_batch_size
+        self.probes = probes
+        self.tolerance = tolerance
+        self.memory_limit = memory_limit
+        self.settled = False
+        self._warmed_up = False
+        self._timings: dict[int, list[float]] = defaultdict(list)
+        self._best: tuple[int, float] | None = None
+
+    def run(
+        self,
+        predict: Callable[[list[_T]], list[_R]],
+        batch: list[_T],
+        memory_fraction: Callable[[], float | None] | None = None,
+        errors: tuple[type[BaseException], ...] = (MemoryError,),
+        on_error: Callable[[], None] | None = None,
+    ) -> list[_R]:
+        """Run `predict` on `batch` and record the timing
+
+        If the batch runs out of memory, the tuner backs off (see
+        `back_off`) and the batch is split in two halves that are run
+        separately. A single input that runs out of memory re-raises
+        the error.
+
+        Arguments:
+            predict: Function that returns one result per input.
+            batch: The inputs.
+            memory_fraction: Function that returns the peak memory use
+                since its last call, as a fraction of the available
+                memory. See `record`.
+            errors: The exceptions that mean that the batch ran out of
+                memory. Defaults to MemoryError.
+            on_error: Function that is called after running out of
+                memory, before the halves are run, for example to free
+                cached memory.
+        """
+        start = time.perf_counter()
+        try:
+            results = predict(batch)
+        except errors:
+            if len(batch) == 1:
+                raise
+            logger.warning("Ran out of memory on a batch of %d inputs, splitting the batch", len(batch))
+            results = None
+
+        if results is None:
+            # Retry outside of the except block, so that the memory held
+            # by the exception's traceback is released first
+            if on_error is not None:
+                on_error()
+            self.back_off(len(batch))
+            half = len(batch) // 2
+            first = self.run(predict, batch[:half], memory_fraction, errors, on_error)
+            return first + self.run(predict, batch[half:], memory_fraction, errors, on_error)
+
+        seconds = time.perf_counter() - start
+        self.record(len(batch), seconds, memory_fraction() if memory_fraction is not None else None)
+        return results
+
+    def record(self, n_images: int, seconds: float, memory_fraction: float | None = None) -> None:
+        """Record the timing of a batch
+
+        Arguments:
+            n_images: The size of the batch.
+            seconds: The time it took to process the batch.
+            memory_fraction: The peak memory use during the batch, as a
+                fraction of the available memory, if known.
+        """
+        if self.settled:
+            return
+        if not self._warmed_up:
+            self._warmed_up = True
+            return
+        if n_images != self.batch_size:
+            # A partial (last) batch or a split batch, not representative
+            return
+        if memory_fraction is not None and memory_fraction > self.memory_limit:
+            # Too close to running out of memory, go back to the previous size
+            previous = self._best[0] if self._best is not None else max(1, n_images // 2)
+            self._settle(previous, f"memory use {memory_fraction:.0%} exceeds {self.memory_limit:.0%}")
+            return
+
+        timings = self._timings[n_images]
+        timings.append(n_images / max(seconds, 1e-9))
+        if len(timings) < self.probes:
+            return
+
+        throughput = sum(timings) / len(timings)
+        if self._best is not None and throughput < self._best[1] * (1 + self.tolerance):
+            # Plateau (or worse): go back to the best batch size
+            self._settle(self._best[0], f"throughput plateaued at {self._best[1]:.1f} images/s")
+            return
+
+        self._best = (n_images, throughput)
+        if n_images >= self.max_batch_size:
+            self._settle(n_images, "reached the maximum batch size")
+        else:
+            self.batch_size = min(2 * n_images, self.max_batch_size)
+            msg = "Batch size autotuning: %.1f images/s at batch size %d, trying %d"
+            logger.info(msg, throughput, n_images, self.batch_size)
+
+    def back_off(self, n_images: int) -> None:
+        """Halve the batch size after a batch of size `n_images` ran out of memory"""
+        self.max_batch_size = max(1, n_images // 2)
+        best = self._best[0] if self._best is not None else self.max_batch_size
+        self._settle(min(best, self.max_batch_size), f"batch of {n_images} images ran out of memory")
+
+    def _settle(self, batch_size: int, reason: str) -> None:
+        self.batch_size = batch_size
+        self.settled = True
+        logger.info("Batch size autotuning: settled on batch size %d (%s)", batch_size, reason)
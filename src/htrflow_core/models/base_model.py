@@ -1,11 +1,15 @@
 import logging
 from abc import ABC, abstractmethod
+from functools import partial
 from itertools import islice
-from typing import Any, Collection, Generator, Iterable, TypeVar
+from typing import Any, Callable, Collection, Generator, Iterable, Literal, TypeVar
 
 import torch
 from tqdm import tqdm
 
+from htrflow_core.models.autotune import BatchSizeTuner
+from htrflow_core.models.dedup import Deduplicator
+from htrflow_core.models.tiling import merge_tiles, tile_images
 from htrflow_core.results import Result
 from htrflow_core.utils.imgproc import NumpyImage, rescale_linear
 
@@ -21,13 +25,20 @@ class BaseModel(ABC):
         if device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
         self.device = torch.device(device)
+        self.tuned_batch_size = None
 
     def predict(
         self,
         images: Collection[NumpyImage],
-        batch_size: int = 1,
+        batch_size: int | Literal["auto"] = 1,
+        max_batch_size: int = 256,
         image_scaling_factor: float = 1.0,
         tqdm_kwargs: dict[str, Any] | None = None,
+        deduplicate: bool = False,
+        dedup_threshold: int | None = None,
+        tile_size: int | None = None,
+        tile_overlap: int = 256,
+        tile_nms_threshold: float = 0.5,
         **kwargs,
     ) -> list[Result]:
         """Perform inference on images
@@ -39,7 +50,14 @@ class BaseModel(ABC):
 
         Arguments:
             images: Input images
-            batch_size: Inference batch size, defaults to 1
+            batch_size: Inference batch size, defaults to 1. If "auto",
+                the batch size is tuned while running: it starts at 1 and
+                is doubled until the throughput stops improving or the
+                device memory use exceeds 80%, and is halved if a batch
+                runs out of memory. The chosen batch size is available as
+                `tuned_batch_size` afterwards. See `autotune`.
+            max_batch_size: The largest batch size to try when `batch_size`
+                is "auto". Defaults to 256.
             image_scaling_factor: If < 1, all input images will be down-
                 scaled by this factor, which can be useful for speeding
                 up inference on higher resolution images. All geometric
@@ -47,37 +65,114 @@ class BaseModel(ABC):
                 with respect to the original resolution.
             tqdm_kwargs: Optional keyword arguments to control the
                 progress bar.
+            deduplicate: If True, inference is only run once per distinct
+                input image and the results are copied to the duplicates.
+                See `dedup.Deduplicator`. Defaults to False.
+            dedup_threshold: Compare images by perceptual hash instead of
+                exact hash when deduplicating. Images whose hashes differ
+                in at most this many bits (of 64) count as duplicates.
+            tile_size: If given, each image is split into overlapping
+                square tiles of this size (before any scaling), and the
+                tiles' results are merged into one result per image. For
+                segmentation models only. See `tiling`. Defaults to None.
+            tile_overlap: Overlap between neighbouring tiles in pixels.
+                Should be at least the size of the objects to be detected.
+                Defaults to 256.
+            tile_nms_threshold: Containment threshold used when merging
+                duplicate segments from overlapping tiles. Defaults to 0.5.
             **kwargs: Optional keyword arguments that are forwarded to
                 the model specific prediction method.
         """
 
+        self.tuned_batch_size = None
+        tuner = None
+        if batch_size == "auto":
+            tuner = BatchSizeTuner(max_batch_size=max_batch_size)
+            batch_size = tuner.batch_size
         batch_size = max(batch_size, 1)  # make sure batch size is at least 1
         image_scaling_factor = max(10e-10, min(image_scaling_factor, 1))  # clip scaling factor to (0, 1]
 
-        n_batches = (len(images) + batch_size - 1) // batch_size
+        # The number of batches isn't known in advance if the batch size is tuned
+        n_batches = (len(images) + batch_size - 1) // batch_size if tuner is None else None
         model_name = self.__class__.__name__
         logger.info(
-            "Model '%s' on device '%s' received %d images in batches of %d images per batch (%d batches)",
+            "Model '%s' on device '%s' received %d images in batches of %s images per batch (%s batches)",
             model_name,
             self.device,
             len(images),
-            batch_size,
-            n_batches,
+            "auto" if tuner else batch_size,
+            n_batches or "?",
         )
 
+        deduplicator = None
+        if deduplicate or dedup_threshold is not None:
+            deduplicator = Deduplicator(dedup_threshold)
+            images = deduplicator.unique(images)
+            # The number of unique images (and thus batches) isn't known in advance
+            n_batches = None
+
+        if tile_size is None:
+            inputs = ((None, image) for image in images)
+        else:
+            # The number of tiles (and thus batches) isn't known in advance
+            inputs = ((tile, tile.image) for tile in tile_images(images, tile_size, tile_overlap))
+            n_batches = None
+
         results = []
-        batches = _batch(images, batch_size)
-        desc = f"{model_name}: Running inference (batch size {batch_size})"
+        tiles = []
+        batches = _batch(inputs, batch_size if tuner is None else lambda: tuner.batch_size)
+        desc = f"{model_name}: Running inference (batch size {'auto' if tuner else batch_size})"
         for i, batch in enumerate(tqdm(batches, desc, n_batches, **(tqdm_kwargs or {}))):
-            msg = "%s: Running inference on %d images (batch %d of %d)"
-            logger.info(msg, model_name, len(batch), i + 1, n_batches)
-            scaled_batch = [rescale_linear(image, image_scaling_factor) for image in batch]
-            batch_results = self._predict(scaled_batch, **kwargs)
-            for result in batch_results:
+            msg = "%s: Running inference on %d images (batch %d of %s)"
+            logger.info(msg, model_name, len(batch), i + 1, n_batches or "?")
+            scaled_batch = [rescale_linear(image, image_scaling_factor) for _, image in batch]
+            if tuner is None:
+                batch_results = self._predict(scaled_batch, **kwargs)
+            else:
+                batch_results = tuner.run(
+                    partial(self._predict, **kwargs),
+                    scaled_batch,
+                    self._memory_fraction,
+                    errors=(MemoryError, torch.cuda.OutOfMemoryError),
+                    on_error=torch.cuda.empty_cache if self.device.type == "cuda" else None,
+                )
+            for (tile, _), result in zip(batch, batch_results):
                 result.rescale(1 / image_scaling_factor)
-                results.append(result)
+                if tile is None:
+                    results.append(result)
+                    continue
+
+                # Merge the tiles' results once all tiles of the image are done
+                tiles.append((tile, result))
+                if len(tiles) == tile.n_tiles:
+                    results.append(merge_tiles(*zip(*tiles), containments_threshold=tile_nms_threshold))
+                    tiles = []
+
+        if deduplicator is not None:
+            logger.info(
+                "%s: Ran inference on %d unique images, skipped %d duplicates",
+                model_name,
+                deduplicator.n_unique,
+                deduplicator.n_images - deduplicator.n_unique,
+            )
+            results = deduplicator.expand(results)
+
+        if tuner is not None:
+            self.tuned_batch_size = tuner.batch_size
+            logger.info("%s: Used tuned batch size %d", model_name, tuner.batch_size)
         return results
 
+    def _memory_fraction(self) -> float | None:
+        """Peak device memory use since the last call, as a fraction of the total
+
+        Counts the memory held by tensors, not the allocator's cache.
+        """
+        if self.device.type != "cuda":
+            return None
+        peak = torch.cuda.max_memory_allocated(self.device)
+        torch.cuda.reset_peak_memory_stats(self.device)
+        return peak / torch.cuda.get_device_properties(self.device).total_memory
+
     @abstractmethod
     def _predict(self, images: list[NumpyImage], **kwargs) -> list[Result]:
         """Model specific prediction method"""
@@ -87,9 +182,12 @@ class BaseModel(ABC):
         return self.predict(images, **kwargs)
 
 
-def _batch(iterable: Iterable[_T], batch_size: int) -> Generator[list[_T], None, None]:
-    """Yield fixed-size batches from `iterable`"""
-    # TODO: Replace this routine with itertools.batch in Python 3.12
+def _batch(iterable: Iterable[_T], batch_size: int | Callable[[], int]) -> Generator[list[_T], None, None]:
+    """Yield batches from `iterable`
+
+    `batch_size` is either a fixed size or a function that returns the
+    size of the next batch.
+    """
     it = iter(iterable)
-    while batch := list(islice(it, batch_size)):
+    while batch := list(islice(it, batch_size() if callable(batch_size) else batch_size)):
         yield batch
@@ -0,0 +1,133 @@
+"""
+Input deduplication
+
+Scanned volumes often contain identical or near-identical inputs, such
+as empty ruled lines, repeated stamps or duplicated pages. `Deduplicator`
+filters out such duplicates before inference, so that the model only
+runs once per distinct input, and then fans the results back out.
+
+Example:
+```
+>>> deduplicator = Deduplicator()
+>>> results = model_predict(list(deduplicator.unique(images)))
+>>> results = deduplicator.expand(results)  # one result per input image
+```
+"""
+
+import hashlib
+from copy import deepcopy
+from typing import Iterable, Iterator, TypeVar
+
+import numpy as np
+
+from htrflow_core.utils.imgproc import NumpyImage, dhash
+
+
+_T = TypeVar("_T")
+
+
+class Deduplicator:
+    """Filters out duplicate images
+
+    Images are compared by an exact hash of their pixels, or, if a
+    threshold is given, by their perceptual hash (see `imgproc.dhash`).
+    Two images whose perceptual hashes differ in at most `threshold`
+    bits and whose aspect ratios are within `aspect_tolerance` of each
+    other count as duplicates, even if they differ in size. (The hash
+    is computed on a fixed-size thumbnail, so on its own it can't tell
+    a short crop from a long line with similar light/dark structure.)
+    This is meant for recognition models: results with segments are
+    copied as-is, so their coordinates refer to the first of the
+    duplicates.
+
+    Attributes:
+        n_images: Number of images seen.
+        n_unique: Number of unique images seen.
+    """
+
+    def __init__(self, threshold: int | None = None, aspect_tolerance: float = 0.1):
+        """
+        Arguments:
+            threshold: Maximum Hamming distance between the perceptual
+                hashes of two duplicate images. Defaults to None, which
+                means that only exact duplicates are filtered out.
+            aspect_tolerance: Maximum relative difference between the
+                aspect ratios (width / height) of two perceptual
+                duplicates. Defaults to 0.1. Not used for exact
+                duplicates, which must have the same shape.
+        """
+        self.threshold = threshold
+        self.aspect_tolerance = aspect_tolerance
+        self.n_unique = 0
+        self._sources: list[int] = []
+        self._exact: dict[bytes, int] = {}
+        self._perceptual = np.zeros(1024, dtype=np.uint64)
+        self._aspects = np.zeros(1024, dtype=np.float64)
+
+    @property
+    def n_images(self) -> int:
+        return len(self._sources)
+
+    def unique(self, images: Iterable[NumpyImage]) -> Iterator[NumpyImage]:
+        """Yield the images of `images` that are not duplicates
+
+        The input is consumed lazily. Each image is compared to all
+        unique images seen so far, by this or previous calls.
+        """
+        for image in images:
+            source = self._find(image)
+            self._sources.append(self.n_unique if source is None else source)
+            if source is None:
+                self.n_unique += 1
+                yield image
+
+    def expand(self, results: list[_T]) -> list[_T]:
+        """Map results of the unique images back to all images
+
+        Arguments:
+            results: One result per unique image, in the order they
+                were yielded by `unique`.
+
+        Returns:
+            One result per input image. Duplicates get deep copies of
+            the first image's result, so that the results can be
+            modified independently.
+        """
+        if len(results) != self.n_unique:
+            raise ValueError(f"Expected {self.n_unique} results, got {len(results)}")
+        seen = set()
+        expanded = []
+        for source in self._sources:
+            expanded.append(deepcopy(results[source]) if source in seen else results[source])
+            seen.add(source)
+        return expanded
+
+    def _find(self, image: NumpyImage) -> int | None:
+        """The index of the unique image that `image` duplicates, if any"""
+        if self.threshold is None:
+            image = np.ascontiguousarray(image)
+            h = hashlib.blake2b(f"{image.shape}{image.dtype}".encode(), digest_size=20)
+            h.update(image.data)
+            key = h.digest()
+            if key in self._exact:
+                return self._exact[key]
+            self._exact[key] = self.n_unique
+            return None
+
+        h = np.uint64(dhash(image))
+        aspect = image.shape[1] / max(image.shape[0], 1)
+        hashes = self._perceptual[: self.n_unique]
+        if len(hashes):
+            distances = np.unpackbits((hashes ^ h).view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+            # Images of a different shape are never duplicates
+            different_shape = np.abs(self._aspects[: self.n_unique] / aspect - 1) > self.aspect_tolerance
+            distances[different_shape] = np.iinfo(distances.dtype).max
+            closest = int(np.argmin(distances))
+            if distances[closest] <= self.threshold:
+                return closest
+        if self.n_unique == len(self._perceptual):
+            self._perceptual = np.resize(self._perceptual, 2 * len(self._perceptual))
+            self._aspects = np.resize(self._aspects, 2 * len(self._aspects))
+        self._perceptual[self.n_unique] = h
+        self._aspects[self.n_unique] = aspect
+        return None
@@ -11,6 +11,7 @@ from transformers.utils import ModelOutput
 from htrflow_core.models.base_model import BaseModel
 from htrflow_core.models.hf_utils import HF_CONFIG
 from htrflow_core.results import RecognizedText, Result, Segment
+from htrflow_core.utils.imgproc import batch_normalize
 
 
 logger = logging.getLogger(__name__)
@@ -32,6 +33,7 @@ class TrOCR(BaseModel):
         model_kwargs: dict[str, Any] | None = None,
         processor_kwargs: dict[str, Any] | None = None,
         device: str | None = None,
+        fast_preprocessing: bool = False,
     ):
         """Initialize a TrOCR model
 
@@ -43,6 +45,12 @@ class TrOCR(BaseModel):
                 VisionEncoderDecoderModel.from_pretrained.
             processor_kwargs: Processor initialization kwargs which are
                 forwarded to TrOCRProcessor.from_pretrained.
+            fast_preprocessing: If True, the input images are resized and
+                normalized in one vectorized pass (see
+                `imgproc.batch_normalize`) instead of by the processor,
+                which converts and resizes them one by one using PIL. The
+                results match the processor's up to interpolation
+                differences. Defaults to False.
             kwargs: Additional kwargs which are forwarded to BaseModel's
                 __init__.
         """
@@ -60,6 +68,14 @@ class TrOCR(BaseModel):
         self.processor = TrOCRProcessor.from_pretrained(processor, **processor_kwargs)
         logger.info("Initialized TrOCR processor from %s.", processor)
 
+        if fast_preprocessing and not _supports_fast_preprocessing(self.processor.image_processor):
+            logger.warning("The image processor of %s is not supported by fast preprocessing, ignoring.", processor)
+            fast_preprocessing = False
+        self.fast_preprocessing = fast_preprocessing
+        # Preallocated input buffer for fast preprocessing, see `_preprocess`
+        self._buffer: torch.Tensor | None = None
+        self._buffer_copied: torch.cuda.Event | None = None
+
         self.metadata.update(
             {
                 "model": model,
@@ -68,6 +84,42 @@ class TrOCR(BaseModel):
                 "processor_version": model_info(processor).sha,
             }
         )
+        if fast_preprocessing:
+            self.metadata["fast_preprocessing"] = True
+
+    def _preprocess(self, images: list[np.ndarray]) -> torch.Tensor:
+        """Convert `images` to a batch of model inputs on the model's device"""
+        if not self.fast_preprocessing:
+            return self.processor(images, return_tensors="pt").pixel_values.to(self.model.device)
+
+        image_processor = self.processor.image_processor
+        height, width = image_processor.size["height"], image_processor.size["width"]
+        n_channels = len(image_processor.image_mean)
+
+        # Write directly into a (pinned, if the model is on GPU) buffer that
+        # is reused between batches and only reallocated when it is too small
+        pin_memory = self.model.device.type == "cuda"
+        if self._buffer is None or len(self._buffer) < len(images):
+            self._buffer = torch.empty(
+                (len(images), n_channels, height, width), dtype=torch.float32, pin_memory=pin_memory
+            )
+        elif self._buffer_copied is not None:
+            # Wait until the previous batch has been copied to the device
+            self._buffer_copied.synchronize()
+        batch = self._buffer[: len(images)]
+        batch_normalize(
+            images,
+            (height, width),
+            image_processor.image_mean,
+            image_processor.image_std,
+            image_processor.rescale_factor,
+            out=batch.numpy(),
+        )
+        inputs = batch.to(self.model.device, non_blocking=pin_memory)
+        if pin_memory:
+            self._buffer_copied = torch.cuda.Event()
+            self._buffer_copied.record()
+        return inputs
 
     def _predict(self, images: list[np.ndarray], **generation_kwargs) -> list[Result]:
         """Perform inference on `images`
@@ -90,8 +142,8 @@ class TrOCR(BaseModel):
         generation_kwargs["return_dict_in_generate"] = True
 
         # Do inference
-        model_inputs = self.processor(images, return_tensors="pt").pixel_values
-        model_outputs = self.model.generate(model_inputs.to(self.model.device), **generation_kwargs)
+        model_inputs = self._preprocess(images)
+        model_outputs = self.model.generate(model_inputs, **generation_kwargs)
 
         texts = self.processor.batch_decode(model_outputs.sequences, skip_special_tokens=True)
         scores = self._compute_seuqence_scores(model_outputs)
@@ -147,9 +199,9 @@ class WordLevelTrOCR(TrOCR):
                 "WordLevelTrOCR does not support beam search (num_beams > 1). Using greedy search (num_beams = 1)."
             )
 
-        inputs = self.processor(images, return_tensors="pt").pixel_values
+        inputs = self._preprocess(images)
         outputs = self.model.generate(
-            inputs.to(self.model.device),
+            inputs,
             num_beams=num_beams,
             return_dict_in_generate=True,
             output_attentions=True,
@@ -201,6 +253,21 @@ class WordLevelTrOCR(TrOCR):
         return results
 
 
+def _supports_fast_preprocessing(image_processor) -> bool:
+    """True if `batch_normalize` reproduces `image_processor`
+
+    That is, if the processor only resizes to a fixed size, rescales
+    and normalizes the images.
+    """
+    return (
+        getattr(image_processor, "do_resize", False)
+        and getattr(image_processor, "do_rescale", False)
+        and getattr(image_processor, "do_normalize", False)
+        and not getattr(image_processor, "do_center_crop", False)
+        and {"height", "width"} <= set(getattr(image_processor, "size", None) or {})
+    )
+
+
 def attention_based_wordseg(tokens, heatmaps, skip_tokens=None, full_width=1):
     tokens = tokens[1:]
     n_tokens = len(tokens)
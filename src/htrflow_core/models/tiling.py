@@ -0,0 +1,109 @@
+"""
+Tiled inference
+
+Very large images (spreads, maps) either have to be downscaled heavily
+to fit a segmentation model, which loses small objects, or take too
+much memory at full resolution. These utilities split the images into
+overlapping tiles, so that the model only ever sees one tile-sized
+input at a time, and merge the tiles' results back into one result per
+image. Objects that are detected in several overlapping tiles are
+merged with the containment NMS (see `mask_nms.segment_nms`).
+
+The overlap should be at least as large as the objects that are to be
+detected, so that every object lies entirely within at least one tile.
+"""
+
+from typing import Iterable, Iterator, NamedTuple, Sequence
+
+import numpy as np
+
+from htrflow_core.postprocess.mask_nms import segment_nms
+from htrflow_core.results import Result
+from htrflow_core.utils.imgproc import NumpyImage
+
+
+class Tile(NamedTuple):
+    """A tile of an image
+
+    Attributes:
+        index: Index of the image the tile belongs to.
+        offset: The (x, y) position of the tile in the image.
+        n_tiles: The total number of tiles of the image.
+        image_shape: The (height, width) of the image.
+        image: The tile.
+    """
+
+    index: int
+    offset: tuple[int, int]
+    n_tiles: int
+    image_shape: tuple[int, int]
+    image: NumpyImage
+
+
+def tile_positions(length: int, tile_size: int, overlap: int) -> list[int]:
+    """Start positions of overlapping tiles along one axis
+
+    The tiles are spaced `tile_size - overlap` apart. The last tile
+    is aligned with the end of the axis, so that all tiles (except when
+    `length` is shorter than `tile_size`) have the full size.
+    """
+    if overlap >= tile_size:
+        raise ValueError(f"The tile overlap ({overlap}) must be smaller than the tile size ({tile_size})")
+    if length <= tile_size:
+        return [0]
+    positions = list(range(0, length - tile_size, tile_size - overlap))
+    positions.append(length - tile_size)
+    return positions
+
+
+def tile_images(images: Iterable[NumpyImage], tile_size: int, overlap: int) -> Iterator[Tile]:
+    """Split images into overlapping tiles
+
+    The images are consumed lazily, one at a time. Each tile is copied
+    into a contiguous array of at most tile_size x tile_size pixels.
+
+    Arguments:
+        images: Input images.
+        tile_size: Side length of the (square) tiles.
+        overlap: Overlap between neighbouring tiles, in pixels.
+    """
+    for index, image in enumerate(images):
+        height, width = image.shape[:2]
+        offsets = [
+            (x, y)
+            for y in tile_positions(height, tile_size, overlap)
+            for x in tile_positions(width, tile_size, overlap)
+        ]
+        for x, y in offsets:
+            tile = np.ascontiguousarray(image[y : y + tile_size, x : x + tile_size])
+            yield Tile(index, (x, y), len(offsets), (height, width), tile)
+
+
+def merge_tiles(tiles: Sequence[Tile], results: Sequence[Result], containments_threshold: float = 0.5) -> Result:
+    """Merge the results of the tiles of one image
+
+    Moves the segments of each tile's result to image coordinates, and
+    removes the segments that are contained in segments from other (or
+    the same) tiles.
+
+    Arguments:
+        tiles: The tiles of one image.
+        results: The results of the tiles, in tile coordinates.
+        containments_threshold: Containment threshold of the NMS.
+
+    Returns:
+        A result in image coordinates.
+    """
+    segments = []
+    data = []
+    for tile, result in zip(tiles, results):
+        for segment in result.segments:
+            segment.move(tile.offset, tile.image_shape)
+        segments.extend(result.segments)
+        # Data, if any, is per segment for segmentation results (see Result)
+        data.extend(result.data if len(result.data) == len(result.segments) else [{}] * len(result.segments))
+
+    merged = Result(results[0].metadata if results else {}, segments=segments)
+    merged.data = data if any(data) else []
+    merged.drop_indices(set(segment_nms(segments, containments_threshold)))
+    return merged
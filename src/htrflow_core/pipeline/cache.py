@@ -0,0 +1,169 @@
+"""
+Result cache
+
+A persistent, content-addressed cache of model results. Each entry is
+keyed by a hash of the input image's pixels, the model's metadata (which
+includes the model id and revision) and the generation kwargs. This
+makes it possible to re-run a pipeline on the same images (for example
+after changing a later step's settings) without re-running the models
+on unchanged inputs.
+
+The entries are stored as pickle files in a directory tree. When the
+cache grows past its maximum size, the least recently used entries are
+evicted until it is below a low-water mark, so that the (relatively
+expensive) eviction runs once per many insertions rather than on every
+insertion of a full cache.
+
+Example:
+```
+>>> cache = ResultCache(".cache/results", max_size=10**9)
+>>> key = cache.key(image, model.metadata, generation_kwargs)
+>>> if (result := cache.get(key)) is None:
+...     result = model([image], **generation_kwargs)[0]
+...     cache.put(key, result)
+```
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from typing import Any
+
+import numpy as np
+
+from htrflow_core.results import Result
+
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION = ".pickle"
+
+# Generation kwargs that control how inference is run but not its results,
+# and are therefore not part of the cache key
+_IGNORED_KWARGS = ("batch_size", "max_batch_size", "tqdm_kwargs", "deduplicate")
+
+
+class ResultCache:
+    """A size-bounded, on-disk cache of `Result`s
+
+    Attributes:
+        hits: Number of successful lookups since the cache was created.
+        misses: Number of failed lookups since the cache was created.
+    """
+
+    def __init__(self, directory: str = ".cache/results", max_size: int = 10_000_000_000, low_water: float = 0.9):
+        """Open (or create) a result cache
+
+        Arguments:
+            directory: The cache directory.
+            max_size: Maximum total size of the cache in bytes. When the
+                cache exceeds this size, the least recently used entries
+                are evicted. Defaults to 10 GB.
+            low_water: When evicting, entries are removed until the cache
+                size is below this fraction of `max_size`. Defaults to 0.9.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+
+    @staticmethod
+    def key(image: np.ndarray, metadata: dict[str, Any], generation_kwargs: dict[str, Any]) -> str:
+        """The cache key of an input
+
+        Arguments:
+            image: The input image.
+            metadata: The model's metadata, see `BaseModel.metadata`.
+            generation_kwargs: The keyword arguments passed to the model.
+                Settings that don't affect the results (batch size,
+                progress bar options etc.) are ignored.
+        """
+        h = hashlib.blake2b(digest_size=20)
+        image = np.ascontiguousarray(image)
+        h.update(f"{image.shape}{image.dtype}".encode())
+        h.update(image.data)
+        kwargs = {key: value for key, value in generation_kwargs.items() if key not in _IGNORED_KWARGS}
+        h.update(json.dumps([metadata, kwargs], sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups that were hits"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: str) -> Result | None:
+        """Look up `key`, returns None on a cache miss"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (pickle.UnpicklingError, EOFError):
+            logger.warning("Removing corrupt cache entry %s", path)
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Mark the entry as recently used, see `_evict`
+        os.utime(path)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: Result) -> None:
+        """Add `result` to the cache under `key`"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            self._size -= os.path.getsize(path)
+
+        # Write to a temporary file first, so that concurrent readers
+        # never see a partially written entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._size += os.path.getsize(path)
+
+        if self._size > self.max_size:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache is below the low-water mark"""
+        target = self.low_water * self.max_size
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        n_evicted = 0
+        for path in entries:
+            if self._size <= target:
+                break
+            self._remove(path)
+            n_evicted += 1
+        logger.info("Evicted %d entries from result cache %s", n_evicted, self.directory)
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self._size -= size
+
+    def _path(self, key: str) -> str:
+        # Spread the entries over subdirectories to keep directories small
+        return os.path.join(self.directory, key[:2], key + _EXTENSION)
+
+    def _entries(self) -> list[str]:
+        return [
+            os.path.join(root, file)
+            for root, _, files in os.walk(self.directory)
+            for file in files
+            if file.endswith(_EXTENSION)
+        ]
@@ -1,8 +1,9 @@
 import logging
+import os
 from typing import Sequence
 
 from htrflow_core.pipeline.steps import PipelineStep, auto_import, init_step
-from htrflow_core.serialization import pickle_collection
+from htrflow_core.volume.store import save_store
 
 
 logger = logging.getLogger(__name__)
@@ -11,7 +12,7 @@ logger = logging.getLogger(__name__)
 class Pipeline:
     def __init__(self, steps: Sequence[PipelineStep]):
         self.steps = steps
-        self.pickle_path = None
+        self.backup_path = None
         for step in self.steps:
             step.parent_pipeline = self
         validate(self)
@@ -31,10 +32,10 @@ class Pipeline:
                 collection = step.run(collection)
             except Exception:
                 logger.error(
-                    "Pipeline failed on step %s. A backup collection is saved at %s", step_name, self.pickle_path
+                    "Pipeline failed on step %s. A backup collection is saved at %s", step_name, self.backup_path
                 )
                 raise
-            self.pickle_path = pickle_collection(collection)
+            self.backup_path = save_store(collection, os.path.join(".cache", f"{collection.label}.store"))
         return collection
 
     def metadata(self):
@@ -1,15 +1,22 @@
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from typing import Literal
 
 from htrflow_core.models.importer import all_models
-from htrflow_core.postprocess.reading_order import order_regions
+from htrflow_core.pipeline.cache import ResultCache
+from htrflow_core.postprocess.denoise import is_fragment, remove_noise
+from htrflow_core.postprocess.reading_order import order_children, order_regions
 from htrflow_core.postprocess.word_segmentation import simple_word_segmentation
+from htrflow_core.results import TEXT_RESULT_KEY
 from htrflow_core.serialization import get_serializer, save_collection
-from htrflow_core.utils.imgproc import write
-from htrflow_core.utils.layout import estimate_printspace, is_twopage
-from htrflow_core.volume.volume import Collection
+from htrflow_core.utils import imgproc
+from htrflow_core.utils.archive import ShardedArchive
+from htrflow_core.utils.imgproc import encode
+from htrflow_core.volume.store import is_store, load_store
+from htrflow_core.volume.volume import Collection, ImageGenerator
 
 
 logger = logging.getLogger(__name__)
@@ -44,11 +51,36 @@ class PipelineStep:
 
 
 class Inference(PipelineStep):
-    def __init__(self, model_class, model_kwargs, generation_kwargs):
+    """Run a model on the collection's active segments
+
+    With `cache` set, the results are stored in a persistent result
+    cache (see `cache.ResultCache`) and only inputs that are not in the
+    cache are passed to the model. The cache statistics of the latest
+    run are added to the step's metadata. Example YAML:
+    ```
+    - step: TextRecognition
+      settings:
+        model: TrOCR
+        model_settings:
+          model: Riksarkivet/trocr-base-handwritten-swe
+        cache:
+          directory: .cache/results
+          max_size: 10000000000
+    ```
+    `cache: true` uses the default cache directory and size. If the
+    generation settings have `batch_size: auto`, the batch size chosen
+    by the model is added to the metadata as `tuned_batch_size`.
+    """
+
+    def __init__(self, model_class, model_kwargs, generation_kwargs, cache=None):
         self.model_class = model_class
         self.model_kwargs = model_kwargs
         self.generation_kwargs = generation_kwargs
         self.model = None
+        if cache is True:
+            cache = {}
+        self.cache = ResultCache(**cache) if isinstance(cache, dict) else cache
+        self._stats = {}
 
     def _init_model(self):
         self.model = self.model_class(**self.model_kwargs)
@@ -56,31 +88,332 @@ class Inference(PipelineStep):
 
     @classmethod
     def from_config(cls, config):
-        name = config["model"].lower()
-        if name not in MODELS:
-            model_names = [model.__name__ for model in all_models()]
-            msg = f"Model {name} is not supported. The available models are: {', '.join(model_names)}."
-            logger.error(msg)
-            raise NotImplementedError(msg)
-        init_kwargs = config.get("model_settings", {})
-        model = MODELS[name]
-        generation_kwargs = config.get("generation_settings", {})
-        return cls(model, init_kwargs, generation_kwargs)
+        config = dict(config)
+        model = _model_class(config.pop("model"))
+        init_kwargs = config.pop("model_settings", {})
+        generation_kwargs = config.pop("generation_settings", {})
+        return cls(model, init_kwargs, generation_kwargs, **config)
 
     def run(self, collection):
         if self.model is None:
             self._init_model()
-        result = self.model(collection.segments(), **self.generation_kwargs)
+        self._stats = {}
+        result = self._predict(self.model, list(collection.active_leaves()), self.generation_kwargs)
         collection.update(result)
+        self._update_metadata()
         return collection
 
+    def _predict(self, model, nodes, generation_kwargs, load=None):
+        """Run `model` on the images of `nodes`, using the result cache if available
+
+        The images are given by `load(node)`, which defaults to `node.image`.
+        """
+        if self.cache is None:
+            results = model(ImageGenerator(nodes, load), **generation_kwargs)
+            self._record_batch_size(model)
+            return results
+
+        results, keys, misses = [], [], []
+        for i, node in enumerate(nodes):
+            image = node.image if load is None else load(node)
+            key = self.cache.key(image, model.metadata, generation_kwargs)
+            result = self.cache.get(key)
+            if result is None:
+                misses.append(i)
+            results.append(result)
+            keys.append(key)
+
+        logger.info("Found %d of %d results in the result cache", len(nodes) - len(misses), len(nodes))
+        if misses:
+            # The images are re-created lazily instead of being kept in
+            # memory since the lookup
+            new_results = model(ImageGenerator((nodes[i] for i in misses), load), **generation_kwargs)
+            for i, result in zip(misses, new_results):
+                self.cache.put(keys[i], result)
+                results[i] = result
+            self._record_batch_size(model)
+
+        self._stats["cache_hits"] = self._stats.get("cache_hits", 0) + len(nodes) - len(misses)
+        self._stats["cache_misses"] = self._stats.get("cache_misses", 0) + len(misses)
+        return results
+
+    def _record_batch_size(self, model):
+        """Record the batch size chosen by the step's model, if it was tuned (`batch_size: auto`)"""
+        if model is self.model and getattr(model, "tuned_batch_size", None) is not None:
+            self._stats["tuned_batch_size"] = model.tuned_batch_size
+
+    def _update_metadata(self):
+        """Add the statistics of the latest run to the step metadata"""
+        stats = dict(self._stats)
+        if "cache_hits" in stats:
+            lookups = stats["cache_hits"] + stats["cache_misses"]
+            stats["cache_hit_rate"] = round(stats["cache_hits"] / lookups, 4) if lookups else 0.0
+        self.metadata = StepMetadata(str(self), self.model.metadata | stats)
+
 
 class Segmentation(Inference):
     pass
 
 
 class TextRecognition(Inference):
-    pass
+    """Text recognition
+
+    With `cascade`, the step first runs the model with the given
+    generation settings (typically greedy decoding) on all lines. It
+    then re-runs the lines whose top score is below the cascade's
+    threshold with the cascade's settings, for example beam search or
+    a larger model. The new text replaces the first one only if it has
+    a higher score. Example YAML:
+    ```
+    - step: TextRecognition
+      settings:
+        model: TrOCR
+        model_settings:
+          model: Riksarkivet/trocr-base-handwritten-swe
+        generation_settings:
+          batch_size: 64
+          num_beams: 1
+        cascade:
+          threshold: 0.8
+          generation_settings:
+            batch_size: 16
+            num_beams: 4
+    ```
+    The cascade may also specify `model` and `model_settings`; if not
+    given, the step's model is re-used. The labels of the escalated and
+    replaced lines are recorded in the step metadata.
+    """
+
+    def __init__(self, model_class, model_kwargs, generation_kwargs, cache=None, cascade=None):
+        super().__init__(model_class, model_kwargs, generation_kwargs, cache)
+        self.cascade = cascade
+        self.cascade_model = None
+
+    def run(self, collection):
+        lines = list(collection.active_leaves())
+        collection = super().run(collection)
+        if self.cascade is not None:
+            self._escalate(lines)
+            self._update_metadata()
+        return collection
+
+    def _escalate(self, lines):
+        """Re-run recognition on the low-confidence lines"""
+        threshold = self.cascade.get("threshold", 0.8)
+        generation_kwargs = self.cascade.get("generation_settings", {})
+        if self.cascade_model is None:
+            if "model" in self.cascade:
+                model_class = _model_class(self.cascade["model"])
+                self.cascade_model = model_class(**self.cascade.get("model_settings", {}))
+            else:
+                self.cascade_model = self.model
+
+        escalated = [
+            line for line in lines if (text := line.get(TEXT_RESULT_KEY)) is not None and text.top_score() < threshold
+        ]
+        logger.info("Escalating %d of %d lines with score below %s", len(escalated), len(lines), threshold)
+
+        replaced = []
+        if escalated:
+            results = self._predict(self.cascade_model, escalated, generation_kwargs)
+            for line, result in zip(escalated, results):
+                text = result.data[0].get(TEXT_RESULT_KEY) if result.data else None
+                if text is not None and text.top_score() > line.get(TEXT_RESULT_KEY).top_score():
+                    line.add_data(**result.data[0])
+                    replaced.append(line.label)
+
+        self._stats |= {
+            "cascade_threshold": threshold,
+            "cascade_model": self.cascade_model.metadata.get("model", self.cascade_model.metadata["model_class"]),
+            "cascade_generation_settings": generation_kwargs,
+            "escalated_lines": [line.label for line in escalated],
+            "replaced_lines": replaced,
+        }
+
+
+class PageClassification(Inference):
+    """Classify pages and skip pages of certain classes
+
+    Classifies the collection's pages with an image classification
+    model (such as DiT) and marks the pages whose predicted class is
+    in `skip` as skipped (see `PageNode.skip`). Skipped pages are not
+    processed by later inference steps, but are still exported as
+    empty documents. Example YAML:
+    ```
+    - step: PageClassification
+      settings:
+        model: DiT
+        model_settings:
+          model: <page classification model>
+        generation_settings:
+          batch_size: 16
+        skip:
+          - blank
+          - cover
+        reduction: 8
+    ```
+    The pages are decoded at reduced resolution (1/`reduction` of their
+    size), since the classifier's input is small anyway. The predicted
+    classification is stored in each page's data.
+    """
+
+    def __init__(
+        self, model_class, model_kwargs, generation_kwargs, cache=None, skip=None, threshold=0.0, reduction=4
+    ):
+        """
+        Arguments:
+            skip: Page classes to skip.
+            threshold: Only skip a page if the probability of its
+                predicted class is at least this value. Defaults to 0.
+            reduction: Decode the page images at 1/2, 1/4 or 1/8 of
+                their size (2, 4 or 8), or at full size (1). Defaults
+                to 4.
+        """
+        super().__init__(model_class, model_kwargs, generation_kwargs, cache)
+        self.skip = set(skip or [])
+        self.threshold = threshold
+        self.reduction = reduction
+
+    def run(self, collection):
+        if self.model is None:
+            self._init_model()
+        self._stats = {}
+        pages = [page for page in collection if not page.is_skipped()]
+        load = partial(_read_page, reduction=self.reduction)
+        results = self._predict(self.model, pages, self.generation_kwargs, load)
+
+        skipped = []
+        for page, result in zip(pages, results):
+            classification = result.data[0]["classification"]
+            page.add_data(classification=classification)
+            if isinstance(classification, dict):
+                label = max(classification, key=classification.get)
+                probability = classification[label]
+            else:
+                label, probability = classification, 1.0
+            if label in self.skip and probability >= self.threshold:
+                page.skip(label)
+                skipped.append(page.label)
+
+        logger.info("Skipping %d of %d pages (classes: %s)", len(skipped), len(pages), ", ".join(sorted(self.skip)))
+        self._stats["skipped_pages"] = skipped
+        self._update_metadata()
+        return collection
+
+
+def _read_page(page, reduction=1):
+    return imgproc.read(page.path, reduction)
+
+
+class FilterSegments(PipelineStep):
+    """Remove fragments before recognition
+
+    Removes the collection's active segments (typically the output of
+    the latest segmentation step) that are too small, have implausible
+    shapes or low segmentation scores, see `denoise.is_fragment`. The
+    segments are removed in place. Place this step between segmentation
+    and text recognition to avoid recognizing spurious detections.
+    Example YAML:
+    ```
+    - step: FilterSegments
+      settings:
+        min_area: 500
+        min_height: 10
+        max_aspect_ratio: 200
+        min_score: 0.3
+    ```
+    The number of removed segments and their share of the segments and
+    pixels that would otherwise be passed to the next step are recorded
+    in the step metadata.
+    """
+
+    def __init__(self, min_area=0, min_height=0, min_aspect_ratio=0.0, max_aspect_ratio=float("inf"), min_score=0.0):
+        """
+        Arguments:
+            min_area: Minimum bounding box area in pixels.
+            min_height: Minimum bounding box height in pixels.
+            min_aspect_ratio: Minimum width / height ratio.
+            max_aspect_ratio: Maximum width / height ratio.
+            min_score: Minimum segmentation confidence score.
+        """
+        self.limits = {
+            "min_area": min_area,
+            "min_height": min_height,
+            "min_aspect_ratio": min_aspect_ratio,
+            "max_aspect_ratio": max_aspect_ratio,
+            "min_score": min_score,
+        }
+
+    def run(self, collection):
+        # Pages are never removed, even if they are active leaves
+        segments = [node for node in collection.active_leaves() if node.parent is not None]
+        fragments = {id(node) for node in segments if is_fragment(node, **self.limits)}
+        for page in collection:
+            page.prune(lambda node: id(node) in fragments, include_starting_node=False)
+
+        removed = [node for node in segments if id(node) in fragments]
+        total_area = sum(node.height * node.width for node in segments)
+        removed_area = sum(node.height * node.width for node in removed)
+        logger.info(
+            "Removed %d of %d segments (%d of %d pixels)", len(removed), len(segments), removed_area, total_area
+        )
+        self.metadata = StepMetadata(
+            str(self),
+            self.limits
+            | {
+                "removed_segments": len(removed),
+                "removed_segments_share": round(len(removed) / len(segments), 4) if segments else 0.0,
+                "removed_pixels_share": round(removed_area / total_area, 4) if total_area else 0.0,
+            },
+        )
+        return collection
+
+
+class RemoveNoise(PipelineStep):
+    """Remove noise regions and lines
+
+    Removes, in place, the regions whose average text recognition
+    confidence score is below `region_threshold` and the lines whose
+    score is below `line_threshold`, see `denoise.remove_noise`.
+    Example YAML:
+    ```
+    - step: RemoveNoise
+      settings:
+        region_threshold: 0.8
+        line_threshold: 0.5
+    ```
+    """
+
+    requires = [TextRecognition]
+
+    def __init__(self, region_threshold=0.8, line_threshold=None):
+        """
+        Arguments:
+            region_threshold: The region confidence score threshold, or
+                None to keep all regions. Defaults to 0.8.
+            line_threshold: The line confidence score threshold, or None
+                (default) to keep all lines.
+        """
+        self.region_threshold = region_threshold
+        self.line_threshold = line_threshold
+
+    def run(self, collection):
+        n_regions = n_lines = 0
+        for page in collection:
+            regions, lines = remove_noise(page, self.region_threshold, self.line_threshold)
+            n_regions += len(regions)
+            n_lines += len(lines)
+        logger.info("Removed %d noise regions and %d noise lines", n_regions, n_lines)
+        self.metadata = StepMetadata(
+            str(self),
+            {
+                "region_threshold": self.region_threshold,
+                "line_threshold": self.line_threshold,
+                "removed_regions": n_regions,
+                "removed_lines": n_lines,
+            },
+        )
+        return collection
 
 
 class WordSegmentation(PipelineStep):
@@ -93,13 +426,36 @@ class WordSegmentation(PipelineStep):
 
 
 class Export(PipelineStep):
-    def __init__(self, dest, format, **serializer_kwargs):
+    """Export the collection
+
+    Writes one file per document to `dest`. With `archive` set to "tar"
+    or "zip", the documents are instead added to rolling archive shards
+    in `dest`, see `archive.ShardedArchive`. Example YAML:
+    ```
+    - step: Export
+      settings:
+        dest: outputs
+        format: alto
+        archive: tar
+        shard_size: 1000000000
+    ```
+    """
+
+    def __init__(self, dest, format, compress=False, archive=None, shard_size=1_000_000_000, **serializer_kwargs):
         self.serializer = get_serializer(format, **serializer_kwargs)
         self.dest = dest
+        self.compress = compress
+        self.archive = archive
+        self.shard_size = shard_size
 
     def run(self, collection):
         metadata = self.parent_pipeline.metadata() if self.parent_pipeline else None
-        save_collection(collection, self.serializer, self.dest, processing_steps=metadata)
+        if self.archive is None:
+            save_collection(collection, self.serializer, self.dest, self.compress, processing_steps=metadata)
+            return collection
+
+        with ShardedArchive(self.dest, self.archive, self.shard_size) as archive:
+            save_collection(collection, self.serializer, archive, self.compress, processing_steps=metadata)
         return collection
 
 
@@ -115,15 +471,15 @@ class ReadingOrderMarginalia(PipelineStep):
         Arguments:
             two_page: Whether the page is a two-page spread. Three modes:
                 - 'auto': determine heuristically for each page using
-                    `layout.is_twopage`
+                    `layout.is_twopage` (via the page's cached layout)
                 - True: assume all pages are spreads
                 - False: assume all pages are single pages
         """
         self.two_page = two_page
 
-    def is_twopage(self, image):
+    def is_twopage(self, page):
         if self.two_page == "auto":
-            return is_twopage(image)
+            return page.layout().is_twopage
         return self.two_page
 
     def run(self, collection):
@@ -131,12 +487,11 @@ class ReadingOrderMarginalia(PipelineStep):
             if page.is_leaf():
                 continue
 
-            image = page.image
-            printspace = estimate_printspace(image)
-            page.children = order_regions(page.children, printspace, self.is_twopage(image))
+            printspace = page.layout().printspace
+            page.children = order_regions(page.children, printspace, self.is_twopage(page))
 
-            for region in page:
-                region.children = order_regions(region.children, printspace, is_twopage=False)
+            for region, children in zip(page, order_children(page.children, printspace)):
+                region.children = children
         collection.relabel()
         return collection
 
@@ -145,24 +500,106 @@ class ExportImages(PipelineStep):
     """Export the collection's images
 
     This step writes all existing images (regions, lines, etc.) in the
-    collection to disk.
+    collection to disk. With `archive` set to "tar" or "zip", the images
+    are added to rolling archive shards in `dest` instead of being
+    written as separate files, see `archive.ShardedArchive`. The
+    archive's index maps each node label to its shard and offset.
+
+    Each page image is decoded once and all of its nodes are cropped
+    from it in one pass (see `PageNode.node_images`). The images are
+    encoded and written by a pool of worker threads.
+
+    Example YAML, exporting the lines as WebP images:
+    ```
+    - step: ExportImages
+      settings:
+        dest: line_images
+        format: webp
+        quality: 80
+        depth: 2
+    ```
     """
 
-    def __init__(self, dest):
+    def __init__(
+        self,
+        dest,
+        archive=None,
+        shard_size=1_000_000_000,
+        format=None,
+        quality=None,
+        png_compression=None,
+        depth=None,
+        workers=None,
+    ):
+        """
+        Arguments:
+            dest: Output directory
+            archive: "tar" or "zip" to write the images to archive
+                shards, or None (default) to write separate files.
+            shard_size: Approximate size of each archive shard in bytes.
+            format: Image format, for example "jpg", "png" or "webp".
+                Defaults to the format of each page's original image.
+            quality: JPEG/WebP quality (0-100).
+            png_compression: PNG compression level (0-9).
+            depth: Only export nodes at this depth (or these depths, if
+                given as a list), for example 1 for regions and 2 for
+                lines. The page itself is at depth 0. Defaults to None,
+                which exports all nodes.
+            workers: Number of worker threads. Defaults to the number of
+                CPUs.
+        """
         self.dest = dest
+        self.archive = archive
+        self.shard_size = shard_size
+        self.format = format
+        self.quality = quality
+        self.png_compression = png_compression
+        self.depths = [depth] if isinstance(depth, int) else depth
+        self.workers = workers
         os.makedirs(self.dest, exist_ok=True)
 
     def run(self, collection):
-        for page in collection:
-            directory = os.path.join(self.dest, page.get("image_name"))
-            extension = page.get("image_path").split(".")[-1]
-            os.makedirs(directory, exist_ok=True)
-            for node in page.traverse():
-                if node.image is None:
-                    continue
-                write(os.path.join(directory, f'{node.label}.{extension}'), node.image)
+        if self.archive is None:
+            self._export(collection, None)
+            return collection
+
+        with ShardedArchive(self.dest, self.archive, self.shard_size) as archive:
+            self._export(collection, archive)
         return collection
 
+    def _export(self, collection, archive):
+        """Export the images of `collection` to `archive`, or to separate files if `archive` is None"""
+        with ThreadPoolExecutor(self.workers) as executor:
+            for page in collection:
+                extension = self.format or page.get("image_path").split(".")[-1]
+                directory = page.get("image_name")
+                if archive is None:
+                    os.makedirs(os.path.join(self.dest, directory), exist_ok=True)
+
+                nodes, images = [], []
+                for node, image in page.node_images(self.depths):
+                    if image is not None:
+                        nodes.append(node)
+                        images.append(image)
+
+                names = [f"{directory}/{node.label}.{extension}" for node in nodes]
+                if archive is None:
+                    paths = [os.path.join(self.dest, name) for name in names]
+                    list(executor.map(self._write, images, paths))
+                else:
+                    # The archive is written from this thread, in node order
+                    encoded = executor.map(self._encode, images, [extension] * len(images))
+                    for node, name, data in zip(nodes, names, encoded):
+                        archive.add(name, data, label=node.label)
+
+    def _encode(self, image, extension):
+        return encode(image, extension, self.quality, self.png_compression)
+
+    def _write(self, image, path):
+        data = self._encode(image, os.path.splitext(path)[1])
+        with open(path, "wb") as f:
+            f.write(data)
+
 
 class Break(PipelineStep):
     """Break the pipeline! Used for testing."""
@@ -179,6 +616,7 @@ def auto_import(source: Collection | list[str] | str) -> Collection:
         - A path to a directory with images
         - A list of paths to images
         - A path to a pickled collection
+        - A path to a collection store (see `volume.store`)
         - A collection instance (returns itself)
     """
     if isinstance(source, Collection):
@@ -192,6 +630,8 @@ def auto_import(source: Collection | list[str] | str) -> Collection:
     if isinstance(source, list):
         # Input is a single directory
         if len(source) == 1:
+            if is_store(source[0]):
+                return load_store(source[0])
             if os.path.isdir(source[0]):
                 logger.info("Loading collection from directory %s", source[0])
                 return Collection.from_directory(source[0])
@@ -224,6 +664,16 @@ STEPS = {cls_.__name__.lower(): cls_ for cls_ in all_subclasses(PipelineStep)}
 MODELS = {model.__name__.lower(): model for model in all_models()}
 
 
+def _model_class(name):
+    """The model class called `name` (case insensitive)"""
+    if name.lower() not in MODELS:
+        model_names = [model.__name__ for model in all_models()]
+        msg = f"Model {name} is not supported. The available models are: {', '.join(model_names)}."
+        logger.error(msg)
+        raise NotImplementedError(msg)
+    return MODELS[name.lower()]
+
+
 def init_step(step):
     name = step["step"].lower()
     config = step.get("settings", {})
@@ -1,5 +1,6 @@
 from copy import deepcopy
 
+from htrflow_core.results import TEXT_RESULT_KEY
 from htrflow_core.volume import volume
 
 
@@ -7,7 +8,8 @@ def remove_noise_regions(page: volume.PageNode, threshold: float = 0.8):
     """Remove noise regions from page
 
     Makes a copy of the given volume where noisy regions are removed.
-    Uses the heuristic defined in `is_noise`.
+    Uses the heuristic defined in `is_noise`. See `remove_noise` for an
+    in-place alternative.
 
     Arguments:
         page: Input page with text and regions
@@ -22,6 +24,67 @@ def remove_noise_regions(page: volume.PageNode, threshold: float = 0.8):
     return page
 
 
+def remove_noise(
+    page: volume.PageNode, region_threshold: float | None = 0.8, line_threshold: float | None = None
+) -> tuple[list[volume.ImageNode], list[volume.ImageNode]]:
+    """Remove noise regions and lines from page, in place
+
+    A region is regarded as noise if the average text recognition
+    confidence score of its lines is below `region_threshold`, and a
+    line is regarded as noise if its own score is below `line_threshold`.
+    The score of a line without text of its own (but with words) is the
+    average score of its words. The page itself is never removed.
+
+    The scores are collected in one pass over the tree and the noise is
+    then pruned in one go, so the running time is linear in the size of
+    the tree. Nothing is copied.
+
+    Arguments:
+        page: Input page with text
+        region_threshold: The region confidence score threshold, or
+            None to keep all regions. Defaults to 0.8.
+        line_threshold: The line confidence score threshold, or None
+            to keep all lines (in regions that are kept). Defaults to
+            None.
+
+    Returns:
+        The removed regions and the removed lines.
+    """
+    regions = {}
+    noise_lines = []
+    for line in page.traverse(lambda node: node.parent is not None and node.is_line()):
+        score = _line_score(line)
+        if score is None:
+            continue
+        if line_threshold is not None and score < line_threshold:
+            noise_lines.append(line)
+        entry = regions.setdefault(id(line.parent), [line.parent, 0.0, 0])
+        entry[1] += score
+        entry[2] += 1
+
+    noise_regions = []
+    if region_threshold is not None:
+        noise_regions = [
+            region for region, total, n in regions.values() if region is not page and total / n < region_threshold
+        ]
+
+    # Lines in removed regions are removed with their region
+    removed_regions = {id(region) for region in noise_regions}
+    noise_lines = [line for line in noise_lines if id(line.parent) not in removed_regions]
+    noise = removed_regions | {id(line) for line in noise_lines}
+    if noise:
+        page.prune(lambda node: id(node) in noise, include_starting_node=False)
+    return noise_regions, noise_lines
+
+
+def _line_score(line: volume.ImageNode) -> float | None:
+    """The text recognition confidence score of a line, if available"""
+    if text_result := line.get(TEXT_RESULT_KEY):
+        return text_result.top_score()
+    scores = [text_result.top_score() for word in line if (text_result := word.get(TEXT_RESULT_KEY))]
+    return sum(scores) / len(scores) if scores else None
+
+
 def is_noise(node: volume.ImageNode, threshold: float = 0.8):
     """Heuristically determine if region is noise
 
@@ -43,3 +106,39 @@ def is_noise(node: volume.ImageNode, threshold: float = 0.8):
         conf = sum(child.get("text_result").top_score() for child in node) / len(node.children)
         return conf < threshold
     return False
+
+
+def is_fragment(
+    node: volume.ImageNode,
+    min_area: int = 0,
+    min_height: int = 0,
+    min_aspect_ratio: float = 0.0,
+    max_aspect_ratio: float = float("inf"),
+    min_score: float = 0.0,
+) -> bool:
+    """Heuristically determine if a segment is a fragment
+
+    Assumes that a segment is a fragment (i.e. a spurious detection
+    that is not worth recognizing) if it is too small, has an
+    implausible shape or was detected with a low confidence score.
+
+    Arguments:
+        node: Which node to check
+        min_area: Minimum bounding box area in pixels.
+        min_height: Minimum bounding box height in pixels.
+        min_aspect_ratio: Minimum width / height ratio.
+        max_aspect_ratio: Maximum width / height ratio.
+        min_score: Minimum segmentation confidence score. Segments
+            without a score are not filtered by score.
+
+    Returns:
+        True if `node` violates any of the given limits.
+    """
+    height, width = node.height, node.width
+    if height * width < min_area or height < min_height:
+        return True
+    aspect_ratio = width / height if height else float("inf")
+    if not min_aspect_ratio <= aspect_ratio <= max_aspect_ratio:
+        return True
+    score = node.segment.score if isinstance(node, volume.SegmentNode) else None
+    return score is not None and score < min_score
@@ -3,8 +3,9 @@ from typing import Dict, List, Sequence
 
 import numpy as np
 
-from htrflow_core.results import Result
-from htrflow_core.utils.geometry import Mask
+from htrflow_core.results import Result, Segment
+from htrflow_core.utils.geometry import Bbox, Mask, mask2bbox
+from htrflow_core.utils.spatial_index import SpatialIndex
 
 
 def multiclass_mask_nms(result: Result, containments_threshold: float = 0.5, downscale: float = 0.25) -> List[int]:
@@ -53,6 +54,11 @@ def mask_nms(masks: Sequence[Mask], containments_threshold: float = 0.5) -> List
     """
     Identify masks that should be removed based on containment scores and area comparisons.
 
+    A mask can only be contained by masks whose bounding boxes intersect its own bounding box.
+    The candidate pairs are therefore found with a spatial index over the masks' bounding boxes,
+    and the containment scores are only computed for those pairs, within their overlapping
+    region. This gives the same result as comparing all pairs of masks.
+
     Args:
         masks (Sequence[Mask]): A sequence of masks to evaluate.
         containments_threshold (float): The threshold above which a mask is considered to be contained by another.
@@ -60,27 +66,84 @@ def mask_nms(masks: Sequence[Mask], containments_threshold: float = 0.5) -> List
     Returns:
         List[int]: Indices of masks to be removed.
     """
+    areas = [mask.sum() for mask in masks]
+    nonempty = [i for i, mask in enumerate(masks) if mask.any()]
+    bboxes = {i: mask2bbox(masks[i]) for i in nonempty}
+    index = SpatialIndex(nonempty, [bboxes[i] for i in nonempty])
+
+    remove_indices = []
+    for i in nonempty:
+        for j in index.intersecting(bboxes[i]):
+            if i == j or not areas[i] < areas[j]:
+                continue
+            x1, y1, x2, y2 = bboxes[i].intersection(bboxes[j])
+            intersection = np.count_nonzero(np.logical_and(masks[i][y1:y2, x1:x2], masks[j][y1:y2, x1:x2]))
+            if intersection / areas[i] > containments_threshold:
+                remove_indices.append(i)
+                break
+
+    return remove_indices
+
+
+def segment_nms(segments: Sequence[Segment], containments_threshold: float = 0.5) -> List[int]:
+    """
+    Containment NMS on segments, per class label, using the segments' local masks.
 
-    stacked_masks = np.stack(masks, axis=0)
-
-    containments_score = calculate_containment_scores(stacked_masks)
-
-    np.fill_diagonal(containments_score, 0)
-
-    significantly_contained = containments_score > containments_threshold
-    is_smaller_than_others = _calculate_area_comparison_matrix(stacked_masks)
-
-    to_remove = np.any(significantly_contained & is_smaller_than_others, axis=1)
-
-    remove_indices = np.where(to_remove)[0]
+    Follows the same containment rule as `multiclass_mask_nms`, but never creates masks of the
+    size of the entire image: the containment of two segments is computed within the
+    intersection of their bounding boxes, from their local masks. This keeps the memory use
+    proportional to the size of the segments rather than the size of the image. Segments
+    without masks are treated as filled boxes.
 
-    return remove_indices.tolist()
+    The results differ from `multiclass_mask_nms` in two ways:
+    - Areas are counted in pixels (`np.count_nonzero`), while `mask_nms` sums the mask values.
+      The two only agree for 0/1 masks. For 0/255 masks (as drawn by `polygon2mask`), the
+      containment scores of `mask_nms` are 255 times smaller.
+    - Of two equally large masks that contain each other, the latter is removed, while
+      `mask_nms` keeps both.
 
+    Args:
+        segments (Sequence[Segment]): The segments to evaluate.
+        containments_threshold (float): The threshold above which a segment is considered to be
+            contained by another.
 
-def _calculate_area_comparison_matrix(stacked_masks):
-    mask_areas = stacked_masks.sum(axis=(1, 2))
-    mask_areas_expanded = mask_areas[:, np.newaxis]
-    return mask_areas_expanded < mask_areas
+    Returns:
+        List[int]: Indices of segments to be removed, in ascending order.
+    """
+    masks = [
+        segment.mask if segment.mask is not None else np.ones((segment.bbox.height, segment.bbox.width), np.uint8)
+        for segment in segments
+    ]
+    areas = [np.count_nonzero(mask) for mask in masks]
+
+    indices_by_class: Dict[str, List[int]] = defaultdict(list)
+    for i, segment in enumerate(segments):
+        if areas[i]:
+            indices_by_class[segment.class_label].append(i)
+
+    remove_indices = []
+    for indices in indices_by_class.values():
+        index = SpatialIndex(indices, [segments[i].bbox for i in indices])
+        for i in indices:
+            for j in index.intersecting(segments[i].bbox):
+                if i == j or areas[i] > areas[j] or (areas[i] == areas[j] and i < j):
+                    continue
+                intersection = _local_intersection(segments[i].bbox, masks[i], segments[j].bbox, masks[j])
+                if intersection / areas[i] > containments_threshold:
+                    remove_indices.append(i)
+                    break
+
+    return sorted(remove_indices)
+
+
+def _local_intersection(bbox_a: Bbox, mask_a: Mask, bbox_b: Bbox, mask_b: Mask) -> int:
+    """Number of pixels where two local masks overlap"""
+    x1, y1, x2, y2 = bbox_a.intersection(bbox_b)
+    a = mask_a[y1 - bbox_a.ymin : y2 - bbox_a.ymin, x1 - bbox_a.xmin : x2 - bbox_a.xmin]
+    b = mask_b[y1 - bbox_b.ymin : y2 - bbox_b.ymin, x1 - bbox_b.xmin : x2 - bbox_b.xmin]
+    # Rescaled masks may be a pixel off from their bounding boxes
+    h, w = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+    return np.count_nonzero(np.logical_and(a[:h, :w], b[:h, :w]))
 
 
 def calculate_containment_scores(stacked_masks):
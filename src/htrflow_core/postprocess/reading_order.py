@@ -1,7 +1,9 @@
 from typing import Sequence
 
-from htrflow_core.utils.geometry import Bbox
-from htrflow_core.utils.layout import get_region_location
+import numpy as np
+
+from htrflow_core.utils.geometry import Bbox, BboxArray
+from htrflow_core.utils.layout import get_region_locations
 from htrflow_core.volume.volume import ImageNode
 
 
@@ -19,7 +21,8 @@ def order_regions(regions: Sequence[ImageNode], printspace: Bbox, is_twopage: bo
 
     This function can be used to order the top-level regions of a
     page, but is also suitable for ordering the lines within each
-    region.
+    region. To order the lines of several regions at once, use
+    `order_children`.
 
     Arguments:
         regions: Regions to be ordered.
@@ -29,11 +32,42 @@ def order_regions(regions: Sequence[ImageNode], printspace: Bbox, is_twopage: bo
     Returns:
         The input regions in reading order.
     """
-    index = order_bboxes([region.bbox for region in regions], printspace, is_twopage)
+    index = order_bboxes(BboxArray(region.bbox for region in regions), printspace, is_twopage)
     return [regions[i] for i in index]
 
 
-def order_bboxes(bboxes: Sequence[Bbox], printspace: Bbox, is_twopage: bool):
+def order_children(regions: Sequence[ImageNode], printspace: Bbox) -> list[list[ImageNode]]:
+    """Order the children of each region according to their reading order
+
+    Equivalent to calling `order_regions(region.children, printspace)`
+    for each region, but the reading order of all children is computed
+    in one batch.
+
+    Arguments:
+        regions: Regions whose children should be ordered.
+        printspace: A bounding box around the page's printspace.
+
+    Returns:
+        A list with the children of the i:th region, in reading order,
+        at index i.
+    """
+    children = [child for region in regions for child in region.children]
+    sizes = [len(region.children) for region in regions]
+    groups = np.repeat(np.arange(len(regions)), sizes)
+    bboxes = BboxArray(child.bbox for child in children)
+    index = np.lexsort((*_reading_order_keys(bboxes, printspace, is_twopage=False), groups)).tolist()
+
+    # The index is sorted by group (region) first, so the children of the
+    # i:th region are found in the i:th chunk of the index.
+    ordered = []
+    start = 0
+    for size in sizes:
+        ordered.append([children[i] for i in index[start : start + size]])
+        start += size
+    return ordered
+
+
+def order_bboxes(bboxes: Sequence[Bbox] | BboxArray, printspace: Bbox, is_twopage: bool) -> list[int]:
     """Order bounding boxes with respect to printspace
 
     This function estimates the reading order based on the following:
@@ -45,6 +79,9 @@ def order_bboxes(bboxes: Sequence[Bbox], printspace: Bbox, is_twopage: bool):
             `layout.RegionLocation` for more details.
         3. The y-coordinate of the bounding box's top-left corner.
 
+    Bounding boxes that are equal with respect to all three criteria
+    keep their relative input order.
+
     Arguments:
         bboxes: Bounding boxes to be ordered.
         printspace: A bounding box around the page's printspace.
@@ -54,14 +91,13 @@ def order_bboxes(bboxes: Sequence[Bbox], printspace: Bbox, is_twopage: bool):
         A list of integers `index` where `index[i]` is the suggested
         reading order of the i:th bounding box.
     """
-    def key(i: int):
-        return (
-            is_twopage and (bboxes[i].center.x > printspace.center.x),
-            get_region_location(printspace, bboxes[i]).value,
-            bboxes[i].ymin
-            )
-
-    return sorted(range(len(bboxes)), key=key)
+    return np.lexsort(_reading_order_keys(BboxArray(bboxes), printspace, is_twopage)).tolist()
+
+
+def _reading_order_keys(bboxes: BboxArray, printspace: Bbox, is_twopage: bool) -> tuple[np.ndarray, ...]:
+    """Sort keys for `order_bboxes` in np.lexsort order (primary key last)"""
+    page_side = (bboxes.center[:, 0] > printspace.center.x) & bool(is_twopage)
+    return bboxes.ymin, get_region_locations(printspace, bboxes), page_side
 
 
 def left_right_top_down(bboxes: Sequence[Bbox], line_spacing: float | None = 1.0):
@@ -5,7 +5,7 @@ from typing import Any, Callable, Iterable, Sequence
 import numpy as np
 
 from htrflow_core.utils import geometry, imgproc
-from htrflow_core.utils.geometry import Bbox, Mask, Polygon
+from htrflow_core.utils.geometry import Bbox, BboxArray, Mask, Polygon
 
 
 class Segment:
@@ -129,6 +129,22 @@ class Segment:
         """The segment mask relative to the bounding box (alias for self.mask)"""
         return self.mask
 
+    def move(self, offset: tuple[int, int], orig_shape: tuple[int, int] | None = None) -> None:
+        """Move the segment by `offset`
+
+        Used to translate a segment from the coordinates of a crop
+        (e.g. a tile) to the coordinates of the full image.
+
+        Arguments:
+            offset: A (dx, dy) tuple.
+            orig_shape: The new original shape, if given.
+        """
+        self.bbox = self.bbox.move(offset)
+        if self.polygon is not None:
+            self.polygon = self.polygon.move(offset)
+        if orig_shape is not None:
+            self.orig_shape = orig_shape
+
     def rescale(self, factor: float) -> None:
         """Rescale the segment's mask, bounding box and polygon by `factor`"""
         if self.mask is not None:
@@ -204,9 +220,9 @@ class Result:
             segment.rescale(factor)
 
     @property
-    def bboxes(self) -> Sequence[Bbox]:
+    def bboxes(self) -> BboxArray:
         """Bounding boxes relative to input image"""
-        return [segment.bbox for segment in self.segments]
+        return BboxArray([segment.bbox for segment in self.segments])
 
     @property
     def global_masks(self) -> Sequence[Mask | None]:
@@ -1,11 +1,16 @@
+from .parquet import Parquet
 from .serialization import (
     AltoXML,
     Json,
     PageXML,
     PlainText,
     Serializer,
+    ValidationReport,
     get_serializer,
+    iter_save_collection,
+    load_schema,
     pickle_collection,
     save_collection,
     supported_formats,
+    validate_collection,
 )
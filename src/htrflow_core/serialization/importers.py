@@ -0,0 +1,248 @@
+"""
+XML importers
+
+This module contains parsers that read ALTO and Page XML files back into
+a lightweight tree of `ImportedNode`s, from which a `Collection` can be
+rebuilt (see `Collection.from_alto` and `Collection.from_page`). The
+files are parsed incrementally with `iterparse`, and the page images
+are never decoded: the page size is read from the XML.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Any
+
+from htrflow_core.results import TEXT_RESULT_KEY, RecognizedText
+from htrflow_core.utils.geometry import Bbox, Polygon
+from htrflow_core.utils.layout import REGION_KEY, RegionLocation
+
+
+# Text confidence of imported text without a confidence attribute
+DEFAULT_SCORE = 1.0
+
+_ALTO_REGION_LOCATIONS = {
+    "TopMargin": RegionLocation.MARGIN_TOP,
+    "LeftMargin": RegionLocation.MARGIN_LEFT,
+    "RightMargin": RegionLocation.MARGIN_RIGHT,
+    "BottomMargin": RegionLocation.MARGIN_BOTTOM,
+    "PrintSpace": RegionLocation.PRINTSPACE,
+}
+
+
+@dataclass
+class ImportedNode:
+    """A segment read from an XML file
+
+    Attributes:
+        bbox: Bounding box, relative to the page.
+        polygon: Polygon, relative to the page, if available.
+        data: Data to attach to the node, for example its text.
+        children: The node's children.
+    """
+
+    bbox: Bbox
+    polygon: Polygon | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    children: list[ImportedNode] = field(default_factory=list)
+
+
+@dataclass
+class ImportedPage:
+    """A page read from an XML file
+
+    Attributes:
+        image_path: Path to the page's image.
+        height: Height of the page's image.
+        width: Width of the page's image.
+        children: The page's top-level segments.
+        skipped: The reason the page was skipped (True if no reason was
+            given), or None if it wasn't skipped. See `PageNode.skip`.
+    """
+
+    image_path: str
+    height: int
+    width: int
+    children: list[ImportedNode] = field(default_factory=list)
+    skipped: str | bool | None = None
+
+
+def parse_alto(path: str, image_dir: str | None = None) -> ImportedPage:
+    """Parse an ALTO XML file
+
+    TextBlocks are read as regions, TextLines as lines and Strings as
+    words. A line with a single String without an ID (which is how
+    htrflow writes lines without word segmentation) gets the String's
+    content as its own text. TextBlocks in the page's margins get a
+    region location, see `layout.RegionLocation`.
+
+    Pages without regions are exported with a TextBlock that covers the
+    entire page and shares the page's label. Such a block is dropped on
+    import and its lines are placed directly on the page.
+
+    Arguments:
+        path: Path to the ALTO file.
+        image_dir: Directory of the page image. Defaults to the
+            directory of the ALTO file.
+    """
+    page = None
+    image_path = ""
+    location = None
+    stack: list[ImportedNode | None] = []
+    strings: list[tuple[str | None, ImportedNode]] = []
+
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        tag = _localname(elem.tag)
+        if event == "start":
+            if tag == "Page":
+                page = ImportedPage("", _int(elem, "HEIGHT"), _int(elem, "WIDTH"))
+            elif tag in _ALTO_REGION_LOCATIONS:
+                location = _ALTO_REGION_LOCATIONS[tag]
+            elif tag in ("TextBlock", "TextLine"):
+                if tag == "TextBlock" and not stack and elem.get("ID") == _label(image_path):
+                    # Placeholder block of a page without regions
+                    stack.append(None)
+                    continue
+                node = ImportedNode(_alto_bbox(elem))
+                if tag == "TextBlock" and location is not None:
+                    node.data[REGION_KEY] = location
+                _append(page, [node for node in stack if node is not None], node)
+                stack.append(node)
+            continue
+
+        if tag == "fileName":
+            image_path = (elem.text or "").strip()
+        elif tag in _ALTO_REGION_LOCATIONS:
+            location = None
+        elif tag == "Polygon" and stack and stack[-1] is not None:
+            stack[-1].polygon = _parse_points(elem.get("POINTS", ""))
+        elif tag == "String":
+            text = RecognizedText([elem.get("CONTENT", "")], [float(elem.get("WC", DEFAULT_SCORE))])
+            strings.append((elem.get("ID"), ImportedNode(_alto_bbox(elem), data={TEXT_RESULT_KEY: text})))
+        elif tag == "TextLine":
+            line = stack.pop()
+            if len(strings) == 1 and strings[0][0] is None:
+                line.data.update(strings[0][1].data)
+            else:
+                line.children = [word for _, word in strings]
+            strings = []
+            elem.clear()
+        elif tag == "TextBlock":
+            stack.pop()
+            elem.clear()
+
+    if page is None:
+        raise ValueError(f"Could not find a Page element in {path}")
+    page.image_path = os.path.join(os.path.dirname(path) if image_dir is None else image_dir, image_path)
+    return page
+
+
+def parse_page(path: str, image_dir: str | None = None) -> ImportedPage:
+    """Parse a Page XML file
+
+    TextRegions (possibly nested) are read as regions, TextLines as lines
+    and Words as words. The text of an element is read from its
+    TextEquiv/Unicode element, and the confidence from TextEquiv's conf
+    attribute.
+
+    Pages without regions are exported with a region that covers the
+    entire page and shares the page's label. Such a region is dropped on
+    import and its lines are placed directly on the page.
+
+    Pages that were skipped are exported with "skipped" in the Page
+    element's `custom` attribute, which is read back as the page's skip
+    reason, see `serialization.PageXML`.
+
+    Arguments:
+        path: Path to the Page XML file.
+        image_dir: Directory of the page image. If given, the image
+            path is the image's file name within `image_dir`. Defaults
+            to None, which means that the image path is read as-is
+            from the file.
+    """
+    page = None
+    page_label = None
+    stack: list[ImportedNode | None] = []
+
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        tag = _localname(elem.tag)
+        if event == "start":
+            if tag == "Page":
+                image_path = elem.get("imageFilename", "")
+                if image_dir is not None:
+                    image_path = os.path.join(image_dir, os.path.basename(image_path))
+                page_label = _label(image_path)
+                page = ImportedPage(image_path, _int(elem, "imageHeight"), _int(elem, "imageWidth"))
+                page.skipped = _skip_reason(elem.get("custom", ""))
+            elif tag in ("TextRegion", "TextLine", "Word"):
+                if tag == "TextRegion" and not stack and elem.get("id") == page_label:
+                    # Placeholder region of a page without regions
+                    stack.append(None)
+                    continue
+                node = ImportedNode(Bbox(0, 0, 0, 0))
+                _append(page, [node for node in stack if node is not None], node)
+                stack.append(node)
+            continue
+
+        if tag == "Coords" and stack and stack[-1] is not None:
+            polygon = _parse_points(elem.get("points", ""))
+            stack[-1].polygon = polygon
+            stack[-1].bbox = polygon.bbox()
+        elif tag == "TextEquiv" and stack and stack[-1] is not None:
+            text = next((child.text for child in elem if _localname(child.tag) == "Unicode"), None)
+            if text is not None:
+                score = float(elem.get("conf", DEFAULT_SCORE))
+                stack[-1].data[TEXT_RESULT_KEY] = RecognizedText([text], [score])
+        elif tag in ("TextRegion", "TextLine", "Word"):
+            stack.pop()
+            elem.clear()
+
+    if page is None:
+        raise ValueError(f"Could not find a Page element in {path}")
+    return page
+
+
+def _append(page: ImportedPage | None, stack: list[ImportedNode], node: ImportedNode) -> None:
+    """Attach `node` to the innermost open element, or to the page"""
+    if stack:
+        stack[-1].children.append(node)
+    elif page is not None:
+        page.children.append(node)
+
+
+def _alto_bbox(elem: ET.Element) -> Bbox:
+    x, y = _int(elem, "HPOS"), _int(elem, "VPOS")
+    return Bbox(x, y, x + _int(elem, "WIDTH"), y + _int(elem, "HEIGHT"))
+
+
+def _parse_points(points: str) -> Polygon:
+    """Parse a "x1,y1 x2,y2 ..." string"""
+    return Polygon([tuple(int(float(coord)) for coord in point.split(",")) for point in points.split()])
+
+
+def _int(elem: ET.Element, attribute: str) -> int:
+    return int(float(elem.get(attribute, 0)))
+
+
+def _label(image_path: str) -> str:
+    """The label of a page with image `image_path`, see `PageNode`"""
+    return os.path.basename(image_path).split(".")[0]
+
+
+def _skip_reason(custom: str) -> str | bool | None:
+    """Read the skip reason from a Page element's `custom` attribute, see `serialization.PageXML`"""
+    match = re.search(r"(?:^|\s)skipped(?:\s*\{([^}]*)\})?", custom)
+    if match is None:
+        return None
+    reason = re.search(r"reason:([^;]*);", match.group(1) or "")
+    if reason is None:
+        return True
+    return re.sub(r"\\u([0-9a-fA-F]{4})", lambda m: chr(int(m.group(1), 16)), reason.group(1))
+
+
+def _localname(tag: str) -> str:
+    """Strip the namespace from an element tag"""
+    return tag.rsplit("}", 1)[-1]
@@ -0,0 +1,214 @@
+"""
+Columnar (Parquet) export
+
+This module contains a serializer that writes a collection as a set of
+Parquet tables. Unlike the XML formats, the tables can be scanned with
+vectorized readers (pyarrow, pandas, polars, duckdb...) without parsing
+any documents. Requires pyarrow.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from itertools import islice
+from typing import IO, TYPE_CHECKING, Iterable, Iterator
+
+from htrflow_core.results import TEXT_RESULT_KEY
+from htrflow_core.serialization.serialization import Serializer
+
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ModuleNotFoundError:
+    pa = pq = None
+
+
+if TYPE_CHECKING:
+    from htrflow_core.volume.volume import Collection, ImageNode, PageNode
+
+
+class Parquet(Serializer):
+    """Parquet serializer
+
+    Writes the collection as four Parquet tables:
+        pages.parquet: One row per page.
+        regions.parquet: One row per region.
+        lines.parquet: One row per text line.
+        words.parquet: One row per word.
+
+    Regions, lines and words refer to their page by `page_id` and to
+    their parent element by `parent_id` (which is None for elements
+    placed directly on the page). The geometry of each element is given
+    as bounding box columns (`xmin`, `ymin`, `xmax`, `ymax`) and as a
+    flat polygon [x0, y0, x1, y1, ...]. Lines and words also have the
+    columns `text` and `score`.
+
+    The nodes are classified as regions, lines and words in the same
+    way as in the Page XML serializer.
+
+    The four tables are written together in a single pass over the
+    collection, in batches of pages (one Parquet row group per batch),
+    so only one batch of pages is held in memory at a time. The encoded
+    tables are buffered in temporary files (in memory up to
+    `spool_size` bytes) until they are consumed.
+
+    Parquet is a collection-level format: there is no single-page
+    document, and `serialize` returns None. Use `serialize_collection`,
+    `stream_collection` or `save_collection` instead.
+    """
+
+    extension = ".parquet"
+    format_name = "parquet"
+    binary = True
+
+    def __init__(self, pages_per_batch: int = 64, compression: str = "snappy", spool_size: int = 2**24):
+        """Initialize Parquet serializer
+
+        Arguments:
+            pages_per_batch: How many pages to write per row group.
+                Defaults to 64.
+            compression: Parquet compression codec, for example "snappy",
+                "zstd" or "none". Defaults to "snappy".
+            spool_size: How many bytes of each encoded table to buffer in
+                memory before spilling it to a temporary file. Defaults
+                to 16 MiB.
+        """
+        if pa is None:
+            raise ModuleNotFoundError("The parquet serializer requires pyarrow. Install with poetry --extras parquet")
+        self.pages_per_batch = pages_per_batch
+        self.compression = compression
+        self.spool_size = spool_size
+
+    def stream_collection(self, collection: Collection, **metadata) -> Iterator[tuple[Iterable[bytes], str]]:
+        files = self._write(collection)
+        for table, f in files.items():
+            filename = os.path.join(collection.label, table + self.extension)
+            yield _read(f), filename
+
+    def _serialize(self, page: PageNode, **metadata) -> None:
+        """Parquet has no single-page documents, see the class docstring"""
+        return None
+
+    def _write(self, pages: Iterable[PageNode]) -> dict[str, IO[bytes]]:
+        """Write all tables in one pass over `pages`
+
+        Returns:
+            A dict that maps the table names to temporary files that hold
+            the encoded tables, rewound to the start.
+        """
+        schemas = _schemas()
+        files = {}
+        writers = {}
+        try:
+            for table, schema in schemas.items():
+                files[table] = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+                writers[table] = pq.ParquetWriter(files[table], schema, compression=self.compression)
+
+            pages = iter(pages)
+            while batch := list(islice(pages, self.pages_per_batch)):
+                for table, columns in _columns(batch, schemas).items():
+                    if columns[schemas[table].names[0]]:
+                        writers[table].write_table(pa.Table.from_pydict(columns, schema=schemas[table]))
+
+            for writer in writers.values():
+                writer.close()
+        except BaseException:
+            for f in files.values():
+                f.close()
+            raise
+
+        for f in files.values():
+            f.seek(0)
+        return files
+
+
+def _schemas() -> dict[str, pa.Schema]:
+    """The schemas of the four tables"""
+    element = [
+        ("id", pa.string()),
+        ("page_id", pa.string()),
+        ("parent_id", pa.string()),
+        ("xmin", pa.int32()),
+        ("ymin", pa.int32()),
+        ("xmax", pa.int32()),
+        ("ymax", pa.int32()),
+        ("polygon", pa.list_(pa.int32())),
+        ("class_label", pa.string()),
+    ]
+    text = [("text", pa.string()), ("score", pa.float64())]
+    return {
+        "pages": pa.schema(
+            [
+                ("page_id", pa.string()),
+                ("image_path", pa.string()),
+                ("image_name", pa.string()),
+                ("width", pa.int32()),
+                ("height", pa.int32()),
+            ]
+        ),
+        "regions": pa.schema(element),
+        "lines": pa.schema(element + text),
+        "words": pa.schema(element + text),
+    }
+
+
+def _columns(pages: list[PageNode], schemas: dict[str, pa.Schema]) -> dict[str, dict[str, list]]:
+    """Collect the columns of all tables for the given pages
+
+    Returns:
+        A dict that maps the table names to their columns.
+    """
+    tables = {table: {name: [] for name in schema.names} for table, schema in schemas.items()}
+    for page in pages:
+        columns = tables["pages"]
+        columns["page_id"].append(page.label)
+        columns["image_path"].append(page.get("image_path"))
+        columns["image_name"].append(page.get("image_name"))
+        columns["width"].append(page.width)
+        columns["height"].append(page.height)
+
+        for table, node in _elements(page):
+            columns = tables[table]
+            segment = node.get("segment")
+            columns["id"].append(node.label)
+            columns["page_id"].append(page.label)
+            columns["parent_id"].append(None if node.parent is page else node.parent.label)
+            for name, value in zip(("xmin", "ymin", "xmax", "ymax"), node.bbox):
+                columns[name].append(value)
+            columns["polygon"].append(node.polygon.as_nparray().ravel().tolist())
+            columns["class_label"].append(segment.class_label if segment else None)
+            if "text" in columns:
+                text_result = node.get(TEXT_RESULT_KEY)
+                text = text_result.top_candidate() if text_result else None
+                if text is None and node.children:
+                    # A line with words but without text of its own
+                    text = " ".join(word.text for word in node)
+                columns["text"].append(text)
+                columns["score"].append(text_result.top_score() if text_result else None)
+    return tables
+
+
+def _elements(node: ImageNode) -> Iterator[tuple[str, ImageNode]]:
+    """Yield (table, node) pairs of all nodes below `node`
+
+    Mirrors the Page XML template: a node is a line if `is_line()` is
+    true, the children of a line are words, and all other nodes are
+    regions.
+    """
+    for child in node:
+        if child.is_line():
+            yield "lines", child
+            for word in child:
+                yield "words", word
+        else:
+            yield "regions", child
+            yield from _elements(child)
+
+
+def _read(f: IO[bytes], chunk_size: int = 2**20) -> Iterator[bytes]:
+    """Read `f` chunk by chunk, and close it when done"""
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
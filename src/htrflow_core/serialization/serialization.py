@@ -7,19 +7,26 @@ instance to different formats.
 
 from __future__ import annotations
 
+import gzip
 import json
 import logging
 import os
 import pickle
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import TYPE_CHECKING, Optional, Sequence
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Sequence
+from xml.etree import ElementTree
 
 import xmlschema
 from jinja2 import Environment, FileSystemLoader
 
 import htrflow_core
-from htrflow_core.results import TEXT_RESULT_KEY
+from htrflow_core.results import TEXT_RESULT_KEY, RecognizedText, Segment
+from htrflow_core.utils.archive import ShardedArchive
+from htrflow_core.utils.geometry import Bbox, Point, Polygon
 from htrflow_core.utils.layout import REGION_KEY, RegionLocation
 
 
@@ -42,10 +49,14 @@ class Serializer:
         extension: The file extension associated with this format, for
             example ".txt" or ".xml"
         format_name: The name of this format, for example "alto".
+        schema: Path to the XML schema of this format, if available.
+        binary: True if the documents are bytes rather than strings.
     """
 
     extension: str
     format_name: str
+    schema: str | None = None
+    binary: bool = False
 
     def serialize(self, page: PageNode, validate: bool = False, **metadata) -> str | None:
         """Serialize page
@@ -63,11 +74,15 @@ class Serializer:
             self.validate(doc)
         return doc
 
-    def serialize_collection(self, collection: Collection, **metadata) -> Sequence[tuple[str, str]]:
+    def serialize_collection(
+        self, collection: Collection, validate: bool = False, **metadata
+    ) -> Sequence[tuple[str, str]]:
         """Serialize collection
 
         Arguments:
             collection: Input collection
+            validate: If True, each document is passed through validation,
+                see `serialize`.
 
         Returns:
             A sequence of (document, filename) tuples where `document`
@@ -77,17 +92,55 @@ class Serializer:
             collection) or several files (typically one file per page),
             depending on the serialization method.
         """
-        outputs = []
+        join = b"".join if self.binary else "".join
+        outputs = self.stream_collection(collection, validate=validate, **metadata)
+        return [(join(chunks), filename) for chunks, filename in outputs]
+
+    def stream_collection(
+        self, collection: Collection, validate: bool = False, **metadata
+    ) -> Iterator[tuple[Iterable[str], str]]:
+        """Serialize collection lazily
+
+        Like `serialize_collection`, but yields one document at a time
+        and each document as an iterable of string chunks. Writing the
+        chunks directly to a file means that at most one document is
+        held in memory at a time.
+
+        Arguments:
+            collection: Input collection
+            validate: If True, each document is passed through validation,
+                see `serialize`. The document is then produced in one
+                chunk, since it must be complete to be validated.
+
+        Yields:
+            (chunks, filename) tuples, where `chunks` is an iterable of
+            strings that together make up the document.
+        """
         for page in collection:
-            doc = self.serialize(page, **metadata)
-            if doc is None:
+            if validate:
+                doc = self.serialize(page, validate=True, **metadata)
+                chunks = None if doc is None else [doc]
+            else:
+                chunks = self._stream(page, **metadata)
+            if chunks is None:
                 continue
-            filename = os.path.join(collection.label, page.label + self.extension)
-            outputs.append((doc, filename))
-        return outputs
+            yield chunks, os.path.join(collection.label, page.label + self.extension)
 
     def validate(self, doc: str) -> None:
-        """Validate document"""
+        """Validate `doc` against the serializer's schema
+
+        Does nothing if the format has no schema. The schema is compiled
+        once per process and then reused, see `load_schema`.
+
+        Arguments:
+            doc: Input document
+
+        Raises:
+            xmlschema.XMLSchemaValidationError if the document violates
+            the current schema.
+        """
+        if self.schema is not None:
+            load_schema(self.schema).validate(doc)
 
     def _serialize(self, page: PageNode, **metadata) -> str | None:
         """Format-specific seralization method
@@ -97,6 +150,18 @@ class Serializer:
         """
         pass
 
+    def _stream(self, page: PageNode, **metadata) -> Iterable[str] | None:
+        """Format-specific streaming serialization method
+
+        Returns the serialized page as an iterable of string chunks.
+        Defaults to a single chunk produced by `_serialize`.
+
+        Arguments:
+            page: Input page
+        """
+        doc = self._serialize(page, **metadata)
+        return None if doc is None else [doc]
+
 
 class AltoXML(Serializer):
     """Alto XML serializer
@@ -116,13 +181,19 @@ class AltoXML(Serializer):
 
     extension = ".xml"
     format_name = "alto"
+    schema = os.path.join(_SCHEMA_DIR, "alto-4-4.xsd")
 
     def __init__(self):
         env = Environment(loader=FileSystemLoader([_TEMPLATES_DIR, "."]))
         self.template = env.get_template("alto")
-        self.schema = os.path.join(_SCHEMA_DIR, "alto-4-4.xsd")
 
     def _serialize(self, page: PageNode, **metadata) -> str:
+        return self.template.render(self._context(page, **metadata))
+
+    def _stream(self, page: PageNode, **metadata) -> Iterator[str]:
+        return self.template.generate(self._context(page, **metadata))
+
+    def _context(self, page: PageNode, **metadata) -> dict:
         # Find all nodes that correspond to Alto TextBlock elements and
         # their location (if available). A TextBlock is a region whose
         # children are text lines (and not other regions). If the node's
@@ -134,29 +205,17 @@ class AltoXML(Serializer):
             if node.is_region() and all(child.text for child in node):
                 text_blocks[node.get(REGION_KEY, RegionLocation.PRINTSPACE)].append(node)
 
-        return self.template.render(
-            page=page,
-            printspace=text_blocks[RegionLocation.PRINTSPACE],
-            top_margin=text_blocks[RegionLocation.MARGIN_TOP],
-            bottom_margin=text_blocks[RegionLocation.MARGIN_BOTTOM],
-            left_margin=text_blocks[RegionLocation.MARGIN_LEFT],
-            right_margin=text_blocks[RegionLocation.MARGIN_RIGHT],
-            metadata=get_metadata(),
-            processing_steps=metadata.pop("processing_steps", []),
-            xmlescape=xmlescape
-        )
-
-    def validate(self, doc: str) -> None:
-        """Validate `doc` against the current schema
-
-        Arguments:
-            doc: Input document
-
-        Raises:
-            xmlschema.XMLSchemaValidationError if the document violates
-            the current schema.
-        """
-        xmlschema.validate(doc, self.schema)
+        return {
+            "page": page,
+            "printspace": text_blocks[RegionLocation.PRINTSPACE],
+            "top_margin": text_blocks[RegionLocation.MARGIN_TOP],
+            "bottom_margin": text_blocks[RegionLocation.MARGIN_BOTTOM],
+            "left_margin": text_blocks[RegionLocation.MARGIN_LEFT],
+            "right_margin": text_blocks[RegionLocation.MARGIN_RIGHT],
+            "metadata": get_metadata(),
+            "processing_steps": metadata.pop("processing_steps", []),
+            "xmlescape": xmlescape,
+        }
 
 
 class PageXML(Serializer):
@@ -166,82 +225,273 @@ class PageXML(Serializer):
 
     Page files require at least one level of segmentation. Pages without
     segmentation will not result in an output file (since Page XML cannot
-    be empty).
+    be empty). The exception is pages that were skipped by an earlier
+    step (see `PageNode.skip`), which are written as empty pages. The
+    skip and its reason are recorded in the Page element's `custom`
+    attribute as "skipped {reason:<reason>;}", and restored on import,
+    see `importers.parse_page`.
     """
 
     extension = ".xml"
     format_name = "page"
+    schema = os.path.join(_SCHEMA_DIR, "pagecontent.xsd")
 
     def __init__(self):
         env = Environment(loader=FileSystemLoader([_TEMPLATES_DIR, "."]))
         self.template = env.get_template("page")
-        self.schema = os.path.join(_SCHEMA_DIR, "pagecontent.xsd")
 
     def _serialize(self, page: PageNode, **metadata):
-        if page.is_leaf():
+        if page.is_leaf() and not page.is_skipped():
             return None
+        return self.template.render(self._context(page))
 
-        return self.template.render(
-            page=page,
-            TEXT_RESULT_KEY=TEXT_RESULT_KEY,
-            metadata=get_metadata(),
-            is_text_line=lambda node: node.is_line(),
-        )
-
-    def validate(self, doc: str) -> None:
-        """Validate `doc` against the current schema
-
-        Arguments:
-            doc: Input document
-
-        Raises:
-            xmlschema.XMLSchemaValidationError if the document violates
-            the current schema.
-        """
-        xmlschema.validate(doc, self.schema)
+    def _stream(self, page: PageNode, **metadata):
+        if page.is_leaf() and not page.is_skipped():
+            return None
+        return self.template.generate(self._context(page))
+
+    def _context(self, page: PageNode) -> dict:
+        return {
+            "page": page,
+            "TEXT_RESULT_KEY": TEXT_RESULT_KEY,
+            "metadata": get_metadata(),
+            "is_text_line": lambda node: node.is_line(),
+            "custom": _page_custom(page),
+        }
+
+
+def _page_custom(page: PageNode) -> str | None:
+    """The `custom` attribute of a Page XML Page element, see `PageXML`"""
+    reason = page.skip_reason()
+    if reason is None:
+        return None
+    if reason is True:
+        return "skipped"
+    # Escape the characters that delimit the custom attribute's values
+    reason = "".join(f"\\u{ord(c):04x}" if c in "\\;{}" else c for c in str(reason))
+    return xmlescape(f"skipped {{reason:{reason};}}")
 
 
 class Json(Serializer):
-    """Simple JSON serializer"""
+    """Simple JSON serializer
+
+    The documents are written incrementally, one page at a time, so
+    exporting a collection to one file uses the same amount of memory
+    regardless of the collection's size.
+    """
 
     extension = ".json"
     format_name = "json"
 
-    def __init__(self, one_file=False, indent=4):
+    def __init__(self, one_file=False, indent=4, lines=False):
         """Initialize JSON serializer
 
         Args:
             one_file: Export all pages of the collection to the same file.
                 Defaults to False.
             indent: The output json file's indentation level
+            lines: Export the collection as JSON Lines, one page per line,
+                to a single file with extension ".jsonl". Implies
+                `one_file` and ignores `indent`. Defaults to False.
         """
-        self.one_file = one_file
-        self.indent = indent
+        self.one_file = one_file or lines
+        self.indent = None if lines else indent
+        self.lines = lines
+        self.encoder = json.JSONEncoder(default=_json_default, indent=self.indent)
 
     def _serialize(self, page: PageNode):
-        def default(obj):
-            return {k: v for k, v in obj.__dict__.items() if k not in ["mask", "_image", "parent"]}
+        # JSONEncoder.encode uses the C accelerated encoder (if indent is
+        # None), which is considerably faster than iterencode. A single
+        # page is small enough to be encoded in one piece.
+        return self.encoder.encode(page.asdict())
+
+    def stream_collection(self, collection: Collection, **metadata):
+        if not self.one_file:
+            return super().stream_collection(collection)
 
-        return json.dumps(page.asdict(), default=default, indent=self.indent)
+        if self.lines:
+            return iter([(self._stream_lines(collection), collection.label + ".jsonl")])
+        return iter([(self._stream_one_file(collection), collection.label + self.extension)])
 
-    def serialize_collection(self, collection: Collection):
-        if self.one_file:
-            pages = [json.loads(self._serialize(page)) for page in collection]
-            doc = json.dumps({"collection_label": collection.label, "pages": pages}, indent=self.indent)
-            filename = collection.label + self.extension
-            return [(doc, filename)]
-        return super().serialize_collection(collection)
+    def _stream_lines(self, collection: Collection) -> Iterator[str]:
+        for page in collection:
+            yield self._serialize(page) + "\n"
+
+    def _stream_one_file(self, collection: Collection) -> Iterator[str]:
+        # Produces the same output as json.dumps({"collection_label": ...,
+        # "pages": [...]}, indent=self.indent) without holding more than
+        # one page in memory. The pages are nested two levels deep, so
+        # each line break within a page is followed by two extra levels
+        # of indentation. (Line breaks never occur inside JSON strings,
+        # where they are escaped.)
+        if self.indent is None:
+            newline, indent, item_separator = "", "", ", "
+        else:
+            indent = " " * self.indent if isinstance(self.indent, int) else self.indent
+            newline, item_separator = "\n", ","
+
+        def nested(level):
+            return newline + indent * level
+
+        yield "{" + nested(1) + '"collection_label": ' + json.dumps(collection.label) + item_separator
+        yield nested(1) + '"pages": ['
+        for i, page in enumerate(collection):
+            yield (item_separator if i else "") + nested(2)
+            doc = self._serialize(page)
+            yield doc.replace("\n", nested(2)) if newline else doc
+        yield (nested(1) if collection.pages else "") + "]" + nested(0) + "}"
 
 
 class PlainText(Serializer):
     extension = ".txt"
     format_name = "txt"
 
-    def _serialize(self, page: PageNode) -> str:
+    def _serialize(self, page: PageNode, **metadata) -> str:
+        if page.is_skipped():
+            return ""
         lines = page.traverse(lambda node: node.is_leaf())
         return "\n".join(line.text for line in lines)
 
 
+def _json_default(obj):
+    """Fallback encoder for objects that are not JSON serializable
+
+    The most common objects (segments, bounding boxes, polygons and
+    recognized texts) are converted directly by type, which is much
+    faster than the generic attribute lookup.
+    """
+    encode = _JSON_ENCODERS.get(type(obj))
+    if encode is not None:
+        return encode(obj)
+    return {k: v for k, v in _attributes(obj).items() if k not in ["mask", "_image", "parent"]}
+
+
+_JSON_ENCODERS = {
+    Segment: lambda segment: {
+        "bbox": segment.bbox,
+        "polygon": segment.polygon,
+        "score": segment.score,
+        "class_label": segment.class_label,
+        "orig_shape": segment.orig_shape,
+    },
+    Bbox: lambda bbox: {"xmin": bbox.xmin, "ymin": bbox.ymin, "xmax": bbox.xmax, "ymax": bbox.ymax},
+    Polygon: lambda polygon: {"points": [{"x": x, "y": y} for x, y in polygon.as_nparray().tolist()]},
+    Point: lambda point: {"x": point.x, "y": point.y},
+    RecognizedText: lambda text: {"texts": text.texts, "scores": text.scores},
+}
+
+
+def _attributes(obj) -> dict:
+    """Return the attributes of `obj` as a dictionary
+
+    Works like `vars(obj)` but also supports objects that use
+    `__slots__` instead of an instance dictionary.
+    """
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    slots = (slot for cls in type(obj).__mro__ for slot in getattr(cls, "__slots__", ()))
+    return {slot: getattr(obj, slot) for slot in slots if hasattr(obj, slot)}
+
+
+@lru_cache(maxsize=None)
+def load_schema(path: str) -> xmlschema.XMLSchema:
+    """Load and compile an XML schema
+
+    Compiling a schema such as ALTO or PAGE is much more expensive than
+    validating a document against it. The compiled schema is therefore
+    cached and shared by all serializers in the process.
+
+    Arguments:
+        path: Path to an XSD file
+    """
+    logger.info("Compiling XML schema %s", path)
+    return xmlschema.XMLSchema(path)
+
+
+@dataclass
+class ValidationReport:
+    """Summary of a collection validation
+
+    Attributes:
+        n_documents: The number of validated documents.
+        errors: A mapping filename -> error message of the documents
+            that did not pass validation.
+    """
+
+    n_documents: int
+    errors: dict[str, str]
+
+    @property
+    def valid(self) -> bool:
+        """True if all documents passed validation"""
+        return not self.errors
+
+    def __str__(self) -> str:
+        lines = [f"{self.n_documents - len(self.errors)} of {self.n_documents} documents are valid"]
+        lines.extend(f"  {filename}: {error}" for filename, error in self.errors.items())
+        return "\n".join(lines)
+
+
+def validate_collection(
+    collection: Collection, serializer: str | Serializer, processes: int | None = None, **metadata
+) -> ValidationReport:
+    """Serialize and validate a collection
+
+    The documents are validated in parallel by a pool of worker
+    processes. Each worker compiles the schema once and reuses it for
+    all documents it validates.
+
+    Arguments:
+        collection: Input collection
+        serializer: What serializer to use. Takes a Serializer instance
+            or the name of the serializer as a string, see
+            serialization.supported_formats() for supported formats.
+        processes: Number of worker processes. Defaults to the number
+            of CPUs. With processes=1, the documents are validated in
+            the current process.
+
+    Returns:
+        A ValidationReport listing the documents that did not pass
+        validation.
+    """
+    if isinstance(serializer, str):
+        serializer = get_serializer(serializer)
+
+    outputs = serializer.serialize_collection(collection, **metadata)
+    if serializer.schema is None or not outputs:
+        return ValidationReport(len(outputs), {})
+
+    docs = [doc for doc, _ in outputs]
+    schemas = [serializer.schema] * len(docs)
+    if processes == 1 or len(docs) == 1:
+        results = list(map(_validate_document, docs, schemas))
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(_validate_document, docs, schemas, chunksize=8))
+
+    errors = {filename: error for (_, filename), error in zip(outputs, results) if error is not None}
+    report = ValidationReport(len(outputs), errors)
+    if errors:
+        logger.warning("Validation failed for %d of %d documents", len(errors), len(outputs))
+    return report
+
+
+def _validate_document(doc: str, schema: str) -> str | None:
+    """Validate `doc` against `schema`, returns the error message if it fails
+
+    Malformed documents are reported like schema violations instead of
+    raising, so that one broken document doesn't abort the validation
+    of the whole collection.
+    """
+    try:
+        load_schema(schema).validate(doc)
+    except xmlschema.XMLSchemaValidationError as e:
+        return e.reason or str(e)
+    except (ElementTree.ParseError, xmlschema.XMLResourceError) as e:
+        return f"Malformed document: {e}"
+    return None
+
+
 def get_metadata() -> dict:
     timestamp = datetime.utcnow().isoformat()
 
@@ -288,27 +538,77 @@ def pickle_collection(collection: Collection, directory: str = ".cache", filenam
     return path
 
 
-def save_collection(collection: Collection, serializer: str | Serializer, dest: str, **metadata):
+def save_collection(
+    collection: Collection,
+    serializer: str | Serializer,
+    dest: str | ShardedArchive,
+    compress: bool = False,
+    **metadata,
+) -> list[str]:
     """Serialize and save collection
 
+    The documents are streamed to disk one at a time, see
+    `Serializer.stream_collection`.
+
     Arguments:
         collection: Input collection
         serializer: What serializer to use. Takes a Serializer instance
             or the name of the serializer as a string, see
             serialization.supported_formats() for supported formats.
-        dest: Output directory
+        dest: Output directory, or a ShardedArchive to which the
+            documents are added instead of being written as separate
+            files. The archive's index uses the documents' filenames
+            (without extension) as labels.
+        compress: If True, the documents are gzip-compressed and ".gz"
+            is appended to their filenames.
+
+    Returns:
+        The paths of the written files (or the names of the archive
+        entries).
     """
+    return list(iter_save_collection(collection, serializer, dest, compress, **metadata))
+
 
+def iter_save_collection(
+    collection: Collection,
+    serializer: str | Serializer,
+    dest: str | ShardedArchive,
+    compress: bool = False,
+    **metadata,
+) -> Iterator[str]:
+    """Serialize and save collection, one document at a time
+
+    Like `save_collection`, but yields the path of each document as
+    soon as it has been written.
+    """
     if isinstance(serializer, str):
         serializer = get_serializer(serializer)
         logger.info("Using %s serializer with default settings", serializer.__class__.__name__)
 
-    for doc, filename in serializer.serialize_collection(collection, **metadata):
+    for chunks, filename in serializer.stream_collection(collection, **metadata):
+        if isinstance(dest, ShardedArchive):
+            data = b"".join(chunks) if serializer.binary else "".join(chunks).encode("utf-8")
+            label = os.path.splitext(os.path.basename(filename))[0]
+            if compress:
+                data = gzip.compress(data)
+                filename += ".gz"
+            dest.add(filename, data, label=label)
+            yield filename
+            continue
+
         filename = os.path.join(dest, filename)
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "w") as f:
-            f.write(doc)
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        mode = "wb" if serializer.binary else "wt"
+        encoding = None if serializer.binary else "utf-8"
+        if compress:
+            filename += ".gz"
+            f = gzip.open(filename, mode, encoding=encoding)
+        else:
+            f = open(filename, mode, encoding=encoding)
+        with f:
+            f.writelines(chunks)
         logger.info("Wrote document to %s", filename)
+        yield filename
 
 
 def xmlescape(s: str) -> str:
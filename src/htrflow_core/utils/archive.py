@@ -0,0 +1,150 @@
+"""
+Sharded archive writer
+
+Writing one file per page, region, line or word produces a very large
+number of small files, which is slow on network filesystems and may
+exhaust the filesystem's inodes. `ShardedArchive` instead appends the
+files to a series of tar or zip archives ("shards") of bounded size,
+and writes an index that maps each entry to its shard and byte offset.
+
+Example:
+```
+>>> with ShardedArchive("output", format="tar", shard_size=10**9) as archive:
+...     archive.add("page_1/line_1.jpg", data, label="page_1_line_1")
+```
+This creates output/shard-00000.tar (followed by shard-00001.tar etc.
+once the first shard is full) and output/index.jsonl.
+"""
+
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+import zipfile
+from typing import Literal
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.jsonl"
+
+
+class ShardedArchive:
+    """A writer of rolling tar or zip shards
+
+    Each entry is recorded in the index file (JSON Lines) as
+        {"label": ..., "name": ..., "shard": ..., "offset": ..., "size": ...}
+    where `offset` is the byte offset of the entry's data within the
+    shard. The entries are stored uncompressed, so an entry can be read
+    directly with a seek to `offset` followed by a read of `size` bytes.
+    """
+
+    def __init__(
+        self,
+        dest: str,
+        format: Literal["tar", "zip"] = "tar",
+        shard_size: int = 1_000_000_000,
+        prefix: str = "shard",
+    ):
+        """Create a sharded archive
+
+        Arguments:
+            dest: Output directory.
+            format: Archive format, "tar" or "zip". Defaults to "tar".
+            shard_size: Approximate maximum size of each shard, in bytes.
+                A new shard is started when the next entry would exceed
+                the limit. Entries larger than the limit get a shard of
+                their own. Defaults to 1 GB.
+            prefix: Filename prefix of the shards. Defaults to "shard".
+        """
+        if format not in ("tar", "zip"):
+            raise ValueError(f"Unsupported archive format '{format}', expected 'tar' or 'zip'")
+        os.makedirs(dest, exist_ok=True)
+        self.dest = dest
+        self.format = format
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.n_shards = 0
+        self.n_entries = 0
+        self._shard = None
+        self._shard_name = None
+        self._file = None
+        self._index = open(os.path.join(dest, INDEX_FILE), "w")
+
+    def add(self, name: str, data: bytes, label: str | None = None) -> None:
+        """Add an entry to the archive
+
+        Arguments:
+            name: The entry's path within the archive.
+            data: The entry's content.
+            label: Key of the entry in the index. Defaults to `name`.
+        """
+        if self._shard is None or (self._file.tell() > 0 and self._file.tell() + len(data) > self.shard_size):
+            self._next_shard()
+
+        if self.format == "tar":
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._shard.addfile(info, io.BytesIO(data))
+            # The data is followed by padding up to the next full block
+            offset = self._shard.offset - -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        else:
+            self._shard.writestr(name, data)
+            # The entries are stored uncompressed and the shard is seekable
+            # (so no data descriptor follows the data), which means that the
+            # entry's data ends at the current position
+            offset = self._file.tell() - len(data)
+
+        entry = {"label": label or name, "name": name, "shard": self._shard_name, "offset": offset, "size": len(data)}
+        self._index.write(json.dumps(entry) + "\n")
+        self.n_entries += 1
+
+    def close(self) -> None:
+        """Close the current shard and the index"""
+        self._close_shard()
+        self._index.close()
+        logger.info("Wrote %d entries to %d shard(s) in %s", self.n_entries, self.n_shards, self.dest)
+
+    def _next_shard(self) -> None:
+        self._close_shard()
+        self._shard_name = f"{self.prefix}-{self.n_shards:05d}.{self.format}"
+        self._file = open(os.path.join(self.dest, self._shard_name), "wb")
+        if self.format == "tar":
+            self._shard = tarfile.open(fileobj=self._file, mode="w", format=tarfile.PAX_FORMAT)
+        else:
+            self._shard = zipfile.ZipFile(self._file, mode="w", compression=zipfile.ZIP_STORED)
+        self.n_shards += 1
+
+    def _close_shard(self) -> None:
+        if self._shard is not None:
+            self._shard.close()
+            self._file.close()
+            self._shard = self._file = None
+
+    def __enter__(self) -> "ShardedArchive":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def read_entry(dest: str, entry: dict) -> bytes:
+    """Read an entry of a sharded archive
+
+    Arguments:
+        dest: The archive's directory.
+        entry: The entry's record in the index.
+    """
+    with open(os.path.join(dest, entry["shard"]), "rb") as f:
+        f.seek(entry["offset"])
+        return f.read(entry["size"])
+
+
+def read_index(dest: str) -> dict[str, dict]:
+    """Read the index of a sharded archive as a mapping label -> entry"""
+    with open(os.path.join(dest, INDEX_FILE)) as f:
+        entries = (json.loads(line) for line in f)
+        return {entry["label"]: entry for entry in entries}
@@ -2,8 +2,8 @@
 Geometry utilities
 """
 import logging
-from dataclasses import astuple, dataclass
-from typing import Iterable, Iterator, Sequence, TypeAlias
+from dataclasses import dataclass
+from typing import Iterable, Iterator, TypeAlias
 
 import cv2
 import numpy as np
@@ -15,7 +15,7 @@ logger = logging.getLogger(__name__)
 Mask: TypeAlias = npt.NDArray[np.uint8]
 
 
-@dataclass
+@dataclass(slots=True)
 class Point:
     """Class representing a point
 
@@ -39,7 +39,7 @@ class Point:
 
     def __iter__(self) -> Iterator[int]:
         # Enables tuple-like iteration and unpacking
-        return iter(astuple(self))
+        return iter((self.x, self.y))
 
     def __getitem__(self, i: int) -> int:
         # Enables tuple-like indexing
@@ -69,7 +69,7 @@ class Point:
         return Point(int(self.x * factor), int(self.y * factor))
 
 
-@dataclass
+@dataclass(slots=True)
 class Bbox:
     """Bounding box class
 
@@ -195,22 +195,193 @@ class Bbox:
         return self.xyxy[i]
 
 
+class BboxArray:
+    """Bounding box array class
+
+    A columnar representation of N bounding boxes, stored as an (N, 4)
+    int32 numpy array of (xmin, ymin, xmax, ymax) rows. All geometric
+    operations are vectorized over the boxes. The array can be iterated
+    and indexed like a sequence of `Bbox` instances:
+    ```python
+    >>> bboxes = BboxArray([Bbox(0, 0, 10, 10), (5, 5, 20, 20)])
+    >>> bboxes[1]
+    Bbox(xmin=5, ymin=5, xmax=20, ymax=20)
+    >>> bboxes.area
+    array([100, 225])
+    ```
+
+    Methods that take another set of boxes (`intersection_area`, `iou`,
+    `containment`) accept either a single `Bbox`, which gives one value
+    per box, or another `BboxArray` of M boxes, which gives an (N, M)
+    matrix of pairwise values.
+    """
+
+    __slots__ = ("_coords",)
+
+    _coords: npt.NDArray[np.int32]
+
+    def __init__(self, bboxes: "Iterable[Bbox | Iterable[int]] | npt.ArrayLike | BboxArray"):
+        """Create a BboxArray
+
+        Arguments:
+            bboxes: The bounding boxes, as `Bbox` instances, as
+                (xmin, ymin, xmax, ymax) tuples or as an (N, 4) array.
+        """
+        if isinstance(bboxes, BboxArray):
+            coords = bboxes._coords
+        else:
+            if not isinstance(bboxes, np.ndarray):
+                bboxes = [bbox.xyxy if isinstance(bbox, Bbox) else tuple(bbox) for bbox in bboxes]
+            coords = np.array(bboxes, dtype=np.int32).reshape(-1, 4)
+            coords.flags.writeable = False
+        self._coords = coords
+
+    @property
+    def xmin(self) -> npt.NDArray[np.int32]:
+        return self._coords[:, 0]
+
+    @property
+    def ymin(self) -> npt.NDArray[np.int32]:
+        return self._coords[:, 1]
+
+    @property
+    def xmax(self) -> npt.NDArray[np.int32]:
+        return self._coords[:, 2]
+
+    @property
+    def ymax(self) -> npt.NDArray[np.int32]:
+        return self._coords[:, 3]
+
+    @property
+    def height(self) -> npt.NDArray[np.int32]:
+        """Heights of the bounding boxes"""
+        return self.ymax - self.ymin
+
+    @property
+    def width(self) -> npt.NDArray[np.int32]:
+        """Widths of the bounding boxes"""
+        return self.xmax - self.xmin
+
+    @property
+    def area(self) -> npt.NDArray[np.int64]:
+        """Areas of the bounding boxes"""
+        return self.height.astype(np.int64) * self.width
+
+    @property
+    def center(self) -> npt.NDArray[np.int32]:
+        """Centers of the bounding boxes as an (N, 2) array, rounded down like `Bbox.center`"""
+        return ((self._coords[:, :2] + self._coords[:, 2:]) / 2).astype(np.int32)
+
+    def move(self, dest: Point | tuple[int, int]) -> "BboxArray":
+        """Move all bounding boxes `dest`, see `Bbox.move`"""
+        dx, dy = dest
+        return BboxArray(self._coords + np.array([dx, dy, dx, dy], dtype=np.int32))
+
+    def rescale(self, factor: float) -> "BboxArray":
+        """Rescale all bounding boxes by `factor`, see `Bbox.rescale`"""
+        return BboxArray(self._coords * factor)
+
+    def intersects(self, other: "Bbox | BboxArray") -> npt.NDArray[np.bool_]:
+        """Check which boxes intersect `other`, see `Bbox.intersects`"""
+        a, b, squeeze = self._pairwise(other)
+        result = ~(
+            (a[..., 2] < b[..., 0]) | (a[..., 0] > b[..., 2]) | (a[..., 3] < b[..., 1]) | (a[..., 1] > b[..., 3])
+        )
+        return result[:, 0] if squeeze else result
+
+    def intersection_area(self, other: "Bbox | BboxArray") -> npt.NDArray[np.int64]:
+        """Area of the intersection between the boxes and `other`
+
+        Boxes that don't intersect `other` get an intersection area of 0.
+        """
+        a, b, squeeze = self._pairwise(other)
+        width = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+        height = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+        result = np.clip(width, 0, None).astype(np.int64) * np.clip(height, 0, None)
+        return result[:, 0] if squeeze else result
+
+    def iou(self, other: "Bbox | BboxArray") -> npt.NDArray[np.float64]:
+        """Intersection over union between the boxes and `other`"""
+        intersection = self.intersection_area(other)
+        other_area = BboxArray([other]).area if isinstance(other, Bbox) else other.area[np.newaxis, :]
+        area = self.area if isinstance(other, Bbox) else self.area[:, np.newaxis]
+        union = area + other_area - intersection
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(union > 0, intersection / union, 0.0)
+
+    def containment(self, other: "Bbox | BboxArray") -> npt.NDArray[np.float64]:
+        """Fraction of each box's area that lies within `other`"""
+        intersection = self.intersection_area(other)
+        area = self.area if isinstance(other, Bbox) else self.area[:, np.newaxis]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(area > 0, intersection / area, 0.0)
+
+    def _pairwise(self, other: "Bbox | BboxArray") -> tuple[np.ndarray, np.ndarray, bool]:
+        # Returns broadcastable (N, 1, 4) and (1, M, 4) arrays and whether
+        # the M axis should be squeezed (when `other` is a single Bbox)
+        squeeze = isinstance(other, Bbox)
+        other_coords = BboxArray([other] if squeeze else other)._coords
+        return self._coords[:, np.newaxis, :], other_coords[np.newaxis, :, :], squeeze
+
+    def as_nparray(self) -> npt.NDArray[np.int32]:
+        """The boxes as a read-only (N, 4) array of (xmin, ymin, xmax, ymax) rows"""
+        return self._coords
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        # Enables np.asarray(bboxes)
+        return self._coords if dtype is None else self._coords.astype(dtype)
+
+    def __iter__(self) -> Iterator[Bbox]:
+        return (Bbox(*bbox) for bbox in self._coords.tolist())
+
+    def __getitem__(self, i):
+        # Integer indexing gives a Bbox, any other numpy index gives a BboxArray
+        if isinstance(i, (int, np.integer)):
+            return Bbox(*self._coords[i].tolist())
+        return BboxArray(self._coords[i])
+
+    def __len__(self) -> int:
+        return len(self._coords)
+
+    def __repr__(self) -> str:
+        return f"BboxArray({self._coords.tolist()})"
+
+
 class Polygon:
     """Polygon class
 
-    This class represents a polygon as a sequence of `Point` instances.
+    This class represents a polygon as a sequence of points. The points
+    are stored in an (N, 2) int32 numpy array of [x, y] coordinates, but
+    the polygon can be iterated and indexed as a sequence of `Point`
+    instances.
+
+    Polygons are immutable: `move` and `rescale` return new polygons.
     """
 
-    points: Sequence[Point]
+    __slots__ = ("_coords",)
+
+    _coords: npt.NDArray[np.int32]
 
-    def __init__(self, points: Iterable[tuple[int, int] | Point]):
+    def __init__(self, points: "Iterable[tuple[int, int] | Point] | npt.ArrayLike | Polygon"):
         """Create a Polygon
 
         Attributes:
-            points: The points defining the polygon, as either tuples
-                or `Point` instances.
+            points: The points defining the polygon, as either tuples,
+                `Point` instances or an (N, 2) array of coordinates.
         """
-        self.points = [Point(*point) for point in points]
+        if isinstance(points, Polygon):
+            coords = points._coords
+        else:
+            if not isinstance(points, np.ndarray):
+                points = [tuple(point) for point in points]
+            coords = np.array(points, dtype=np.int32).reshape(-1, 2)
+            coords.flags.writeable = False
+        self._coords = coords
+
+    @property
+    def points(self) -> list[Point]:
+        """The points of the polygon as a list of `Point` instances"""
+        return list(self)
 
     def move(self, dest: tuple[int, int] | Point) -> "Polygon":
         """Move polygon to `dest`
@@ -222,30 +393,38 @@ class Polygon:
             A copy of the polygon with its coordinates shifted
             `dx` and `dy` in the x- and y-axis, respectively.
         """
-        return Polygon(point.move(dest) for point in self)
+        dx, dy = dest
+        return Polygon(self._coords + np.array([dx, dy], dtype=np.int32))
 
     def bbox(self) -> Bbox:
         """The smallest bounding box that encloses the polygon"""
-        xs = [x for x, _ in self]
-        ys = [y for _, y in self]
-        return Bbox(min(xs), min(ys), max(xs), max(ys))
+        xmin, ymin = self._coords.min(axis=0).tolist()
+        xmax, ymax = self._coords.max(axis=0).tolist()
+        return Bbox(xmin, ymin, xmax, ymax)
 
     def as_nparray(self) -> npt.NDArray[np.int32]:
-        """The polygon as a [[x1, y1], ..., [xn, yn]] numpy array"""
-        return np.array([[x, y] for x, y in self], dtype=np.int32)
+        """The polygon as a [[x1, y1], ..., [xn, yn]] numpy array
+
+        The returned array is a read-only view of the polygon's points.
+        """
+        return self._coords
 
     def rescale(self, factor: float) -> "Polygon":
         """Rescale polygon by multiplying its points with `factor`"""
-        return Polygon([p.rescale(factor) for p in self])
+        return Polygon(self._coords * factor)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        # Enables np.asarray(polygon)
+        return self._coords if dtype is None else self._coords.astype(dtype)
 
     def __iter__(self) -> Iterator[Point]:
-        return iter(self.points)
+        return (Point(x, y) for x, y in self._coords.tolist())
 
     def __getitem__(self, i: int) -> Point:
-        return self.points[i]
+        return Point(*self._coords[i].tolist())
 
     def __len__(self) -> int:
-        return len(self.points)
+        return len(self._coords)
 
 
 def mask2polygon(mask: Mask, epsilon: float = 0.005) -> Polygon:
@@ -279,7 +458,7 @@ def mask2polygon(mask: Mask, epsilon: float = 0.005) -> Polygon:
         squeezed = np.squeeze(approx)
         if squeezed.ndim == 1:
             continue
-        polygons.append(Polygon(squeezed.tolist()))
+        polygons.append(Polygon(squeezed))
 
     if len(polygons) > 1:
         logger.warning("Mask is not connected. Using the largest connected component")
@@ -127,6 +127,88 @@ def binarize(image: npt.NDArray[Any]) -> npt.NDArray[Any]:
     return cv2.cvtColor(threshold, cv2.COLOR_GRAY2BGR)
 
 
+def dhash(image: npt.NDArray[Any], size: int = 8) -> int:
+    """Difference hash of image
+
+    A perceptual hash: the image is converted to grayscale, shrunk to
+    (size) x (size + 1) pixels, and each bit of the hash tells whether a
+    pixel is brighter than its right neighbour. Visually similar images
+    get hashes with a small Hamming distance.
+
+    Arguments:
+        image: Input image
+        size: Hash side length, gives a hash of size * size bits.
+            Defaults to 8 (a 64-bit hash).
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def batch_normalize(
+    images: list[npt.NDArray[Any]],
+    shape: tuple[int, int],
+    mean: list[float],
+    std: list[float],
+    rescale_factor: float = 1 / 255,
+    out: npt.NDArray[np.float32] | None = None,
+) -> npt.NDArray[np.float32]:
+    """Resize and normalize images into one batch
+
+    A vectorized version of the resize, rescale and normalize steps of
+    a huggingface image processor. Each image is resized with bilinear
+    interpolation (area interpolation along the axes that are shrunk,
+    which approximates PIL's antialiasing) and written directly into
+    the batch, with the rescaling and normalization fused into one
+    multiply-add:
+
+        out = (image * rescale_factor - mean) / std
+
+    The channel order is kept as-is.
+
+    Arguments:
+        images: Input images
+        shape: Output image shape as a (height, width) tuple
+        mean: Per-channel mean
+        std: Per-channel standard deviation
+        rescale_factor: Factor applied to the pixel values before
+            normalization. Defaults to 1/255.
+        out: Optional preallocated float32 array of shape
+            (len(images), len(mean), height, width) to write to.
+
+    Returns:
+        A float32 array of shape (len(images), len(mean), height, width).
+    """
+    height, width = shape
+    mean = np.asarray(mean, dtype=np.float32)
+    std = np.asarray(std, dtype=np.float32)
+    factor = (rescale_factor / std)[:, None, None]
+    offset = (-mean / std)[:, None, None]
+    if out is None:
+        out = np.empty((len(images), len(mean), height, width), dtype=np.float32)
+
+    for image, dst in zip(images, out):
+        resized = _resize_bilinear(image, width, height)
+        if resized.ndim == 2:
+            # Grayscale, broadcast to all channels
+            resized = resized[..., None]
+        np.multiply(resized.transpose(2, 0, 1), factor, out=dst)
+        dst += offset
+    return out
+
+
+def _resize_bilinear(image: npt.NDArray[Any], width: int, height: int) -> npt.NDArray[Any]:
+    """Resize image one axis at a time, using area interpolation when shrinking"""
+    h, w = image.shape[:2]
+    if w != width:
+        image = cv2.resize(image, (width, h), interpolation=cv2.INTER_AREA if width < w else cv2.INTER_LINEAR)
+    if h != height:
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA if height < h else cv2.INTER_LINEAR)
+    return image
+
+
 def is_http_url(string: str) -> bool:
     """Check if the string is a valid HTTP URL."""
     return re.match(r"^https?://", string, re.IGNORECASE) is not None
@@ -141,11 +223,21 @@ def _is_valid_url(url: str) -> bool:
         return False
 
 
-def read(source: str | npt.NDArray[Any]) -> npt.NDArray[Any]:
+_REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def read(source: str | npt.NDArray[Any], reduction: int = 1) -> npt.NDArray[Any]:
     """Read an image from a URL, a local path, or directly use a numpy array as an OpenCV image.
 
     Args:
         source: The source can be a URL, a local filesystem path, or a numpy array representing an image.
+        reduction: Read the image at 1/2, 1/4 or 1/8 of its size (2, 4 or 8). Decoding
+            a JPEG at reduced size is much faster than decoding it in full. Defaults to 1.
 
     Returns:
         np.ndarray: Image in OpenCV format.
@@ -161,6 +253,10 @@ def read(source: str | npt.NDArray[Any]) -> npt.NDArray[Any]:
     if isinstance(source, np.ndarray):
         return source
 
+    if reduction not in _REDUCED_READ_FLAGS:
+        raise ValueError(f"Unsupported reduction {reduction}, expected one of {list(_REDUCED_READ_FLAGS)}")
+    flags = _REDUCED_READ_FLAGS[reduction]
+
     error_msg = f"Could not load an image from {source}. "
 
     # Try to load from URL
@@ -169,13 +265,13 @@ def read(source: str | npt.NDArray[Any]) -> npt.NDArray[Any]:
             raise ImageImportError(error_msg + "The URL is invalid or unreachable.")
         resp = requests.get(source, stream=True).raw
         image_arr = np.asarray(bytearray(resp.read()), dtype=np.uint8)
-        img = cv2.imdecode(image_arr, cv2.IMREAD_COLOR)
+        img = cv2.imdecode(image_arr, flags)
         if img is None:
             raise ImageImportError(error_msg + "The URL could not be interpreted as an image.")
         return img
 
     # Try to load from filesystem
-    img = cv2.imread(source, cv2.IMREAD_COLOR)
+    img = cv2.imread(source, flags)
     if img is None:
         raise ImageImportError(error_msg + "Check that the path exists and is a valid image.")
     return img
@@ -185,5 +281,33 @@ def write(dest: str, image: npt.NDArray[Any]) -> None:
     cv2.imwrite(dest, image)
 
 
+def encode(
+    image: npt.NDArray[Any], extension: str, quality: int | None = None, png_compression: int | None = None
+) -> bytes:
+    """Encode image in the format given by `extension`
+
+    Arguments:
+        image: Input image
+        extension: Image format, for example "jpg", "png" or "webp".
+        quality: JPEG or WebP quality (0-100). Uses OpenCV's default
+            (95 for JPEG) if None.
+        png_compression: PNG compression level (0-9). Uses OpenCV's
+            default (1) if None.
+    """
+    extension = extension.lstrip(".").lower()
+    params = []
+    if quality is not None and extension in ("jpg", "jpeg"):
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif quality is not None and extension == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    elif png_compression is not None and extension == "png":
+        params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+
+    ok, buffer = cv2.imencode(f".{extension}", image, params)
+    if not ok:
+        raise ValueError(f"Could not encode image as {extension}")
+    return buffer.tobytes()
+
+
 class ImageImportError(RuntimeError):
     pass
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass
 from enum import Enum
 from typing import TYPE_CHECKING
 
 import cv2
 import numpy as np
+import numpy.typing as npt
+from numpy.lib.stride_tricks import sliding_window_view
 
-from htrflow_core.utils.geometry import Bbox
+from htrflow_core.utils.geometry import Bbox, BboxArray
 
 
 if TYPE_CHECKING:
@@ -17,7 +20,7 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
-def estimate_printspace(image: np.ndarray, window: int = 150) -> Bbox:
+def estimate_printspace(image: np.ndarray, window: int = 150, scale: float = 1.0) -> Bbox:
     """Estimate printspace of page
 
     The printspace (borrowed terminology from ALTO XML) is a
@@ -40,14 +43,28 @@ def estimate_printspace(image: np.ndarray, window: int = 150) -> Bbox:
             printspace entirely. A small window is more sensible to
             noise, and more prone to capture marignalia as printspace.
             Defaults to 150.
+        scale (float, optional): If < 1, the printspace is estimated
+            on a downscaled copy of the image (and `window` is scaled
+            accordingly). This is faster but less precise. The returned
+            bounding box is always relative to the original image.
+            Must be in (0, 1]. Defaults to 1.0.
 
     Returns:
         The estimated printspace as a bounding box. If no printspace is
         detected, a bbox that covers the entire page is returned.
     """
-    image = image.copy()
-    if image.ndim > 2:
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return _printspace(_grayscale(image), window, scale)
+
+
+def _printspace(image: np.ndarray, window: int, scale: float) -> Bbox:
+    """Estimate printspace of a grayscale image, see `estimate_printspace`"""
+    if not 0 < scale <= 1:
+        raise ValueError(f"Invalid scale {scale}, expected a value in (0, 1]")
+    if scale < 1:
+        height, width = image.shape[:2]
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        window = max(int(window * scale), 1)
 
     # Binarize the image
     _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
@@ -78,23 +95,35 @@ def estimate_printspace(image: np.ndarray, window: int = 150) -> Bbox:
         # printspace is generally darker than the average gray point.
         # Instead of taking the actual values at row/colum i, the median
         # values over a range ahead is compared with the median value of
-        for i in range(window, len(levels) - window):
-            if np.median(levels[i - window : i]) > gray > np.median(levels[i : i + window]):
-                break
-
-        for j in range(len(levels) - window, window, -1):
-            if np.median(levels[j - window : j]) < gray < np.median(levels[j : j + window]):
-                break
+        # the range behind. All rolling medians are computed at once:
+        # medians[k] is the median of levels[k : k + window], so the
+        # range behind i has median medians[i - window] and the range
+        # ahead has median medians[i].
+        i, j = len(levels), 0
+        if len(levels) >= 2 * window:
+            medians = np.median(sliding_window_view(levels, window), axis=1)
+            behind, ahead = medians[:-window], medians[window:]
+            positions = np.arange(window, len(levels) - window + 1)
+
+            starts = positions[(behind > gray) & (gray > ahead) & (positions < len(levels) - window)]
+            ends = positions[(behind < gray) & (gray < ahead) & (positions > window)]
+            if starts.size:
+                i = starts[0]
+            if ends.size:
+                j = ends[-1]
 
         if i > j:
             i = 0
             j = image.shape[1 - axis]
             logger.warning(f"Could not find printspace along axis {axis}.")
 
-        bbox[axis] = i
-        bbox[axis + 2] = j
+        bbox[axis] = int(i)
+        bbox[axis + 2] = int(j)
 
-    return Bbox(*bbox)
+    printspace = Bbox(*bbox)
+    if scale < 1:
+        return printspace.rescale(1 / scale)
+    return printspace
 
 
 def is_twopage(img, strip_width=0.1, threshold=0.2):
@@ -122,10 +151,11 @@ def is_twopage(img, strip_width=0.1, threshold=0.2):
        The location (y-coordinate in matrix notation) of the detected
        divider, if found, else None.
     """
-    img = img.copy()
-    if len(img.shape) == 3:
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return _divider(_grayscale(img), strip_width, threshold)
 
+
+def _divider(img: np.ndarray, strip_width: float, threshold: float) -> int | None:
+    """Find the two-page divider of a grayscale image, see `is_twopage`"""
     w = img.shape[1]
     middle = int(w / 2)
     half_strip = int(strip_width * w / 2)
@@ -136,10 +166,56 @@ def is_twopage(img, strip_width=0.1, threshold=0.2):
     # of the image. If no dark divider is present, the minimum value of
     # the strip should be closer to the median, i.e., around 50%.
     if np.min(strip) < np.sort(levels)[int(w * threshold)]:
-        return middle - half_strip + np.argmin(strip)
+        return middle - half_strip + int(np.argmin(strip))
     return None
 
 
+@dataclass
+class PageLayout:
+    """Result of a page layout analysis
+
+    Attributes:
+        printspace: The page's estimated printspace, see
+            `estimate_printspace`.
+        divider: The x-coordinate of the page's two-page divider, or
+            None if the page is not a two-page spread. See `is_twopage`.
+    """
+
+    printspace: Bbox
+    divider: int | None
+
+    @property
+    def is_twopage(self) -> bool:
+        return self.divider is not None
+
+
+def analyze_layout(
+    image: np.ndarray, window: int = 150, scale: float = 1.0, strip_width: float = 0.1, threshold: float = 0.2
+) -> PageLayout:
+    """Analyze the layout of a page image
+
+    Estimates the page's printspace and two-page divider in one pass,
+    converting the image to grayscale only once. Gives the same results
+    as calling `estimate_printspace` and `is_twopage` separately.
+
+    Arguments:
+        image: Input image in grayscale or BGR.
+        window: See `estimate_printspace`.
+        scale: See `estimate_printspace`.
+        strip_width: See `is_twopage`.
+        threshold: See `is_twopage`.
+    """
+    gray = _grayscale(image)
+    return PageLayout(_printspace(gray, window, scale), _divider(gray, strip_width, threshold))
+
+
+def _grayscale(image: np.ndarray) -> np.ndarray:
+    """Convert a BGR image to grayscale, grayscale images are returned as-is"""
+    if image.ndim > 2:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
 class RegionLocation(Enum):
     MARGIN_TOP = 0
     PRINTSPACE = 1
@@ -180,6 +256,37 @@ def get_region_location(printspace: Bbox, region: Bbox) -> RegionLocation:
     return RegionLocation.PRINTSPACE
 
 
+def get_region_locations(printspace: Bbox, regions: BboxArray) -> npt.NDArray[np.int_]:
+    """Get locations of `regions` relative to `printspace`
+
+    Vectorized version of `get_region_location`, which gives the same
+    location for each region.
+
+    Arguments:
+        printspace: A bounding box representing the page's printspace.
+        regions: The input regions.
+
+    Returns:
+        An array with the `RegionLocation` value of each region.
+    """
+    in_printspace = regions.containment(printspace) > 0.5
+    conditions = [
+        in_printspace,
+        regions.xmax >= printspace.xmax,
+        regions.xmin <= printspace.xmin,
+        regions.ymin <= printspace.ymin,
+        regions.ymax >= printspace.ymax,
+    ]
+    choices = [
+        RegionLocation.PRINTSPACE.value,
+        RegionLocation.MARGIN_RIGHT.value,
+        RegionLocation.MARGIN_LEFT.value,
+        RegionLocation.MARGIN_TOP.value,
+        RegionLocation.MARGIN_BOTTOM.value,
+    ]
+    return np.select(conditions, choices, default=RegionLocation.PRINTSPACE.value)
+
+
 def label_regions(collection: Collection):
     """Label collection's regions
 
@@ -194,9 +301,10 @@ def label_regions(collection: Collection):
     """
 
     for page in collection:
-        printspace = estimate_printspace(page.image)
-        for node in page:
-            node.add_data(**{REGION_KEY: get_region_location(printspace, node.bbox)})
+        printspace = page.layout().printspace
+        locations = get_region_locations(printspace, BboxArray(node.bbox for node in page))
+        for node, location in zip(page, locations.tolist()):
+            node.add_data(**{REGION_KEY: RegionLocation(location)})
 
 
 REGION_KEY = "region_location"
@@ -0,0 +1,106 @@
+"""
+Spatial index utilities
+"""
+
+from collections import defaultdict
+from typing import Generic, Iterable, Sequence, TypeVar
+
+import numpy as np
+
+from htrflow_core.utils.geometry import Bbox, BboxArray, Point
+
+
+_T = TypeVar("_T")
+
+
+class SpatialIndex(Generic[_T]):
+    """A uniform grid index over bounding boxes
+
+    Each item is registered in every grid cell its bounding box
+    overlaps. Queries only check the items registered in the cells
+    that the query overlaps, instead of scanning all items. This makes
+    queries such as "which items intersect this box?" roughly
+    proportional to the number of nearby items instead of the total
+    number of items.
+
+    Example:
+    ```
+    >>> index = SpatialIndex(["a", "b"], [Bbox(0, 0, 10, 10), Bbox(50, 50, 60, 60)])
+    >>> index.intersecting(Bbox(5, 5, 20, 20))
+    ['a']
+    ```
+
+    Query results are returned in the order the items were given.
+    """
+
+    def __init__(self, items: Sequence[_T], bboxes: Iterable[Bbox] | BboxArray, cell_size: int | None = None):
+        """Create a spatial index
+
+        Arguments:
+            items: The items to index.
+            bboxes: The bounding boxes of the items. The i:th bounding
+                box belongs to the i:th item.
+            cell_size: Side length of the grid cells. Defaults to the
+                median of the square root of the bounding box areas,
+                which keeps the number of cells per item small.
+        """
+        self.items = list(items)
+        self.bboxes = BboxArray(bboxes)
+        if len(self.items) != len(self.bboxes):
+            raise ValueError(f"Got {len(self.items)} items but {len(self.bboxes)} bounding boxes")
+
+        if cell_size is None:
+            cell_size = int(np.median(np.sqrt(self.bboxes.area))) if len(self.bboxes) else 1
+        self.cell_size = max(cell_size, 1)
+
+        self._cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+        for i, (x1, y1, x2, y2) in enumerate((self.bboxes.as_nparray() // self.cell_size).tolist()):
+            for cx in range(x1, x2 + 1):
+                for cy in range(y1, y2 + 1):
+                    self._cells[(cx, cy)].append(i)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def intersecting(self, bbox: Bbox) -> list[_T]:
+        """Items whose bounding boxes intersect `bbox` (see `Bbox.intersects`)"""
+        return [self.items[i] for i in self.intersecting_indices(bbox)]
+
+    def intersecting_indices(self, bbox: Bbox) -> list[int]:
+        """Like `intersecting`, but returns the indices of the items"""
+        x1, y1, x2, y2 = (coord // self.cell_size for coord in bbox)
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > len(self._cells):
+            # The query covers more cells than there are occupied cells,
+            # so it is cheaper to check all items directly
+            candidates = np.arange(len(self.items))
+        else:
+            candidates = self._candidates((cx, cy) for cx in range(x1, x2 + 1) for cy in range(y1, y2 + 1))
+        return candidates[self.bboxes[candidates].intersects(bbox)].tolist()
+
+    def containing(self, point: Point | tuple[int, int]) -> list[_T]:
+        """Items whose bounding boxes contain `point` (borders included)"""
+        x, y = point
+        candidates = self._candidates([(x // self.cell_size, y // self.cell_size)])
+        bboxes = self.bboxes[candidates]
+        inside = (bboxes.xmin <= x) & (x <= bboxes.xmax) & (bboxes.ymin <= y) & (y <= bboxes.ymax)
+        return [self.items[i] for i in candidates[inside].tolist()]
+
+    def nearest(self, point: Point | tuple[int, int], k: int = 1) -> list[_T]:
+        """The `k` items whose bounding boxes are closest to `point`
+
+        The distance between a point and a bounding box is zero if the
+        point is inside the box. Items at equal distance are returned in
+        index order. This query is vectorized over all items rather than
+        using the grid.
+        """
+        x, y = point
+        bboxes = self.bboxes
+        dx = np.maximum.reduce([bboxes.xmin - x, np.zeros(len(bboxes)), x - bboxes.xmax])
+        dy = np.maximum.reduce([bboxes.ymin - y, np.zeros(len(bboxes)), y - bboxes.ymax])
+        order = np.argsort(np.hypot(dx, dy), kind="stable")[:k]
+        return [self.items[i] for i in order.tolist()]
+
+    def _candidates(self, cells: Iterable[tuple[int, int]]) -> np.ndarray:
+        # Sorted, unique indices of all items registered in `cells`
+        indices = [i for cell in cells if cell in self._cells for i in self._cells[cell]]
+        return np.unique(np.array(indices, dtype=np.intp))
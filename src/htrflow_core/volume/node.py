@@ -27,6 +27,8 @@ class Node:
             tree.
     """
 
+    __slots__ = ("parent", "children", "data", "_local_label", "_global_label")
+
     parent: Self | None
     children: list[Self]
     data: dict[str, Any]
@@ -36,10 +38,15 @@ class Node:
         self.children = []
         self.data = {}
 
-        self._id = f"node{id(self)}"  # A unique ID to fall back on if labels are not set
         self._local_label = label  # A local label, may not be unique within the tree
         self._global_label: str | None = None  # A global label created by chaining the ancestors' local labels
 
+    @property
+    def _id(self) -> str:
+        # A unique ID to fall back on if labels are not set. It is created
+        # on demand to avoid storing one extra string per node.
+        return f"node{id(self)}"
+
     @property
     def label(self) -> str:
         """The node's label. May be altered with node.relabel()"""
@@ -88,7 +95,10 @@ class Node:
               └── node                     └── root_node1_node1
 
         Note that this function does not change the label of the root
-        node.
+        node. If it is called on a node that already has a global label
+        (i.e., a non-root node of a previously relabeled tree), the new
+        labels are appended to that label, so relabeling a subtree gives
+        the same labels as relabeling the entire tree.
 
         Arguments:
             label_func: A function `f(node) -> str` that returns a
@@ -110,8 +120,7 @@ class Node:
         """
         if _counter is None:
             _counter = defaultdict(lambda: count(0))
-            if self._local_label:
-                prefix += self._local_label
+            prefix += self._global_label or self._local_label or ""
 
         long_template = f"{prefix}{sep}{template}".strip(sep)
         for child in self:
@@ -261,11 +270,17 @@ class Node:
         Example: To remove all nodes at depth 2, use
             node.prune(lambda node: node.depth() == 2)
         """
-        nodes = self.traverse(filter=condition)
+        nodes = [node for node in self.traverse(filter=condition) if include_starting_node or node is not self]
+
+        # Detaching the nodes one by one would rebuild their parents'
+        # lists of children once per node. Instead, each parent's list is
+        # rebuilt once, which keeps pruning linear in the size of the tree.
+        removed = {id(node) for node in nodes}
+        parents = {id(node.parent): node.parent for node in nodes if node.parent is not None}
+        for parent in parents.values():
+            parent.children = [child for child in parent.children if id(child) not in removed]
         for node in nodes:
-            if not include_starting_node and node == self:
-                continue
-            node.detach()
+            node.parent = None
         logger.info("Removed %d nodes from the tree", len(nodes))
 
     def max_depth(self) -> int:
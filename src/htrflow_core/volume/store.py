@@ -0,0 +1,358 @@
+"""
+Collection store
+
+A versioned on-disk format for collections, meant as a replacement for
+pickling. A store is a directory of numpy arrays that together form a
+tree table: one row per node, with its parent, geometry (bounding box,
+polygon and mask) and a JSON blob with the rest of its data (text,
+scores, class labels, region locations etc.). Data values that don't
+survive a JSON roundtrip are pickled into a separate per-node blob, so
+that nothing is lost.
+
+The arrays are memory-mapped when the store is loaded, so opening a
+store is fast regardless of its size. The pages are materialized into
+`PageNode` trees when they are first accessed.
+
+Example:
+```
+>>> save_store(collection, "collection.store")
+>>> collection = load_store("collection.store")
+```
+"""
+
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+from htrflow_core.results import RecognizedText, Segment
+from htrflow_core.utils.geometry import Bbox, Polygon
+from htrflow_core.utils.layout import RegionLocation
+from htrflow_core.volume.volume import Collection, ImageNode, PageNode, SegmentNode
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+_META_FILE = "meta.json"
+
+# Data keys that are derived from the page's image path and therefore
+# not stored, see PageNode.__init__
+_PAGE_KEYS = ("page_id", "file_name", "image_path", "image_name")
+
+
+def save_store(collection: Collection, path: str) -> str:
+    """Save collection as a store
+
+    Arguments:
+        collection: Input collection
+        path: Output directory. An existing store at `path` is
+            replaced. The new store is written to a temporary directory
+            that is then moved into place, so a collection that is
+            memory-mapped from the old store stays readable.
+
+    Returns:
+        The path to the store.
+
+    Raises:
+        FileExistsError if `path` is a non-empty directory that isn't
+        a store.
+    """
+    if os.path.isdir(path) and os.listdir(path) and not is_store(path):
+        raise FileExistsError(f"{path} exists and is not a store")
+
+    table = _TableWriter()
+    page_offsets = [0]
+    for page in collection:
+        table.add_page(page)
+        page_offsets.append(len(table.parent))
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        arrays = table.arrays() | {"page_offsets": np.array(page_offsets, dtype=np.int64)}
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), array)
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "label": collection.label,
+            "label_format": collection._label_format,
+            "n_pages": len(page_offsets) - 1,
+            "n_nodes": len(table.parent),
+        }
+        with open(os.path.join(tmp, _META_FILE), "w") as f:
+            json.dump(meta, f)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    _replace_dir(tmp, path)
+
+    logger.info("Saved collection '%s' to store %s", collection.label, path)
+    return path
+
+
+def load_store(path: str) -> Collection:
+    """Load collection from a store
+
+    The store's arrays are memory-mapped and its pages are materialized
+    when they are first accessed.
+
+    Arguments:
+        path: Path to a store created by `save_store`.
+
+    Raises:
+        ValueError if the store was written by an unsupported version.
+    """
+    with open(os.path.join(path, _META_FILE)) as f:
+        meta = json.load(f)
+
+    version = meta.get("format_version")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported store format version {version} in {path} (expected {FORMAT_VERSION})")
+
+    arrays = {
+        file[: -len(".npy")]: np.load(os.path.join(path, file), mmap_mode="r")
+        for file in os.listdir(path)
+        if file.endswith(".npy")
+    }
+    collection = Collection([], label=meta["label"], label_format=meta["label_format"])
+    collection.pages = _StoredPages(arrays, meta["label_format"])
+    logger.info("Loaded collection '%s' (%d pages) from store %s", collection.label, meta["n_pages"], path)
+    return collection
+
+
+def is_store(path: str) -> bool:
+    """True if `path` is a store directory"""
+    return os.path.isfile(os.path.join(path, _META_FILE))
+
+
+class _StoredPages(Sequence):
+    """A read-only sequence of pages that are materialized on access"""
+
+    def __init__(self, arrays: dict[str, np.ndarray], label_format: dict):
+        self._arrays = arrays
+        self._label_format = label_format
+        self._pages: dict[int, PageNode] = {}
+
+    def __len__(self) -> int:
+        return len(self._arrays["page_offsets"]) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(len(self))[idx]]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("page index out of range")
+        if idx not in self._pages:
+            self._pages[idx] = self._materialize(idx)
+        return self._pages[idx]
+
+    def _materialize(self, idx: int) -> PageNode:
+        a = self._arrays
+        start, end = a["page_offsets"][idx : idx + 2].tolist()
+        data = [
+            _decode(blob, pickled)
+            for blob, pickled in zip(
+                _ragged(a["data_offsets"], a["data"], start, end),
+                _ragged(a["pickle_offsets"], a["pickle"], start, end),
+            )
+        ]
+        polygons = _ragged(a["polygon_offsets"], a["polygon"], start, end)
+        masks = _ragged(a["mask_offsets"], a["mask"], start, end)
+        path = bytes(a["page_path"][a["page_path_offsets"][idx] : a["page_path_offsets"][idx + 1]]).decode()
+
+        page = PageNode(path, shape=tuple(a["page_shape"][idx].tolist()))
+        nodes: list[ImageNode] = [page]
+        page.add_data(**data[0])
+        bboxes = a["bbox"][start:end].tolist()
+        mask_shapes = a["mask_shape"][start:end].tolist()
+        scores = a["score"][start:end].tolist()
+        for i, parent in enumerate(a["parent"][start:end].tolist()[1:], start=1):
+            node_data = data[i]
+            segment = Segment(
+                bbox=Bbox(*bboxes[i]),
+                polygon=Polygon(np.array(polygons[i])) if len(polygons[i]) else None,
+                score=None if np.isnan(scores[i]) else scores[i],
+                class_label=node_data.pop("_class_label", None),
+                orig_shape=_tuple(node_data.pop("_orig_shape", None)),
+            )
+            if mask_shapes[i][0] >= 0:
+                segment.mask = np.array(masks[i]).reshape(mask_shapes[i])
+            node = SegmentNode(segment, nodes[parent])
+            node.add_data(**node_data)
+            nodes[parent].children.append(node)
+            nodes.append(node)
+
+        page.relabel_levels(**self._label_format)
+        return page
+
+
+class _TableWriter:
+    """Collects the rows of the tree table"""
+
+    def __init__(self):
+        self.parent = []
+        self.bbox = []
+        self.score = []
+        self.data = []
+        self.pickled = []
+        self.polygons = []
+        self.masks = []
+        self.mask_shape = []
+        self.page_paths = []
+        self.page_shape = []
+
+    def add_page(self, page: PageNode) -> None:
+        self.page_paths.append(page.path.encode())
+        self.page_shape.append((page.height, page.width))
+        indices = {}
+        for node in page.traverse():
+            indices[id(node)] = len(indices)
+            if node is page:
+                self._add_row(-1, (0, 0, page.width, page.height), None, None, None, self._data(node))
+                continue
+            segment = node.segment
+            data = self._data(node)
+            if segment.class_label is not None:
+                data["_class_label"] = segment.class_label
+            if segment.orig_shape is not None:
+                data["_orig_shape"] = list(segment.orig_shape)
+            self._add_row(indices[id(node.parent)], segment.bbox, segment.score, segment.polygon, segment.mask, data)
+
+    def _add_row(self, parent, bbox, score, polygon, mask, data) -> None:
+        self.parent.append(parent)
+        self.bbox.append(tuple(bbox))
+        self.score.append(np.nan if score is None else score)
+        self.polygons.append(np.zeros((0, 2), dtype=np.int32) if polygon is None else polygon.as_nparray())
+        if mask is None:
+            self.masks.append(np.zeros(0, dtype=np.uint8))
+            self.mask_shape.append((-1, -1))
+        else:
+            self.masks.append(np.asarray(mask, dtype=np.uint8).ravel())
+            self.mask_shape.append(mask.shape[:2])
+        encoded, pickled = _encode(data)
+        self.data.append(np.frombuffer(encoded, dtype=np.uint8))
+        self.pickled.append(np.frombuffer(pickled, dtype=np.uint8))
+
+    def _data(self, node: ImageNode) -> dict[str, Any]:
+        return {key: value for key, value in node.data.items() if key not in _PAGE_KEYS and key != "segment"}
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        polygon_offsets, polygon = _pack(self.polygons, np.zeros((0, 2), dtype=np.int32))
+        mask_offsets, mask = _pack(self.masks, np.zeros(0, dtype=np.uint8))
+        data_offsets, data = _pack(self.data, np.zeros(0, dtype=np.uint8))
+        pickle_offsets, pickled = _pack(self.pickled, np.zeros(0, dtype=np.uint8))
+        page_path_offsets, page_path = _pack(
+            [np.frombuffer(path, dtype=np.uint8) for path in self.page_paths], np.zeros(0, dtype=np.uint8)
+        )
+        return {
+            "parent": np.array(self.parent, dtype=np.int32),
+            "bbox": np.array(self.bbox, dtype=np.int32).reshape(-1, 4),
+            "score": np.array(self.score, dtype=np.float64),
+            "polygon_offsets": polygon_offsets,
+            "polygon": polygon.astype(np.int32),
+            "mask_offsets": mask_offsets,
+            "mask": mask,
+            "mask_shape": np.array(self.mask_shape, dtype=np.int32).reshape(-1, 2),
+            "data_offsets": data_offsets,
+            "data": data,
+            "pickle_offsets": pickle_offsets,
+            "pickle": pickled,
+            "page_path_offsets": page_path_offsets,
+            "page_path": page_path,
+            "page_shape": np.array(self.page_shape, dtype=np.int32).reshape(-1, 2),
+        }
+
+
+def _pack(items: list[np.ndarray], empty: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Concatenate variable-length arrays into (offsets, values)"""
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in items], out=offsets[1:])
+    return offsets, np.concatenate(items) if items else empty
+
+
+def _ragged(offsets: np.ndarray, values: np.ndarray, start: int, end: int) -> list[np.ndarray]:
+    """Rows `start` to `end` of a packed variable-length array"""
+    bounds = offsets[start : end + 1].tolist()
+    return [values[i:j] for i, j in zip(bounds, bounds[1:])]
+
+
+def _tuple(value):
+    return tuple(value) if value is not None else None
+
+
+def _replace_dir(src: str, dst: str) -> None:
+    """Move directory `src` to `dst`, replacing `dst` if it exists
+
+    The old directory is moved aside before it is removed. Files that
+    are memory-mapped from it stay readable on POSIX systems, where an
+    unlinked file lives on until it is unmapped.
+    """
+    if not os.path.exists(dst):
+        os.replace(src, dst)
+        return
+    old = src + ".old"
+    os.replace(dst, old)
+    os.replace(src, dst)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _encode(data: dict[str, Any]) -> tuple[bytes, bytes]:
+    """Encode node data
+
+    Values that survive a JSON roundtrip are encoded as JSON. The rest
+    (arbitrary objects, tuples, dicts with non-string keys etc.) are
+    pickled.
+
+    Returns:
+        A tuple (json, pickled) of encoded data. `pickled` is empty if
+        all values could be encoded as JSON.
+    """
+    encoded = []
+    pickled = {}
+    for key, value in data.items():
+        try:
+            text = json.dumps(value, default=_default)
+            lossless = json.loads(text, object_hook=_object_hook) == value
+        except (TypeError, ValueError):
+            lossless = False
+        if lossless:
+            encoded.append(f"{json.dumps(key)}: {text}")
+        else:
+            pickled[key] = value
+    blob = pickle.dumps(pickled, protocol=pickle.HIGHEST_PROTOCOL) if pickled else b""
+    return ("{" + ", ".join(encoded) + "}").encode(), blob
+
+
+def _decode(blob: np.ndarray, pickled: np.ndarray) -> dict[str, Any]:
+    data = json.loads(bytes(blob), object_hook=_object_hook)
+    if len(pickled):
+        data.update(pickle.loads(bytes(pickled)))
+    return data
+
+
+def _default(obj):
+    if isinstance(obj, RecognizedText):
+        return {"__type__": "RecognizedText", "texts": obj.texts, "scores": obj.scores}
+    if isinstance(obj, RegionLocation):
+        return {"__type__": "RegionLocation", "name": obj.name}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _object_hook(obj: dict[str, Any]):
+    if obj.get("__type__") == "RecognizedText":
+        return RecognizedText(obj["texts"], obj["scores"])
+    if obj.get("__type__") == "RegionLocation":
+        return RegionLocation[obj["name"]]
+    return obj
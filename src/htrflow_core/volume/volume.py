@@ -5,23 +5,32 @@ import logging
 import os
 import pickle
 from abc import ABC, abstractmethod
-from functools import lru_cache
+from functools import lru_cache, partial
 from itertools import chain
-from typing import Generator, Iterable, Iterator, Sequence
+from typing import Callable, Generator, Iterable, Iterator, Sequence
 
 import numpy as np
 
 from htrflow_core import serialization
 from htrflow_core.results import TEXT_RESULT_KEY, RecognizedText, Result, Segment
+from htrflow_core.serialization import importers
 from htrflow_core.utils import imgproc
 from htrflow_core.utils.geometry import Bbox, Mask, Point, Polygon, mask2polygon
+from htrflow_core.utils.layout import PageLayout, analyze_layout
 from htrflow_core.volume import node
 
 
 logger = logging.getLogger(__name__)
 
+# Data key of the flag that marks a page as skipped, see `PageNode.skip`
+SKIPPED_KEY = "skipped"
+
 
 class ImageNode(node.Node, ABC):
+    # The node's height, width and coordinate are derived from its
+    # bounding box and are therefore not stored separately.
+    __slots__ = ("bbox", "mask", "polygon")
+
     parent: "ImageNode | None"
     children: list["ImageNode"]
 
@@ -36,13 +45,25 @@ class ImageNode(node.Node, ABC):
         label: str | None = None,
     ):
         super().__init__(parent=parent, label=label)
-        self.height = height
-        self.width = width
-        self.coord = coord
         self.bbox = Bbox(0, 0, width, height).move(coord)
         self.mask = mask
         self.polygon = self._compute_polygon(polygon)
 
+    @property
+    def height(self) -> int:
+        """Height of the region this node represents"""
+        return self.bbox.height
+
+    @property
+    def width(self) -> int:
+        """Width of the region this node represents"""
+        return self.bbox.width
+
+    @property
+    def coord(self) -> Point:
+        """Top left corner of the region this node represents, relative to the page"""
+        return self.bbox.p1
+
     def _compute_polygon(self, polygon: Polygon | None):
         if polygon:
             if self.parent:
@@ -119,14 +140,19 @@ class ImageNode(node.Node, ABC):
 class SegmentNode(ImageNode):
     """A node representing a segment of a page"""
 
-    segment: Segment
+    __slots__ = ()
+
     parent: ImageNode
 
     def __init__(self, segment: Segment, parent: ImageNode):
         bbox = segment.bbox.move(parent.coord)
         super().__init__(bbox.height, bbox.width, bbox.p1, segment.polygon, segment.mask, parent)
         self.add_data(segment=segment)
-        self.segment = segment
+
+    @property
+    def segment(self) -> Segment:
+        """The segment this node was created from"""
+        return self.data["segment"]
 
     @property
     def image(self) -> "NamedImage":
@@ -142,11 +168,22 @@ class SegmentNode(ImageNode):
 class PageNode(ImageNode):
     """A node representing a page / input image"""
 
-    def __init__(self, image_path: str):
+    __slots__ = ("path", "_layouts")
+
+    def __init__(self, image_path: str, shape: tuple[int, int] | None = None):
+        """Create a page
+
+        Arguments:
+            image_path: Path to the page's image.
+            shape: The (height, width) of the image, if known. If given,
+                the image is not read until it is needed.
+        """
         self.path = image_path
+        self._layouts: dict[tuple, PageLayout] = {}
         label = os.path.basename(image_path).split(".")[0]
-        image = imgproc.read(self.path)
-        height, width = image.shape[:2]
+        if shape is None:
+            shape = imgproc.read(self.path).shape
+        height, width = shape[:2]
         super().__init__(height, width, label=label)
         page_id = label.split("_")[-1]
         self.add_data(
@@ -161,6 +198,74 @@ class PageNode(ImageNode):
     def image(self):
         return NamedImage(imgproc.read(self.path), self.label)
 
+    def skip(self, reason: str | bool = True) -> None:
+        """Mark this page as skipped
+
+        Skipped pages are excluded from `Collection.active_leaves` (and
+        thus from `Collection.segments` and `Collection.update`), which
+        means that later inference steps don't process them. They are
+        still exported, as empty documents.
+
+        Arguments:
+            reason: Why the page was skipped, for example its predicted
+                class. Stored in the page's data.
+        """
+        self.add_data(**{SKIPPED_KEY: reason})
+
+    def is_skipped(self) -> bool:
+        """True if this page is marked as skipped"""
+        return bool(self.get(SKIPPED_KEY))
+
+    def skip_reason(self) -> str | bool | None:
+        """The reason given to `skip`, or None if this page isn't skipped"""
+        return self.get(SKIPPED_KEY) or None
+
+    def node_images(self, depths: Iterable[int] | None = None) -> Iterator[tuple[ImageNode, np.ndarray]]:
+        """Yield (node, image) for the nodes of this page
+
+        Gives the same images as `node.image`, but the page image is
+        decoded once and each node is cropped from its parent's image,
+        instead of recursively re-creating the parent's image for every
+        node. The nodes are yielded in traversal order.
+
+        Arguments:
+            depths: Only yield the nodes at these depths. The page itself
+                is at depth 0. Nodes below the deepest wanted depth are
+                not cropped. Defaults to None, which yields all nodes,
+                including the page.
+        """
+        depths = None if depths is None else set(depths)
+        max_depth = None if depths is None else max(depths, default=-1)
+        if max_depth is not None and max_depth < 0:
+            return
+
+        stack = [(self, self.image, 0)]
+        while stack:
+            node, image, depth = stack.pop()
+            if depths is None or depth in depths:
+                yield node, image
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for child in reversed(node.children):
+                child_image = imgproc.crop(image, child.segment.bbox)
+                if child.segment.mask is not None:
+                    child_image = imgproc.mask(child_image, child.segment.mask)
+                stack.append((child, child_image, depth + 1))
+
+    def layout(
+        self, window: int = 150, scale: float = 1.0, strip_width: float = 0.1, threshold: float = 0.2
+    ) -> PageLayout:
+        """Layout analysis (printspace and two-page divider) of this page
+
+        The analysis is done once per set of parameters and then cached
+        on the page, so that all steps that need the page's layout can
+        share it. See `layout.analyze_layout` for details.
+        """
+        key = (window, scale, strip_width, threshold)
+        if key not in self._layouts:
+            self._layouts[key] = analyze_layout(self.image, *key)
+        return self._layouts[key]
+
 
 class Collection:
     pages: list[PageNode]
@@ -208,6 +313,59 @@ class Collection:
         paths = [os.path.join(path, file) for file in sorted(os.listdir(path))]
         return cls(paths)
 
+    @classmethod
+    def from_alto(cls, paths: str | Sequence[str], image_dir: str | None = None, **kwargs) -> "Collection":
+        """Initialize a collection from ALTO XML files
+
+        Rebuilds the pages' segmentation and text from previously
+        exported (or externally produced) ALTO files. The page images
+        are not read, see `serialization.importers.parse_alto`.
+
+        Arguments:
+            paths: A directory of ALTO files or a list of paths to
+                ALTO files.
+            image_dir: Directory of the page images. Defaults to the
+                directory of each ALTO file.
+            **kwargs: Passed on to the Collection constructor.
+        """
+        return cls._from_xml(paths, partial(importers.parse_alto, image_dir=image_dir), **kwargs)
+
+    @classmethod
+    def from_page(cls, paths: str | Sequence[str], image_dir: str | None = None, **kwargs) -> "Collection":
+        """Initialize a collection from Page XML files
+
+        Rebuilds the pages' segmentation and text from previously
+        exported (or externally produced) Page XML files. The page images
+        are not read, see `serialization.importers.parse_page`.
+
+        Arguments:
+            paths: A directory of Page XML files or a list of paths to
+                Page XML files.
+            image_dir: Directory of the page images. Defaults to the
+                image paths given in the files.
+            **kwargs: Passed on to the Collection constructor.
+        """
+        return cls._from_xml(paths, partial(importers.parse_page, image_dir=image_dir), **kwargs)
+
+    @classmethod
+    def _from_xml(
+        cls, paths: str | Sequence[str], parse: Callable[[str], importers.ImportedPage], **kwargs
+    ) -> "Collection":
+        source = paths
+        if isinstance(paths, str):
+            paths = [os.path.join(paths, file) for file in os.listdir(paths) if file.endswith(".xml")]
+        if not paths:
+            raise ValueError(f"No XML files to import from {source}")
+        paths = sorted(paths)
+        directories = [os.path.dirname(os.path.abspath(path)) for path in paths]
+        kwargs.setdefault("label", _common_basename(directories) or Collection._DEFAULT_LABEL)
+
+        collection = cls([], **kwargs)
+        collection.pages = [_build_page(parse(path)) for path in paths]
+        collection.relabel()
+        logger.info("Imported collection '%s' with %d pages", collection.label, len(collection.pages))
+        return collection
+
     @classmethod
     def from_pickle(cls, path: str) -> "Collection":
         """Initialize a collection from a pickle file
@@ -247,12 +405,16 @@ class Collection:
         Inactive leaves are leaves that weren't segmented in the
         previous step, and thus are higher up in the tree than the
         other leaves. These should typically not updated in the next
-        steps.
+        steps. Skipped pages (see `PageNode.skip`) have no active leaves.
         """
-        max_depth = max(page.max_depth() for page in self)
-        for leaf in self.leaves():
-            if leaf.depth() == max_depth:
-                yield leaf
+        pages = [page for page in self if not page.is_skipped()]
+        if not pages:
+            return
+        max_depth = max(page.max_depth() for page in pages)
+        for page in pages:
+            for leaf in page.leaves():
+                if leaf.depth() == max_depth:
+                    yield leaf
 
     def update(self, results: list[Result]) -> None:
         """Update the collection with model results
@@ -265,9 +427,18 @@ class Collection:
         if len(leaves) != len(results):
             raise ValueError(f"Size of input ({len(results)}) does not match the size of the tree ({len(leaves)})")
 
+        # Only the leaves that were segmented in this update get new
+        # children, and thus need to be relabeled. All other labels
+        # remain unchanged, so there is no need to relabel the entire
+        # collection.
+        segmented = []
         for leaf, result in zip(leaves, results):
             leaf.update(result)
-        self.relabel()
+            if result.segments:
+                segmented.append(leaf)
+
+        for leaf in segmented:
+            leaf.relabel_levels(**self._label_format)
 
     def save(self, directory: str = "outputs", serializer: str | serialization.Serializer = "alto") -> None:
         """Save collection
@@ -281,9 +452,17 @@ class Collection:
         serialization.save_collection(self, serializer, directory)
 
     def set_label_format(self, **kwargs):
+        """Set the collection's label format and relabel all pages
+
+        Arguments:
+            **kwargs: Keyword arguments that are forwarded to
+                Node.relabel_levels.
+        """
         self._label_format = kwargs
+        self.relabel()
 
     def relabel(self):
+        """Relabel all pages of the collection"""
         for page in self:
             page.relabel_levels(**self._label_format)
 
@@ -296,14 +475,18 @@ class ImageGenerator:
     all images into memory at once, but the length of the generator
     is known beforehand (which is typically not the case), which is
     handy in some cases, e.g., when using tqdm progress bars.
+
+    The images are given by `load(node)`, which defaults to
+    `node.image`.
     """
 
-    def __init__(self, nodes: Iterable[ImageNode]):
+    def __init__(self, nodes: Iterable[ImageNode], load: Callable[[ImageNode], np.ndarray] | None = None):
         self._nodes = list(nodes)
+        self._load = load
 
     def __iter__(self) -> Iterator[np.ndarray]:
         for _node in self._nodes:
-            yield _node.image
+            yield _node.image if self._load is None else self._load(_node)
 
     def __len__(self) -> int:
         return len(self._nodes)
@@ -328,6 +511,27 @@ class NamedImage(np.ndarray):
         self.name = getattr(obj, "name", None)
 
 
+def _build_page(imported: importers.ImportedPage) -> PageNode:
+    """Create a PageNode (and its segments) from an imported page"""
+    page = PageNode(imported.image_path, shape=(imported.height, imported.width))
+    _build_segments(page, imported.children)
+    if imported.skipped is not None:
+        page.skip(imported.skipped)
+    return page
+
+
+def _build_segments(parent: ImageNode, imported: list[importers.ImportedNode]) -> None:
+    # The imported coordinates are relative to the page, while segments
+    # are given relative to their parent
+    dx, dy = -parent.coord.x, -parent.coord.y
+    for item in imported:
+        polygon = item.polygon.move((dx, dy)) if item.polygon else None
+        node = SegmentNode(Segment(bbox=item.bbox.move((dx, dy)), polygon=polygon), parent)
+        node.add_data(**item.data)
+        parent.children.append(node)
+        _build_segments(node, item.children)
+
+
 def paths2pages(paths: Sequence[str]) -> list[PageNode]:
     """Create PageNodes
 
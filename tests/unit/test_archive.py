@@ -0,0 +1,45 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from htrflow_core.utils.archive import ShardedArchive, read_entry, read_index
+
+
+def _read_with_library(path, name):
+    if path.endswith(".tar"):
+        with tarfile.open(path) as tar:
+            return tar.extractfile(name).read()
+    with zipfile.ZipFile(path) as zf:
+        return zf.read(name)
+
+
+@pytest.mark.parametrize("format", ["tar", "zip"])
+def test_sharded_archive(tmp_path, format):
+    entries = {f"page/line_{i}.bin": os.urandom(300 * i + 1) for i in range(10)}
+    with ShardedArchive(str(tmp_path), format, shard_size=2000) as archive:
+        for i, (name, data) in enumerate(entries.items()):
+            archive.add(name, data, label=f"line_{i}")
+
+    index = read_index(str(tmp_path))
+    assert len(index) == len(entries)
+    assert archive.n_shards > 1
+    for entry in index.values():
+        data = entries[entry["name"]]
+        assert read_entry(str(tmp_path), entry) == data
+        assert _read_with_library(str(tmp_path / entry["shard"]), entry["name"]) == data
+
+
+def test_sharded_archive_large_entry_gets_own_shard(tmp_path):
+    with ShardedArchive(str(tmp_path), "zip", shard_size=100) as archive:
+        archive.add("small", b"x")
+        archive.add("large", b"x" * 1000)
+        archive.add("small2", b"x")
+    index = read_index(str(tmp_path))
+    assert len({entry["shard"] for entry in index.values()}) == 3
+
+
+def test_sharded_archive_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        ShardedArchive(str(tmp_path), "rar")
@@ -0,0 +1,89 @@
+import pytest
+
+from htrflow_core.models.autotune import BatchSizeTuner
+
+
+def run(tuner, throughput, n_batches=20):
+    """Simulate `n_batches` batches, where `throughput(batch_size)` gives the images per second"""
+    for _ in range(n_batches):
+        batch_size = tuner.batch_size
+        tuner.record(batch_size, batch_size / throughput(batch_size))
+    return tuner.batch_size
+
+
+def test_grows_until_plateau():
+    tuner = BatchSizeTuner()
+    assert run(tuner, lambda batch_size: min(batch_size, 8) * 10.0) == 8
+    assert tuner.settled
+
+
+def test_goes_back_to_best_batch_size():
+    tuner = BatchSizeTuner()
+    assert run(tuner, lambda batch_size: batch_size * 10.0 if batch_size <= 4 else 5.0) == 4
+
+
+def test_respects_max_batch_size():
+    tuner = BatchSizeTuner(max_batch_size=6)
+    assert run(tuner, lambda batch_size: batch_size * 10.0) == 6
+
+
+def test_stops_at_memory_limit():
+    tuner = BatchSizeTuner(memory_limit=0.5)
+    for _ in range(20):
+        batch_size = tuner.batch_size
+        tuner.record(batch_size, batch_size / (batch_size * 10.0), memory_fraction=batch_size / 16)
+    assert tuner.batch_size == 8
+
+
+def test_first_batch_is_not_timed():
+    tuner = BatchSizeTuner(probes=1)
+    tuner.record(1, 100.0)  # slow warmup batch
+    tuner.record(1, 0.1)
+    assert tuner.batch_size == 2
+
+
+def test_back_off():
+    tuner = BatchSizeTuner(initial=32)
+    tuner.back_off(32)
+    assert tuner.batch_size == 16
+    assert tuner.settled
+    tuner.back_off(16)
+    assert tuner.batch_size == 8
+    tuner.back_off(1)
+    assert tuner.batch_size == 1
+
+
+class LimitedModel:
+    """A stand-in predict function that runs out of memory on batches larger than `limit`"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.batch_sizes = []
+
+    def __call__(self, batch):
+        if len(batch) > self.limit:
+            raise MemoryError
+        self.batch_sizes.append(len(batch))
+        return [2 * x for x in batch]
+
+
+def test_run_splits_batch_on_memory_error():
+    tuner = BatchSizeTuner(initial=8)
+    model = LimitedModel(limit=3)
+    assert tuner.run(model, list(range(8))) == [2 * x for x in range(8)]
+    assert model.batch_sizes == [2, 2, 2, 2]
+    assert tuner.batch_size == 2
+    assert tuner.settled
+
+
+def test_run_reraises_memory_error_on_single_input():
+    with pytest.raises(MemoryError):
+        BatchSizeTuner().run(LimitedModel(limit=0), [1])
+
+
+def test_run_records_timing():
+    tuner = BatchSizeTuner(probes=1)
+    model = LimitedModel(limit=100)
+    for _ in range(2):
+        tuner.run(model, [1] * tuner.batch_size, memory_fraction=lambda: 0.1)
+    assert tuner.batch_size == 2
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from htrflow_core.results import Result
+
+
+torch = pytest.importorskip("torch")
+
+from htrflow_core.models.base_model import BaseModel  # noqa: E402
+
+
+class LimitedModel(BaseModel):
+    """A stand-in model that runs out of memory on batches larger than `limit`"""
+
+    def __init__(self, limit):
+        super().__init__(device="cpu")
+        self.limit = limit
+        self.batch_sizes = []
+
+    def _predict(self, images, **kwargs):
+        if len(images) > self.limit:
+            raise MemoryError
+        self.batch_sizes.append(len(images))
+        return [Result.text_recognition_result(self.metadata, ["text"], [1.0]) for _ in images]
+
+
+@pytest.fixture
+def images():
+    return [np.zeros((10, 20, 3), dtype=np.uint8) for _ in range(50)]
+
+
+def test_auto_batch_size_backs_off_on_memory_error(images):
+    model = LimitedModel(limit=4)
+    results = model(images, batch_size="auto")
+    assert len(results) == len(images)
+    assert max(model.batch_sizes) <= 4
+    assert 1 <= model.tuned_batch_size <= 4
+
+
+def test_tuned_batch_size_is_reset(images):
+    model = LimitedModel(limit=4)
+    model(images, batch_size="auto")
+    model(images, batch_size=2)
+    assert model.tuned_batch_size is None
+
+
+def test_predict_deduplicates(images):
+    model = LimitedModel(limit=100)
+    results = model(images, batch_size=8, deduplicate=True)
+    assert model.batch_sizes == [1]
+    assert len(results) == len(images)
+    assert results[0] is not results[1]
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+
+from htrflow_core.pipeline.cache import ResultCache
+from htrflow_core.pipeline.steps import Inference
+from htrflow_core.results import Result
+from htrflow_core.volume.volume import Collection
+from tests.unit.conftest import dummy_segmentation_model
+
+
+class CountingModel:
+    """A stand-in model that records how many images it has seen"""
+
+    def __init__(self):
+        self.metadata = {"model_class": "CountingModel", "model": "dummy", "model_version": "1"}
+        self.n_images = 0
+
+    def __call__(self, images, **kwargs):
+        images = list(images)
+        self.n_images += len(images)
+        return dummy_segmentation_model(images)
+
+
+@pytest.fixture
+def image():
+    return np.random.randint(0, 255, (50, 60, 3), dtype=np.uint8)
+
+
+def test_key_depends_on_image_model_and_kwargs(image):
+    metadata = {"model": "a", "model_version": "1"}
+    key = ResultCache.key(image, metadata, {})
+    assert key == ResultCache.key(image.copy(), metadata, {})
+    assert key != ResultCache.key(255 - image, metadata, {})
+    assert key != ResultCache.key(image, metadata | {"model_version": "2"}, {})
+    assert key != ResultCache.key(image, metadata, {"num_beams": 4})
+
+
+def test_key_ignores_batching_settings(image):
+    key = ResultCache.key(image, {}, {"num_beams": 4})
+    kwargs = {"num_beams": 4, "batch_size": 8, "max_batch_size": 64, "tqdm_kwargs": {"disable": True}}
+    assert ResultCache.key(image, {}, kwargs) == key
+
+
+def test_get_put(tmp_path, image):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key(image, {}, {})
+    assert cache.get(key) is None
+    cache.put(key, Result.text_recognition_result({}, ["text"], [0.5]))
+    assert cache.get(key).data[0]["text_result"].top_candidate() == "text"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_is_persistent(tmp_path, image):
+    key = ResultCache.key(image, {}, {})
+    ResultCache(str(tmp_path)).put(key, Result.text_recognition_result({}, ["text"], [0.5]))
+    assert ResultCache(str(tmp_path)).get(key) is not None
+
+
+def test_eviction(tmp_path, image):
+    cache = ResultCache(str(tmp_path))
+    result = Result.text_recognition_result({}, ["text"], [0.5])
+    cache.put("a" * 40, result)
+    os.utime(cache._path("a" * 40), (0, 0))
+    cache.max_size = cache._size * 2
+    cache.put("b" * 40, result)
+    cache.put("c" * 40, result)
+    assert cache.get("a" * 40) is None
+    assert cache.get("c" * 40) is not None
+    assert cache._size <= cache.max_size
+
+
+def test_eviction_goes_below_low_water_mark(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), low_water=0.5)
+    result = Result.text_recognition_result({}, ["text"], [0.5])
+    cache.put("a" * 40, result)
+    cache.max_size = cache._size * 10
+    n_walks = 0
+    entries = cache._entries
+
+    def count_walks():
+        nonlocal n_walks
+        n_walks += 1
+        return entries()
+
+    monkeypatch.setattr(cache, "_entries", count_walks)
+    for i in range(20):
+        cache.put(f"{i:040d}", result)
+    assert cache._size <= cache.max_size
+    assert n_walks == 2  # evicts from 11 entries down to 5, twice
+
+
+def test_inference_uses_cache(tmp_path, demo_image):
+    cache = {"directory": str(tmp_path)}
+    model = CountingModel()
+    Inference(lambda: model, {}, {}, cache=cache).run(Collection([demo_image] * 2))
+    assert model.n_images == 2
+
+    model = CountingModel()
+    step = Inference(lambda: model, {}, {}, cache=cache)
+    collection = step.run(Collection([demo_image] * 3))
+    assert model.n_images == 0
+    assert step.metadata.settings["cache_hits"] == 3
+    assert all(page.children for page in collection)
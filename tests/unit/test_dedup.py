@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+import pytest
+
+from htrflow_core.models.dedup import Deduplicator
+from htrflow_core.results import Result
+from htrflow_core.utils import imgproc
+from htrflow_core.utils.imgproc import dhash
+
+
+@pytest.fixture
+def images():
+    rng = np.random.default_rng(0)
+    a, b = (rng.integers(0, 255, (40, 200, 3), dtype=np.uint8) for _ in range(2))
+    return [a, b, a.copy(), a, b]
+
+
+def fake_model(images):
+    return [Result.text_recognition_result({}, [str(i)], [1.0]) for i, _ in enumerate(images)]
+
+
+def test_exact_deduplication(images):
+    deduplicator = Deduplicator()
+    unique = list(deduplicator.unique(images))
+    assert len(unique) == 2
+    results = deduplicator.expand(fake_model(unique))
+    assert [result.data[0]["text_result"].top_candidate() for result in results] == ["0", "1", "0", "0", "1"]
+    assert (deduplicator.n_images, deduplicator.n_unique) == (5, 2)
+
+
+def test_duplicate_results_are_copies(images):
+    deduplicator = Deduplicator()
+    results = deduplicator.expand(fake_model(list(deduplicator.unique(images))))
+    assert results[0] is not results[2]
+    assert results[0].data[0]["text_result"] is not results[2].data[0]["text_result"]
+
+
+def test_exact_deduplication_ignores_near_duplicates(images):
+    near_duplicate = images[0].copy()
+    near_duplicate[0, 0] += 1
+    assert len(list(Deduplicator().unique([images[0], near_duplicate]))) == 2
+
+
+def test_perceptual_deduplication(images):
+    near_duplicate = images[0].copy()
+    near_duplicate[0, 0] += 1
+    assert dhash(near_duplicate) == dhash(images[0])
+    assert len(list(Deduplicator(threshold=2).unique([images[0], near_duplicate, images[1]]))) == 2
+
+
+@pytest.fixture
+def lines():
+    return [imgproc.read(f"examples/images/lines/A0068699_00021_region0_line{i}.jpg") for i in range(5)]
+
+
+def test_perceptual_deduplication_keeps_different_lines(lines):
+    assert len(list(Deduplicator(threshold=8).unique(lines))) == len(lines)
+
+
+def test_perceptual_deduplication_of_rescaled_line(lines):
+    line = lines[0]
+    height, width = line.shape[:2]
+    rescaled = cv2.resize(line, (width // 2, height // 2), interpolation=cv2.INTER_AREA)
+    squeezed = cv2.resize(line, (width // 2, height), interpolation=cv2.INTER_AREA)
+    assert bin(dhash(line) ^ dhash(squeezed)).count("1") <= 2
+    assert len(list(Deduplicator(threshold=2).unique([line, rescaled]))) == 1
+    assert len(list(Deduplicator(threshold=2).unique([line, squeezed]))) == 2
+
+
+def test_expand_wrong_number_of_results(images):
+    deduplicator = Deduplicator()
+    list(deduplicator.unique(images))
+    with pytest.raises(ValueError):
+        deduplicator.expand([])
@@ -140,3 +140,57 @@ def test_polygon_array():
     points = [geometry.Point(i, i) for i in range(n_points)]
     polygon = geometry.Polygon(points)
     assert all(p1.x == p2[0] and p1.y == p2[1] for p1, p2 in zip(points, polygon.as_nparray()))
+
+
+def test_polygon_rescale():
+    polygon = geometry.Polygon([(0, 0), (10, 5), (3, 7)])
+    assert [tuple(point) for point in polygon.rescale(0.5)] == [(0, 0), (5, 2), (1, 3)]
+
+
+def test_polygon_bbox():
+    polygon = geometry.Polygon([(1, 8), (10, 5), (3, 7)])
+    assert polygon.bbox() == geometry.Bbox(1, 5, 10, 8)
+
+
+def test_polygon_array_is_not_copied():
+    polygon = geometry.Polygon([(0, 0), (1, 1)])
+    assert polygon.as_nparray() is polygon.as_nparray()
+    assert not polygon.as_nparray().flags.writeable
+
+
+def test_bbox_array_getitem():
+    bboxes = [geometry.Bbox(0, 0, 10, 10), geometry.Bbox(5, 5, 20, 20)]
+    bbox_array = geometry.BboxArray(bboxes)
+    assert bbox_array[1] == bboxes[1]
+    assert list(bbox_array) == bboxes
+
+
+def test_bbox_array_area_and_center():
+    bboxes = [geometry.Bbox(0, 0, 10, 10), geometry.Bbox(5, 5, 20, 21)]
+    bbox_array = geometry.BboxArray(bboxes)
+    assert bbox_array.area.tolist() == [bbox.area for bbox in bboxes]
+    assert bbox_array.center.tolist() == [list(bbox.center) for bbox in bboxes]
+
+
+def test_bbox_array_intersection_matches_bbox():
+    bboxes = [geometry.Bbox(0, 0, 10, 10), geometry.Bbox(5, 5, 20, 20), geometry.Bbox(30, 30, 40, 40)]
+    bbox_array = geometry.BboxArray(bboxes)
+    other = geometry.Bbox(8, 0, 25, 12)
+    expected = [(bbox.intersection(other).area if bbox.intersects(other) else 0) for bbox in bboxes]
+    assert bbox_array.intersection_area(other).tolist() == expected
+    assert bbox_array.intersects(other).tolist() == [bbox.intersects(other) for bbox in bboxes]
+
+
+def test_bbox_array_pairwise_iou():
+    bbox_array = geometry.BboxArray([(0, 0, 10, 10), (0, 0, 10, 20)])
+    iou = bbox_array.iou(bbox_array)
+    assert iou.shape == (2, 2)
+    assert iou.diagonal().tolist() == [1, 1]
+    assert iou[0, 1] == iou[1, 0] == 0.5
+
+
+def test_bbox_array_move_rescale():
+    bbox = geometry.Bbox(1, 3, 11, 21)
+    bbox_array = geometry.BboxArray([bbox])
+    assert bbox_array.move((5, 5))[0] == bbox.move((5, 5))
+    assert bbox_array.rescale(0.3)[0] == bbox.rescale(0.3)
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+import pytest
+
+from htrflow_core.utils import imgproc
+from htrflow_core.utils.imgproc import batch_normalize
+
+
+MEAN = [0.5, 0.4, 0.3]
+STD = [0.5, 0.2, 0.25]
+
+
+@pytest.fixture
+def line_image():
+    """A smooth, wide, line-like image"""
+    x = np.linspace(0, 4 * np.pi, 1200)
+    y = np.linspace(0, np.pi, 90)
+    image = np.stack([128 + 100 * np.sin(x[None, :] + c) * np.cos(y[:, None]) for c in range(3)], axis=-1)
+    return cv2.GaussianBlur(image.astype(np.uint8), (5, 5), 0)
+
+
+def test_batch_normalize_without_resize():
+    image = np.random.randint(0, 255, (32, 48, 3), dtype=np.uint8)
+    batch = batch_normalize([image, image], (32, 48), MEAN, STD)
+    expected = (image.transpose(2, 0, 1) / 255 - np.array(MEAN)[:, None, None]) / np.array(STD)[:, None, None]
+    assert batch.shape == (2, 3, 32, 48)
+    assert batch.dtype == np.float32
+    np.testing.assert_allclose(batch[0], expected, atol=1e-5)
+    np.testing.assert_array_equal(batch[0], batch[1])
+
+
+def test_batch_normalize_writes_to_out(line_image):
+    out = np.zeros((2, 3, 64, 64), dtype=np.float32)
+    batch = batch_normalize([line_image, line_image[:40]], (64, 64), MEAN, STD, out=out)
+    assert batch is out
+    assert out.any()
+
+
+def test_batch_normalize_grayscale(line_image):
+    gray = cv2.cvtColor(line_image, cv2.COLOR_BGR2GRAY)
+    batch = batch_normalize([gray], (64, 64), [0.5] * 3, [0.5] * 3)
+    assert batch.shape == (1, 3, 64, 64)
+    np.testing.assert_array_equal(batch[0, 0], batch[0, 2])
+
+
+def test_batch_normalize_matches_huggingface_processor():
+    transformers = pytest.importorskip("transformers")
+    pytest.importorskip("PIL")
+    # A real text line, whose sharp edges are where the interpolation methods differ the most
+    line = imgproc.read("examples/images/lines/A0068699_00021_region0_line0.jpg")
+    processor = transformers.ViTImageProcessor(size={"height": 384, "width": 384}, image_mean=MEAN, image_std=STD)
+    expected = processor([line], return_tensors="np").pixel_values
+    batch = batch_normalize([line], (384, 384), MEAN, STD, processor.rescale_factor)
+    assert batch.shape == expected.shape
+    # The difference in gray levels (0-255)
+    diff = np.abs(batch - expected) * np.array(STD)[:, None, None] / processor.rescale_factor
+    assert diff.max() <= 24
+    assert diff.mean() <= 1
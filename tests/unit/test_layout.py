@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from htrflow_core.utils import imgproc, layout
+from htrflow_core.utils.geometry import Bbox, BboxArray
+
+
+def random_bboxes(n, size=1000):
+    random.seed(0)
+    bboxes = []
+    for _ in range(n):
+        x, y = random.randrange(0, size), random.randrange(0, size)
+        bboxes.append(Bbox(x, y, x + random.randrange(1, 300), y + random.randrange(1, 100)))
+    return bboxes
+
+
+def test_get_region_locations_matches_get_region_location():
+    printspace = Bbox(200, 150, 800, 850)
+    bboxes = random_bboxes(500)
+    expected = [layout.get_region_location(printspace, bbox).value for bbox in bboxes]
+    assert layout.get_region_locations(printspace, BboxArray(bboxes)).tolist() == expected
+
+
+@pytest.fixture
+def page_image():
+    return imgproc.read("examples/images/pages/A0068699_00021.jpg")
+
+
+def test_estimate_printspace(page_image):
+    printspace = layout.estimate_printspace(page_image)
+    page_height, page_width = page_image.shape[:2]
+    assert 0 < printspace.xmin < printspace.xmax < page_width
+    assert 0 < printspace.ymin < printspace.ymax < page_height
+
+
+def test_estimate_printspace_downscaled(page_image):
+    printspace = layout.estimate_printspace(page_image)
+    downscaled = layout.estimate_printspace(page_image, scale=0.5)
+    assert all(abs(a - b) <= 4 for a, b in zip(printspace, downscaled))
+
+
+@pytest.mark.parametrize("scale", [0, -0.5, 1.5])
+def test_estimate_printspace_invalid_scale(page_image, scale):
+    with pytest.raises(ValueError):
+        layout.estimate_printspace(page_image, scale=scale)
+
+
+def test_analyze_layout_matches_separate_functions(page_image):
+    page_layout = layout.analyze_layout(page_image)
+    assert page_layout.printspace == layout.estimate_printspace(page_image)
+    assert page_layout.divider == layout.is_twopage(page_image)
@@ -3,7 +3,7 @@ import random
 import numpy as np
 import pytest
 
-# from htrflow_core.postprocess.mask_nms import multiclass_mask_nms, mask_nms
+from htrflow_core.postprocess.mask_nms import calculate_containment_scores, mask_nms, multiclass_mask_nms, segment_nms
 from htrflow_core.results import Result, Segment
 
 
@@ -62,3 +62,41 @@ def test_multiclass_mask_nms(results_with_mask):
 def test_mask_nms(results_with_mask):
     # TODO
     pass
+
+
+def dense_mask_nms(masks, containments_threshold=0.5):
+    # Reference implementation that compares all pairs of masks
+    stacked_masks = np.stack(masks, axis=0)
+    containment_scores = calculate_containment_scores(stacked_masks)
+    np.fill_diagonal(containment_scores, 0)
+    areas = stacked_masks.sum(axis=(1, 2))
+    is_smaller = areas[:, np.newaxis] < areas
+    return np.where(np.any((containment_scores > containments_threshold) & is_smaller, axis=1))[0].tolist()
+
+
+def test_mask_nms_matches_dense_reference():
+    masks = [segment.global_mask for segment in generate_random_masks(60)]
+    expected = dense_mask_nms(masks)
+    assert expected  # sanity check: the random masks should overlap
+    assert mask_nms(masks) == expected
+
+
+def test_multiclass_mask_nms_removes_contained_mask(results_with_mask):
+    # mask_c is contained in mask_a (same class), mask_b has another class
+    assert multiclass_mask_nms(results_with_mask, downscale=1) == [2]
+
+
+def test_segment_nms_matches_mask_nms(results_with_mask):
+    # The two agree for 0/1 masks, see segment_nms
+    assert segment_nms(results_with_mask.segments) == sorted(multiclass_mask_nms(results_with_mask, downscale=1))
+
+
+def test_segment_nms_counts_pixels(results_with_mask):
+    for segment in results_with_mask.segments:
+        segment.mask = segment.mask * 255
+    assert segment_nms(results_with_mask.segments) == [2]
+
+
+def test_segment_nms_removes_one_of_two_duplicates():
+    segments = [Segment(bbox=(10, 10, 50, 30), class_label="line") for _ in range(2)]
+    assert segment_nms(segments) == [1]
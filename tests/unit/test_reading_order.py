@@ -1,3 +1,5 @@
+from types import SimpleNamespace
+
 from htrflow_core.postprocess import reading_order
 from htrflow_core.utils.geometry import Bbox
 
@@ -19,3 +21,27 @@ def test_lrtd_two_lines():
     bboxes = [Bbox(x, y*20, x+10, y+10) for x in range(nx) for y in range(ny)]
     expected_order = [n*2 for n in range(nx)] + [n*2 + 1 for n in range(nx)]
     assert reading_order.left_right_top_down(bboxes) == expected_order
+
+
+def test_order_bboxes_key_order():
+    # Case: a two-page spread with a top margin box, printspace boxes on
+    # both pages and a left margin box. Expected order: left page (top
+    # margin, printspace top-down, left margin), then right page.
+    printspace = Bbox(100, 100, 900, 900)
+    bboxes = [
+        Bbox(600, 300, 800, 350),  # right page, printspace
+        Bbox(120, 500, 400, 550),  # left page, printspace
+        Bbox(0, 400, 90, 450),  # left page, left margin
+        Bbox(150, 10, 350, 60),  # left page, top margin
+        Bbox(120, 200, 400, 250),  # left page, printspace
+    ]
+    assert reading_order.order_bboxes(bboxes, printspace, is_twopage=True) == [3, 4, 1, 2, 0]
+    assert reading_order.order_bboxes(bboxes, printspace, is_twopage=False) == [3, 4, 0, 1, 2]
+
+
+def test_order_children_matches_order_regions():
+    printspace = Bbox(100, 100, 900, 900)
+    lines = [SimpleNamespace(bbox=Bbox(120, y, 400, y + 20)) for y in (500, 200, 50, 300)]
+    regions = [SimpleNamespace(children=lines[:3]), SimpleNamespace(children=[]), SimpleNamespace(children=lines[3:])]
+    expected = [reading_order.order_regions(region.children, printspace) for region in regions]
+    assert reading_order.order_children(regions, printspace) == expected
@@ -1,7 +1,17 @@
+import gzip
+import io
+import json
+import os
+
 import pytest
+import xmlschema
 
 from htrflow_core import serialization
 from htrflow_core.results import RecognizedText
+from htrflow_core.utils import imgproc
+from htrflow_core.utils.archive import ShardedArchive, read_entry, read_index
+from htrflow_core.volume.volume import Collection
+from tests.unit.conftest import dummy_segmentation_model, dummy_text_recognition_model
 
 
 @pytest.fixture
@@ -65,3 +75,206 @@ def test_page_segmented_twice(demo_page_segmented_twice, page):
 def test_page_segmented_thrice(demo_page_segmented_thrice, page):
     doc = page.serialize(demo_page_segmented_thrice)
     page.validate(doc)
+
+
+@pytest.fixture
+def demo_collection_with_text(demo_collection_segmented):
+    for leaf in demo_collection_segmented.leaves():
+        leaf.add_data(text_result=RecognizedText(["text"], [1]))
+    return demo_collection_segmented
+
+
+def test_load_schema_is_cached(page):
+    assert serialization.load_schema(page.schema) is serialization.load_schema(page.schema)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_validate_collection(demo_collection_with_text, processes):
+    report = serialization.validate_collection(demo_collection_with_text, "page", processes=processes)
+    assert report.valid
+    assert report.n_documents == len(demo_collection_with_text.pages)
+
+
+def test_validate_collection_without_schema(demo_collection_with_text):
+    report = serialization.validate_collection(demo_collection_with_text, "txt")
+    assert report.valid
+
+
+def test_validate_collection_reports_invalid_pages(demo_collection_with_text, monkeypatch):
+    page = serialization.PageXML()
+    monkeypatch.setattr(page, "_stream", lambda *args, **kwargs: ["<PcGts/>"])
+    report = serialization.validate_collection(demo_collection_with_text, page, processes=1)
+    assert not report.valid
+    assert all(filename.endswith(".xml") for filename in report.errors)
+
+
+def test_validate_collection_reports_malformed_pages(demo_collection_with_text, monkeypatch):
+    page = serialization.PageXML()
+    monkeypatch.setattr(page, "_stream", lambda *args, **kwargs: ["<PcGts><unclosed"])
+    report = serialization.validate_collection(demo_collection_with_text, page, processes=1)
+    assert not report.valid
+    assert all(error.startswith("Malformed document") for error in report.errors.values())
+
+
+def test_serialize_collection_validate(demo_collection_with_text, monkeypatch):
+    page = serialization.PageXML()
+    assert page.serialize_collection(demo_collection_with_text, validate=True)
+    monkeypatch.setattr(page, "_serialize", lambda *args, **kwargs: "<PcGts/>")
+    with pytest.raises(xmlschema.XMLSchemaValidationError):
+        page.serialize_collection(demo_collection_with_text, validate=True)
+
+
+@pytest.mark.parametrize("format", ["alto", "page", "txt", "json"])
+def test_stream_collection_matches_serialize_collection(demo_collection_with_text, format, monkeypatch):
+    # Freeze the metadata, which includes a timestamp
+    metadata = serialization.serialization.get_metadata()
+    monkeypatch.setattr(serialization.serialization, "get_metadata", lambda: metadata)
+
+    serializer = serialization.get_serializer(format)
+    streamed = serializer.stream_collection(demo_collection_with_text)
+    streamed = [("".join(chunks), filename) for chunks, filename in streamed]
+    assert streamed == serializer.serialize_collection(demo_collection_with_text)
+
+
+def test_save_collection_compressed(demo_collection_with_text, tmp_path):
+    paths = serialization.save_collection(demo_collection_with_text, "page", str(tmp_path), compress=True)
+    assert paths
+    for path in paths:
+        assert path.endswith(".xml.gz")
+        with gzip.open(path, "rt") as f:
+            serialization.PageXML().validate(f.read())
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_json_one_file(demo_collection_with_text, indent):
+    json_serializer = serialization.Json(indent=indent)
+    pages = [json.loads(json_serializer.serialize(page)) for page in demo_collection_with_text]
+    expected = json.dumps({"collection_label": demo_collection_with_text.label, "pages": pages}, indent=indent)
+
+    serializer = serialization.Json(one_file=True, indent=indent)
+    ((doc, filename),) = serializer.serialize_collection(demo_collection_with_text)
+    assert doc == expected
+    assert filename == demo_collection_with_text.label + ".json"
+
+
+def test_json_lines(demo_collection_with_text):
+    ((doc, filename),) = serialization.Json(lines=True).serialize_collection(demo_collection_with_text)
+    pages = [json.loads(line) for line in doc.splitlines()]
+    assert len(pages) == len(demo_collection_with_text.pages)
+    assert filename.endswith(".jsonl")
+    assert pages[0]["contains"][0]["segment"]["polygon"]["points"][0].keys() == {"x", "y"}
+
+
+def test_parquet(demo_collection_with_text, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    serializer = serialization.get_serializer("parquet", pages_per_batch=2)
+    paths = serialization.save_collection(demo_collection_with_text, serializer, str(tmp_path))
+    tables = {os.path.basename(path): pq.read_table(path) for path in paths}
+
+    n_pages = len(demo_collection_with_text.pages)
+    assert tables["pages.parquet"].num_rows == n_pages
+    assert pq.ParquetFile(paths[0]).num_row_groups == 3  # 5 pages in batches of 2
+
+    lines = tables["lines.parquet"].to_pylist()
+    leaves = list(demo_collection_with_text.leaves())
+    assert len(lines) == len(leaves)
+    assert lines[0]["id"] == leaves[0].label
+    assert lines[0]["text"] == leaves[0].text
+    assert lines[0]["polygon"] == leaves[0].polygon.as_nparray().ravel().tolist()
+    assert tables["regions.parquet"].num_rows == 0
+
+
+def test_parquet_single_page(demo_collection_with_text):
+    pytest.importorskip("pyarrow")
+    assert serialization.get_serializer("parquet").serialize(demo_collection_with_text.pages[0]) is None
+
+
+def test_parquet_traverses_collection_once(demo_collection_with_text, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    n_traversals = 0
+    pages = demo_collection_with_text.pages
+
+    def iter_pages(self):
+        nonlocal n_traversals
+        n_traversals += 1
+        return iter(pages)
+
+    monkeypatch.setattr(Collection, "__iter__", iter_pages)
+    outputs = serialization.get_serializer("parquet").serialize_collection(demo_collection_with_text)
+    assert n_traversals == 1
+    tables = {os.path.basename(filename): pq.read_table(io.BytesIO(doc)) for doc, filename in outputs}
+    assert tables.keys() == {"pages.parquet", "regions.parquet", "lines.parquet", "words.parquet"}
+    assert tables["lines.parquet"].num_rows == len(list(demo_collection_with_text.leaves()))
+
+
+@pytest.fixture
+def demo_collection_single_page(demo_image):
+    collection = Collection([demo_image])
+    for _ in range(2):
+        collection.update(dummy_segmentation_model(collection.segments()))
+    collection.update(dummy_text_recognition_model(collection.segments()))
+    return collection
+
+
+def _node_key(node):
+    return node.bbox.xyxy, node.text, node.polygon.as_nparray().tolist()
+
+
+@pytest.mark.parametrize("collection", ["demo_collection_single_page", "demo_collection_with_text"])
+def test_alto_roundtrip(collection, tmp_path, request):
+    # demo_collection_with_text has five pages that share the same label,
+    # and thus the same filename, so only the last page is kept
+    collection = request.getfixturevalue(collection)
+    original = collection.pages[-1]
+    serialization.save_collection(collection, "alto", str(tmp_path))
+    imported = Collection.from_alto(str(tmp_path / collection.label), image_dir=os.path.dirname(original.path))
+    page = imported.pages[0]
+    assert (page.path, page.height, page.width) == (original.path, original.height, original.width)
+    assert sorted(map(_node_key, page.traverse()[1:])) == sorted(map(_node_key, original.traverse()[1:]))
+
+
+@pytest.mark.parametrize("collection", ["demo_collection_single_page", "demo_collection_with_text"])
+def test_page_roundtrip(collection, tmp_path, request):
+    collection = request.getfixturevalue(collection)
+    original = collection.pages[-1]
+    serialization.save_collection(collection, "page", str(tmp_path))
+    imported = Collection.from_page(str(tmp_path / collection.label))
+    page = imported.pages[0]
+    assert page.path == original.path
+    assert [node.depth() for node in page.traverse()] == [node.depth() for node in original.traverse()]
+    assert [node.text for node in page.leaves()] == [node.text for node in original.leaves()]
+    assert [node.polygon.as_nparray().tolist() for node in page.leaves()] == [
+        node.polygon.as_nparray().tolist() for node in original.leaves()
+    ]
+
+
+@pytest.mark.parametrize("reason", [True, "blank", "a {weird; reason}"])
+def test_page_roundtrip_skipped_page(demo_image, tmp_path, reason):
+    collection = Collection([demo_image])
+    collection.pages[0].skip(reason)
+    serialization.save_collection(collection, "page", str(tmp_path), validate=True)
+    page = Collection.from_page(str(tmp_path / collection.label)).pages[0]
+    assert page.is_skipped()
+    assert page.skip_reason() == reason
+    assert page.is_leaf()
+
+
+def test_import_does_not_read_images(demo_collection_single_page, tmp_path, monkeypatch):
+    serialization.save_collection(demo_collection_single_page, "page", str(tmp_path))
+    monkeypatch.setattr(imgproc, "read", pytest.fail)
+    imported = Collection.from_page(str(tmp_path / demo_collection_single_page.label))
+    assert len(imported.pages) == 1
+
+
+def test_import_empty_directory(tmp_path):
+    with pytest.raises(ValueError, match="No XML files"):
+        Collection.from_page(str(tmp_path))
+
+
+def test_save_collection_to_archive(demo_collection_single_page, tmp_path):
+    with ShardedArchive(str(tmp_path), "tar") as archive:
+        names = serialization.save_collection(demo_collection_single_page, "page", archive)
+    index = read_index(str(tmp_path))
+    entry = index[demo_collection_single_page.pages[0].label]
+    assert entry["name"] == names[0]
+    serialization.PageXML().validate(read_entry(str(tmp_path), entry).decode("utf-8"))
@@ -0,0 +1,38 @@
+import random
+
+from htrflow_core.utils.geometry import Bbox
+from htrflow_core.utils.spatial_index import SpatialIndex
+
+
+def random_bboxes(n, size=1000):
+    random.seed(0)
+    bboxes = []
+    for _ in range(n):
+        x, y = random.randrange(0, size), random.randrange(0, size)
+        bboxes.append(Bbox(x, y, x + random.randrange(1, 200), y + random.randrange(1, 50)))
+    return bboxes
+
+
+def test_intersecting_matches_linear_scan():
+    bboxes = random_bboxes(300)
+    index = SpatialIndex(range(len(bboxes)), bboxes)
+    query = Bbox(300, 300, 450, 380)
+    assert index.intersecting(query) == [i for i, bbox in enumerate(bboxes) if bbox.intersects(query)]
+
+
+def test_intersecting_large_query():
+    bboxes = random_bboxes(50)
+    index = SpatialIndex(range(len(bboxes)), bboxes, cell_size=5)
+    assert index.intersecting(Bbox(0, 0, 2000, 2000)) == list(range(len(bboxes)))
+
+
+def test_containing():
+    index = SpatialIndex(["a", "b", "c"], [Bbox(0, 0, 10, 10), Bbox(5, 5, 20, 20), Bbox(50, 50, 60, 60)])
+    assert index.containing((7, 7)) == ["a", "b"]
+    assert index.containing((30, 30)) == []
+
+
+def test_nearest():
+    index = SpatialIndex(["a", "b", "c"], [Bbox(0, 0, 10, 10), Bbox(5, 5, 20, 20), Bbox(50, 50, 60, 60)])
+    assert index.nearest((40, 40)) == ["c"]
+    assert index.nearest((40, 40), k=2) == ["c", "b"]
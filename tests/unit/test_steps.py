@@ -0,0 +1,215 @@
+import os
+
+import pytest
+
+from htrflow_core import serialization
+from htrflow_core.pipeline.steps import (
+    ExportImages,
+    FilterSegments,
+    PageClassification,
+    RemoveNoise,
+    Segmentation,
+    TextRecognition,
+)
+from htrflow_core.results import TEXT_RESULT_KEY, RecognizedText, Result
+from htrflow_core.utils.archive import read_index
+from htrflow_core.volume.volume import Collection
+from tests.unit.conftest import dummy_segmentation_model
+
+
+class ScoringModel:
+    """A stand-in recognition model
+
+    Greedy decoding (the default) gives the score 0.5 to every other
+    input (starting with the first) and 0.95 to the rest, beam search
+    always gives the score 0.9.
+    """
+
+    def __init__(self):
+        self.metadata = {"model_class": "ScoringModel"}
+        self.calls = []
+
+    def __call__(self, images, num_beams=1, **kwargs):
+        images = list(images)
+        self.calls.append((num_beams, len(images)))
+        if num_beams > 1:
+            return [Result.text_recognition_result(self.metadata, ["beam"], [0.9]) for _ in images]
+        return [
+            Result.text_recognition_result(self.metadata, ["greedy"], [0.95 if i % 2 else 0.5])
+            for i, _ in enumerate(images)
+        ]
+
+
+@pytest.fixture
+def collection(demo_image):
+    collection = Collection([demo_image])
+    collection.update(dummy_segmentation_model(collection.images()))
+    return collection
+
+
+def test_cascade_escalates_low_scores(collection):
+    model = ScoringModel()
+    step = TextRecognition(lambda: model, {}, {}, cascade={"threshold": 0.8, "generation_settings": {"num_beams": 4}})
+    step.run(collection)
+
+    lines = list(collection.leaves())
+    low = lines[::2]
+    assert model.calls == [(1, len(lines)), (4, len(low))]
+    assert step.metadata.settings["escalated_lines"] == [line.label for line in low]
+    for line in lines:
+        assert line.text == ("beam" if line in low else "greedy")
+
+
+def test_cascade_keeps_better_first_result(collection):
+    model = ScoringModel()
+    step = TextRecognition(lambda: model, {}, {}, cascade={"threshold": 1.0, "generation_settings": {"num_beams": 4}})
+    step.run(collection)
+    lines = list(collection.leaves())
+    assert [line.text for line in lines] == ["beam" if i % 2 == 0 else "greedy" for i in range(len(lines))]
+    assert len(step.metadata.settings["escalated_lines"]) == len(lines)
+
+
+def test_no_cascade(collection):
+    model = ScoringModel()
+    step = TextRecognition(lambda: model, {}, {})
+    step.run(collection)
+    assert len(model.calls) == 1
+    assert "escalated_lines" not in step.metadata.settings
+
+
+class PageClassifier:
+    """A stand-in page classifier that classifies the first page as blank"""
+
+    def __init__(self):
+        self.metadata = {"model_class": "PageClassifier"}
+        self.shapes = []
+
+    def __call__(self, images, **kwargs):
+        self.shapes.extend(image.shape for image in images)
+        classes = ["blank"] + ["text"] * (len(self.shapes) - 1)
+        return [Result(self.metadata, data=[{"classification": {label: 1.0}}]) for label in classes]
+
+
+class SegmentationModel:
+    def __init__(self):
+        self.metadata = {"model_class": "SegmentationModel"}
+
+    def __call__(self, images, **kwargs):
+        return dummy_segmentation_model(images)
+
+
+@pytest.fixture
+def classified_collection(demo_image):
+    collection = Collection([demo_image] * 3)
+    PageClassification(PageClassifier, {}, {}, skip=["blank"], reduction=4).run(collection)
+    return collection
+
+
+def test_page_classification_skips_pages(classified_collection):
+    skipped, *pages = classified_collection.pages
+    assert skipped.is_skipped()
+    assert skipped.get("skipped") == "blank"
+    assert not any(page.is_skipped() for page in pages)
+    assert list(classified_collection.active_leaves()) == pages
+
+
+def test_page_classification_reads_reduced_images(demo_image):
+    collection = Collection([demo_image])
+    step = PageClassification(PageClassifier, {}, {}, skip=["blank"], reduction=8)
+    step.run(collection)
+    page = collection.pages[0]
+    assert step.model.shapes[0][:2] == (-(-page.height // 8), -(-page.width // 8))
+    assert step.metadata.settings["skipped_pages"] == [page.label]
+
+
+def test_skipped_pages_are_not_processed(classified_collection):
+    Segmentation(SegmentationModel, {}, {}).run(classified_collection)
+    skipped, *pages = classified_collection.pages
+    assert skipped.is_leaf()
+    assert all(page.children for page in pages)
+
+
+@pytest.mark.parametrize("format", ["page", "alto", "txt", "json"])
+def test_skipped_pages_are_exported(classified_collection, format):
+    Segmentation(SegmentationModel, {}, {}).run(classified_collection)
+    serializer = serialization.get_serializer(format)
+    assert serializer.serialize(classified_collection.pages[0]) is not None
+
+
+def test_filter_segments(collection):
+    segments = list(collection.active_leaves())
+    min_height = sorted(node.height for node in segments)[len(segments) // 2]
+    step = FilterSegments(min_height=min_height)
+    step.run(collection)
+    remaining = list(collection.active_leaves())
+    assert remaining == [node for node in segments if node.height >= min_height]
+    assert all(node.parent is None for node in segments if node not in remaining)
+    assert step.metadata.settings["removed_segments"] == len(segments) - len(remaining)
+
+
+def test_filter_segments_by_score(collection):
+    segments = list(collection.active_leaves())
+    for i, node in enumerate(segments):
+        node.segment.score = 0.1 if i % 2 else 0.9
+    FilterSegments(min_score=0.5).run(collection)
+    assert list(collection.active_leaves()) == segments[::2]
+
+
+def test_filter_segments_keeps_pages(demo_image):
+    collection = Collection([demo_image])
+    FilterSegments(min_area=10**12).run(collection)
+    assert len(collection.pages) == 1
+
+
+@pytest.fixture
+def recognized_collection(demo_image):
+    """A page with regions and lines, where the lines of the first region score 0.1 and all others 0.9"""
+    collection = Collection([demo_image])
+    for _ in range(2):
+        collection.update(dummy_segmentation_model(collection.segments()))
+    for i, region in enumerate(collection.pages[0]):
+        for line in region:
+            line.add_data(**{TEXT_RESULT_KEY: RecognizedText(["text"], [0.1 if i == 0 else 0.9])})
+    return collection
+
+
+def test_remove_noise_regions(recognized_collection):
+    page = recognized_collection.pages[0]
+    regions = list(page.children)
+    step = RemoveNoise(region_threshold=0.8)
+    step.run(recognized_collection)
+    assert recognized_collection.pages[0] is page
+    assert page.children == regions[1:]
+    assert step.metadata.settings["removed_regions"] == 1
+
+
+def test_remove_noise_lines(recognized_collection):
+    page = recognized_collection.pages[0]
+    lines = [node for node in page.traverse() if node.depth() == 2]
+    for i, line in enumerate(lines):
+        line.add_data(**{TEXT_RESULT_KEY: RecognizedText(["text"], [0.3 if i % 2 else 0.9])})
+    step = RemoveNoise(region_threshold=None, line_threshold=0.5)
+    step.run(recognized_collection)
+    assert [node for node in page.traverse() if node.depth() == 2] == lines[::2]
+    assert step.metadata.settings["removed_lines"] == len(lines) // 2
+
+
+def test_tuned_batch_size_in_metadata(collection):
+    model = ScoringModel()
+    model.tuned_batch_size = 16
+    step = TextRecognition(lambda: model, {}, {"batch_size": "auto"})
+    step.run(collection)
+    assert step.metadata.settings["tuned_batch_size"] == 16
+
+
+@pytest.mark.parametrize("archive", [None, "tar"])
+def test_export_images_depth(demo_collection_segmented_nested, tmp_path, archive):
+    page = demo_collection_segmented_nested[0]
+    ExportImages(str(tmp_path), archive=archive, format="png", depth=2).run(demo_collection_segmented_nested)
+    expected = {node.label for node in page.traverse() if node.depth() == 2}
+    if archive is None:
+        files = os.listdir(tmp_path / page.get("image_name"))
+        assert {os.path.splitext(file)[0] for file in files} == expected
+        assert all(file.endswith(".png") for file in files)
+    else:
+        assert set(read_index(str(tmp_path))) == expected
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from htrflow_core.results import RecognizedText
+from htrflow_core.utils import imgproc
+from htrflow_core.utils.geometry import Bbox
+from htrflow_core.utils.layout import REGION_KEY, RegionLocation
+from htrflow_core.volume import store
+from htrflow_core.volume.volume import Collection
+from tests.unit.conftest import dummy_segmentation_model
+
+
+@pytest.fixture
+def collection(demo_image):
+    collection = Collection([demo_image] * 2, label_format={"level_labels": ["region", "line"]})
+    for _ in range(2):
+        collection.update(dummy_segmentation_model(collection.segments()))
+    for i, leaf in enumerate(collection.leaves()):
+        leaf.add_data(text_result=RecognizedText([f"line {i}", "alternative"], [0.9, 0.1]))
+    collection.pages[0].children[0].add_data(**{REGION_KEY: RegionLocation.MARGIN_LEFT})
+    return collection
+
+
+def _node_key(node):
+    segment = node.get("segment")
+    return (
+        node.label,
+        node.bbox.xyxy,
+        node.polygon.as_nparray().tolist(),
+        repr(node.get("text_result")),
+        node.get(REGION_KEY),
+        None if segment is None else (segment.score, segment.class_label, segment.orig_shape),
+        None if node.mask is None else node.mask.tolist(),
+    )
+
+
+def test_store_roundtrip(collection, tmp_path):
+    path = store.save_store(collection, str(tmp_path / "collection.store"))
+    loaded = store.load_store(path)
+    assert loaded.label == collection.label
+    assert len(loaded.pages) == len(collection.pages)
+    for original, page in zip(collection, loaded):
+        assert [_node_key(node) for node in page.traverse()] == [_node_key(node) for node in original.traverse()]
+
+
+def test_store_materializes_pages_lazily(collection, tmp_path, monkeypatch):
+    path = store.save_store(collection, str(tmp_path / "collection.store"))
+    monkeypatch.setattr(imgproc, "read", pytest.fail)
+    loaded = store.load_store(path)
+    assert not loaded.pages._pages
+    assert loaded.pages[1] is loaded.pages[-1]
+    assert list(loaded.pages._pages) == [1]
+
+
+def test_store_rejects_unknown_version(collection, tmp_path):
+    path = store.save_store(collection, str(tmp_path / "collection.store"))
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    meta["format_version"] = store.FORMAT_VERSION + 1
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError):
+        store.load_store(path)
+
+
+def test_store_keeps_data_that_is_not_json(collection, tmp_path):
+    page = collection.pages[0]
+    page.children[0].add_data(
+        shape=(3, 4), table={1: "one"}, scores=RecognizedText(["a"], [0.5]), obj=Bbox(0, 0, 1, 1)
+    )
+    loaded = store.load_store(store.save_store(collection, str(tmp_path / "collection.store")))
+    node = loaded.pages[0].children[0]
+    assert node.get("shape") == (3, 4)
+    assert node.get("table") == {1: "one"}
+    assert node.get("scores") == RecognizedText(["a"], [0.5])
+    assert node.get("obj") == Bbox(0, 0, 1, 1)
+
+
+def test_store_replaces_store_that_is_in_use(collection, tmp_path):
+    path = str(tmp_path / "collection.store")
+    loaded = store.load_store(store.save_store(collection, path))
+    store.save_store(loaded, path)
+    reloaded = store.load_store(path)
+    for original, page in zip(collection, reloaded):
+        assert [_node_key(node) for node in page.traverse()] == [_node_key(node) for node in original.traverse()]
+    assert os.listdir(tmp_path) == ["collection.store"]
+
+
+def test_store_does_not_overwrite_other_directories(collection, tmp_path):
+    (tmp_path / "notes.txt").write_text("keep me")
+    with pytest.raises(FileExistsError):
+        store.save_store(collection, str(tmp_path))
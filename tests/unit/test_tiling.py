@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from htrflow_core.models.tiling import merge_tiles, tile_images, tile_positions
+from htrflow_core.results import Result, Segment
+from htrflow_core.utils.geometry import Bbox
+
+
+def test_tile_positions():
+    assert tile_positions(100, 200, 50) == [0]
+    assert tile_positions(1000, 400, 100) == [0, 300, 600]
+    assert tile_positions(1000, 500, 0) == [0, 500]
+
+
+def test_tile_positions_overlap_too_large():
+    with pytest.raises(ValueError):
+        tile_positions(1000, 100, 100)
+
+
+def test_tile_images_cover_image():
+    image = np.random.randint(0, 255, (700, 1000, 3), dtype=np.uint8)
+    tiles = list(tile_images([image], tile_size=400, overlap=100))
+    assert len(tiles) == tiles[0].n_tiles == 6
+    covered = np.zeros(image.shape[:2], dtype=bool)
+    for tile in tiles:
+        x, y = tile.offset
+        assert tile.image.shape[0] <= 400 and tile.image.shape[1] <= 400
+        assert (tile.image == image[y : y + 400, x : x + 400]).all()
+        covered[y : y + 400, x : x + 400] = True
+    assert covered.all()
+
+
+def detect(tile, objects):
+    """A stand-in detector that finds the (possibly clipped) objects within a tile"""
+    x, y = tile.offset
+    height, width = tile.image.shape[:2]
+    area = Bbox(x, y, x + width, y + height)
+    segments = []
+    for obj in objects:
+        clipped = obj.intersection(area)
+        if clipped is not None and clipped.width > 0 and clipped.height > 0:
+            segments.append(Segment(bbox=clipped.move((-x, -y)), class_label="line", orig_shape=(height, width)))
+    return Result({}, segments=segments)
+
+
+def test_merge_tiles_removes_seam_duplicates():
+    image = np.zeros((1000, 1000, 3), dtype=np.uint8)
+    objects = [Bbox(50, 50, 250, 100), Bbox(380, 300, 520, 350), Bbox(700, 800, 900, 850)]
+    tiles = list(tile_images([image], tile_size=500, overlap=200))
+    merged = merge_tiles(tiles, [detect(tile, objects) for tile in tiles])
+    assert sorted(tuple(bbox) for bbox in merged.bboxes) == sorted(tuple(obj) for obj in objects)
+    assert all(segment.orig_shape == (1000, 1000) for segment in merged.segments)
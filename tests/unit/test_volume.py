@@ -2,7 +2,9 @@ import pickle
 
 import pytest
 
+from htrflow_core.utils import imgproc
 from htrflow_core.volume import node, volume
+from tests.unit.conftest import dummy_segmentation_model
 
 
 def one_layer_tree(n_children=3):
@@ -151,3 +153,51 @@ def test_pickling(demo_collection_segmented_nested):
     assert isinstance(vol, volume.Collection)  # sanity check
     assert all(p1 == p2 for p1, p2 in zip(vol[0, 0].polygon[0], demo_collection_segmented_nested[0, 0].polygon[0]))
     assert vol[0, 0, 0].label == demo_collection_segmented_nested[0, 0, 0].label
+
+
+def test_collection_update_relabels_like_full_relabel(demo_collection_segmented_nested):
+    demo_collection_segmented_nested.set_label_format(level_labels=["region", "line"])
+    result = dummy_segmentation_model(demo_collection_segmented_nested.segments())
+    demo_collection_segmented_nested.update(result)
+    labels = [node.label for node in demo_collection_segmented_nested.traverse(lambda _: True)]
+    demo_collection_segmented_nested.relabel()
+    assert labels == [node.label for node in demo_collection_segmented_nested.traverse(lambda _: True)]
+
+
+def test_nodes_are_slotted(demo_collection_segmented):
+    page = demo_collection_segmented[0]
+    assert not hasattr(page, "__dict__")
+    assert not hasattr(page[0], "__dict__")
+
+
+def test_page_layout_is_cached(demo_collection_unsegmented):
+    page = demo_collection_unsegmented[0]
+    assert page.layout() is page.layout()
+    assert page.layout(window=100) is not page.layout()
+
+
+def test_page_node_images(demo_collection_segmented_nested):
+    page = demo_collection_segmented_nested[0]
+    nodes = list(page.traverse())
+    node_images = list(page.node_images())
+    assert [node_ for node_, _ in node_images] == nodes
+    for node_, image in node_images:
+        assert (image == node_.image).all()
+
+
+def test_page_node_images_at_depth(demo_collection_segmented_nested, monkeypatch):
+    page = demo_collection_segmented_nested[0]
+    crop = imgproc.crop
+    n_crops = 0
+
+    def counting_crop(*args):
+        nonlocal n_crops
+        n_crops += 1
+        return crop(*args)
+
+    monkeypatch.setattr(imgproc, "crop", counting_crop)
+    node_images = list(page.node_images(depths=[1]))
+    assert [node_ for node_, _ in node_images] == page.children
+    assert n_crops == len(page.children)
+    for node_, image in node_images:
+        assert (image == node_.image).all()